@@ -0,0 +1,229 @@
+# This script en- or decrypts whole directory trees or all files
+# matching a glob pattern without the GUIs. The files are
+# processed in a pool of worker processes. Every worker reads,
+# normalizes and transforms its file piece by piece, and only a
+# limited number of files is handed to the pool at once, so the
+# memory in use stays bounded however many files there are.
+# A manifest with the input and output paths, sizes and
+# durations is written to the output directory. Files whose
+# output is newer than the input and was written with the same
+# settings are skipped.
+#
+# Usage: python Batch_cipher.py MODE [--key KEY] [--decrypt] --output DIR
+#            [--keep-blanks] [--keep-nonalpha] [--workers N] INPUT ...
+# MODE is caesar (KEY: first letter of the alphabet), atbash,
+# substitution (KEY: the 26 substitutes of A-Z) or vigenere
+# (KEY: the key word). INPUT is a directory or a glob pattern.
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+
+MANIFEST = "manifest.json"
+# Extension of the files which are written before they are
+# renamed to the output path
+PART = ".part"
+
+# This function returns a fingerprint of everything which
+# determines the content of the outputs. An output is only
+# up to date if it was written with the same fingerprint.
+def Fingerprint(mode, key, sign, keep_blanks, keep_nonalpha):
+    settings = json.dumps([mode, key, sign, keep_blanks, keep_nonalpha])
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+# This function returns the files of inputs (directories or glob
+# patterns) as pairs of the path and the path relative to its
+# directory or to the fixed part of its pattern. Files inside
+# the directory skip (the output directory), manifests and
+# half-written outputs of earlier runs are left out.
+def FindFiles(inputs, skip):
+    skip = os.path.abspath(skip) + os.sep
+    files = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            base = pattern
+            paths = (os.path.join(folder, name)
+                     for folder, folders, names in os.walk(pattern)
+                     for name in sorted(names))
+        else:
+            base = os.path.dirname(pattern)
+            while glob.has_magic(base):
+                base = os.path.dirname(base)
+            paths = sorted(glob.glob(pattern, recursive = True))
+        for path in paths:
+            name = os.path.basename(path)
+            if (name == MANIFEST) or name.endswith(PART):
+                continue
+            if os.path.isfile(path) and not os.path.abspath(path).startswith(skip):
+                files.append((path, os.path.relpath(path, base or ".")))
+    return files
+
+# This function reads the manifest of a previous run and returns
+# its entries by output path. Failed files are left out, so an
+# input reported for writing to the same output as another one
+# does not hide the entry of the file which was written.
+def ReadManifest(path):
+    try:
+        with open(path, encoding = "utf-8") as File:
+            manifest = json.load(File)
+    except (OSError, ValueError):
+        return {}
+    return {entry["output"]: entry for entry in manifest.get("files", [])
+            if entry.get("status") != "error"}
+
+# This function writes the manifest. It is written to a
+# temporary file first, so an interrupted run does not destroy
+# the manifest of the previous run.
+def WriteManifest(path, manifest):
+    with open(path + PART, "w", encoding = "utf-8") as File:
+        json.dump(manifest, File, indent = 1)
+    os.replace(path + PART, path)
+
+# This function tells whether out_path is up to date: it exists,
+# it is not older than in_path and the previous run wrote it
+# with the same fingerprint.
+def UpToDate(in_path, out_path, previous, fingerprint):
+    entry = previous.get(out_path)
+    if (entry is None) or (entry.get("fingerprint") != fingerprint) or (entry.get("status") == "error"):
+        return False
+    try:
+        return os.path.getmtime(out_path) >= os.path.getmtime(in_path)
+    except OSError:
+        return False
+
+# This function runs in a worker process. It transforms the file
+# in_path into out_path piece by piece and returns the duration
+# and the size of the output. The output is written under a
+# temporary name first, so that it is never left half-written.
+def ProcessFile(in_path, out_path, mode, key, sign, keep_blanks, keep_nonalpha, chunk_size):
+    start = time.perf_counter()
+    folder = os.path.dirname(out_path)
+    if folder != "":
+        os.makedirs(folder, exist_ok = True)
+    part = out_path + PART
+    try:
+        if mode == "vigenere":
+            CipherEngine.VigenereFile(in_path, part, key, keep_blanks, keep_nonalpha,
+                                      sign, chunk_size)
+        else:
+            CipherEngine.SubstituteFile(in_path, part, CipherEngine.SubstitutionKey(key),
+                                        keep_blanks, keep_nonalpha, chunk_size)
+        os.replace(part, out_path)
+    except:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return time.perf_counter() - start, os.path.getsize(out_path)
+
+# This function processes files (see FindFiles) into the
+# directory output with at most workers processes and at most
+# in_flight files handed to the pool at once. It returns the
+# manifest entries of all files. If different inputs have the
+# same relative path, e.g. in two input directories, only the
+# first is processed and the others are reported as errors, as
+# they would overwrite its output.
+def ProcessFiles(files, output, mode, key, sign, keep_blanks, keep_nonalpha,
+                 previous = None, workers = None, in_flight = None,
+                 chunk_size = 1 << 20, force = False):
+    if previous is None:
+        previous = {}
+    fingerprint = Fingerprint(mode, key, sign, keep_blanks, keep_nonalpha)
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 4 * workers
+    entries = []
+    pending = {}
+    # The input written to each output path
+    sources = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+        def Collect(done):
+            for future in done:
+                entry = pending.pop(future)
+                try:
+                    entry["seconds"], entry["output_bytes"] = future.result()
+                    entry["status"] = "done"
+                except Exception as error:
+                    entry["status"] = "error"
+                    entry["error"] = str(error)
+                entries.append(entry)
+        for in_path, relative in files:
+            out_path = os.path.join(output, relative)
+            target = os.path.normpath(out_path)
+            if target in sources:
+                # The same file found through two inputs is only
+                # processed once.
+                if sources[target] != os.path.abspath(in_path):
+                    entries.append({"input": in_path, "output": out_path, "status": "error",
+                                    "input_bytes": os.path.getsize(in_path),
+                                    "error": "same output as %s" % sources[target]})
+                continue
+            sources[target] = os.path.abspath(in_path)
+            entry = {"input": in_path, "output": out_path,
+                     "input_bytes": os.path.getsize(in_path), "fingerprint": fingerprint}
+            if (not force) and UpToDate(in_path, out_path, previous, fingerprint):
+                old = previous[out_path]
+                entry.update(status = "skipped", output_bytes = old.get("output_bytes"),
+                             seconds = old.get("seconds"))
+                entries.append(entry)
+                continue
+            if len(pending) >= in_flight:
+                done, waiting = concurrent.futures.wait(
+                    pending, return_when = concurrent.futures.FIRST_COMPLETED)
+                Collect(done)
+            future = pool.submit(ProcessFile, in_path, out_path, mode, key, sign,
+                                 keep_blanks, keep_nonalpha, chunk_size)
+            pending[future] = entry
+        Collect(concurrent.futures.as_completed(list(pending)))
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "En- or decrypt directory trees.")
+    parser.add_argument("mode", choices = CipherEngine.CIPHER_MODES)
+    parser.add_argument("inputs", nargs = "+", metavar = "INPUT",
+                        help = "directory or glob pattern (use ** for subdirectories)")
+    parser.add_argument("--key", help = "Caesar letter, 26 substitutes or Vigenère key")
+    parser.add_argument("--decrypt", action = "store_true", help = "decrypt instead of encrypt")
+    parser.add_argument("--output", required = True, help = "output directory")
+    parser.add_argument("--keep-blanks", action = "store_true")
+    parser.add_argument("--keep-nonalpha", action = "store_true")
+    parser.add_argument("--workers", type = int, help = "number of worker processes")
+    parser.add_argument("--in-flight", type = int,
+                        help = "files handed to the pool at once (default 4 per worker)")
+    parser.add_argument("--chunk-size", type = int, default = 1 << 20,
+                        help = "characters read at once per file")
+    parser.add_argument("--force", action = "store_true", help = "process up-to-date files too")
+    args = parser.parse_args()
+    try:
+        key, sign = CipherEngine.CompileKey(args.mode, args.key, args.decrypt)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    manifest_path = os.path.join(args.output, MANIFEST)
+    os.makedirs(args.output, exist_ok = True)
+    files = FindFiles(args.inputs, args.output)
+    entries = ProcessFiles(files, args.output, args.mode, key, sign,
+                           args.keep_blanks, args.keep_nonalpha,
+                           previous = ReadManifest(manifest_path),
+                           workers = args.workers, in_flight = args.in_flight,
+                           chunk_size = args.chunk_size, force = args.force)
+    elapsed = time.perf_counter() - start
+    entries.sort(key = lambda entry: entry["input"])
+    WriteManifest(manifest_path, {"mode": args.mode, "decrypt": args.decrypt,
+                                  "seconds": elapsed, "files": entries})
+
+    done = [entry for entry in entries if entry["status"] == "done"]
+    errors = [entry for entry in entries if entry["status"] == "error"]
+    size = sum(entry["input_bytes"] for entry in done)
+    print("%d processed, %d skipped, %d failed in %.2f s (%.1f MB/s)"
+          % (len(done), len(entries) - len(done) - len(errors), len(errors), elapsed,
+             size / elapsed / 1e6 if elapsed > 0 else 0.0))
+    for entry in errors:
+        print("%s: %s" % (entry["input"], entry["error"]), file = sys.stderr)
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,164 @@
+# numpy provides the vectorized counting and scoring
+import numpy as np
+
+from CipherEngine.Vigenere import TextToArray
+
+# Relative letter frequencies of German text in percent (A-Z),
+# used when no sample text is available.
+GERMAN_FREQUENCIES = np.array([6.51, 1.89, 3.06, 5.08, 17.40, 1.66, 3.01, 4.76, 7.55,
+                               0.27, 1.21, 3.44, 2.53, 9.78, 2.51, 0.79, 0.02, 7.00,
+                               7.27, 6.15, 4.35, 0.67, 1.89, 0.03, 0.04, 1.13])
+
+# This function returns the letters A-Z of the (normalized)
+# text as an array of letter indices (A = 0, ..., Z = 25). All
+# other characters are dropped.
+def LetterArray(text):
+    codes, encoding = TextToArray(text)
+    codes = codes[(codes >= ord("A")) & (codes <= ord("Z"))]
+    return (codes - ord("A")).astype(np.uint8)
+
+# This function counts each letter A-Z in the (normalized) text
+# and returns an array of 26 counts. All other characters are
+# ignored.
+def LetterCounts(text):
+    return np.bincount(LetterArray(text), minlength = 26)
+
+# This function turns letter counts into a profile of relative
+# frequencies. Half a count is added to every letter so that no
+# letter has the probability zero.
+def LetterProfile(counts):
+    counts = np.asarray(counts, dtype = np.float64) + 0.5
+    return counts / counts.sum()
+
+# This function returns the matrix of all 26 Caesar
+# decryption alphabets as letter indices: row d maps the
+# ciphertext letter i to the plaintext letter (i + d) % 26,
+# i.e. the alphabet produced by CaesarAlphabet(chr(ord("a")+d)).
+def CaesarMatrix():
+    return np.add.outer(np.arange(26), np.arange(26)) % 26
+
+# This function computes the chi-squared statistic of the
+# ciphertext letter counts for each of the given decryption
+# alphabets (one row of plaintext letter indices per alphabet)
+# against the reference profile, all at once.
+# counts may also hold several rows of counts, e.g. one per
+# Vigenère key column; the result then has one row of scores per
+# row of counts.
+def ChiSquared(counts, profile, alphabets):
+    counts = np.asarray(counts, dtype = np.float64)[..., None, :]
+    expected = counts.sum(axis = -1, keepdims = True) * np.asarray(profile)[alphabets]
+    return (((counts - expected) ** 2) / expected).sum(axis = -1)
+
+# This function finds the Caesar or Atbash alphabet which
+# decrypts a ciphertext with the given letter counts best. It
+# returns the mode as used by the GUIs (-1 = Atbash, 0 = Caesar),
+# the first letter of the Caesar alphabet (or "a" for Atbash)
+# and the chi-squared score.
+def SolveCaesar(counts, profile = None):
+    if profile is None:
+        profile = LetterProfile(GERMAN_FREQUENCIES)
+    alphabets = np.vstack([CaesarMatrix(), np.arange(25, -1, -1)])
+    scores = ChiSquared(counts, profile, alphabets)
+    best = int(np.argmin(scores))
+    if best == 26:
+        return -1, "a", float(scores[best])
+    return 0, chr(ord("a") + best), float(scores[best])
+
+# This function counts the letters of each of the period columns
+# of the letter array letters, i.e. of letters[j::period], and
+# returns a (period x 26) array. The columns are taken from a
+# strided view of letters, the remaining letters which do not
+# fill a whole row are ignored.
+def ColumnCounts(letters, period):
+    rows = len(letters) // period
+    view = letters[:rows * period].reshape(rows, period)
+    index = view + (26 * np.arange(period, dtype = np.intp))
+    return np.bincount(index.ravel(), minlength = 26 * period).reshape(period, 26)
+
+# The index of coincidence of a period is only computed if each
+# key column has at least this many letters, because it is too
+# noisy on shorter columns.
+MIN_COLUMN = 20
+
+# This function computes the mean index of coincidence of the
+# key columns for every candidate period from 1 to max_period.
+# Element 0 of the result is unused, as are the elements of
+# periods with too short columns.
+def PeriodCoincidence(letters, max_period = 40):
+    ic = np.zeros(max_period + 1)
+    if len(letters) < 2:
+        return ic
+    for period in range(1, min(max_period, max(1, len(letters) // MIN_COLUMN)) + 1):
+        counts = ColumnCounts(letters, period).astype(np.float64)
+        n = counts.sum(axis = 1)
+        ic[period] = ((counts * (counts - 1)).sum(axis = 1) / (n * (n - 1))).mean()
+    return ic
+
+# This function performs the Kasiski test: it finds the
+# distances between consecutive occurrences of every repeated
+# trigram and returns, for every candidate period from 1 to
+# max_period, the fraction of distances divisible by it.
+# Instead of a dictionary of trigram positions, the trigram
+# codes are sorted, so equal trigrams become neighbours.
+# Element 0 of the result is unused.
+def KasiskiScores(letters, max_period = 40):
+    scores = np.zeros(max_period + 1)
+    if len(letters) < 4:
+        return scores
+    l = letters.astype(np.int32)
+    trigrams = l[:-2] * 676 + l[1:-1] * 26 + l[2:]
+    order = np.argsort(trigrams, kind = "stable")
+    same = trigrams[order[1:]] == trigrams[order[:-1]]
+    distances = (order[1:] - order[:-1])[same]
+    if len(distances) == 0:
+        return scores
+    for period in range(1, max_period + 1):
+        scores[period] = np.count_nonzero(distances % period == 0) / len(distances)
+    return scores
+
+# The key length is estimated from at most this many letters,
+# which is plenty for the statistics to settle.
+PERIOD_SAMPLE = 1 << 20
+
+# This function estimates the key length of a Vigenère
+# ciphertext given as letter array (using its first
+# PERIOD_SAMPLE letters). Periods whose index of coincidence is
+# close to the best one are candidates. Multiples of the real key
+# length score as high as the key length itself, so the smallest
+# candidate is chosen, or, if use_kasiski is set, the candidate
+# with the best Kasiski score.
+def FindKeyLength(letters, max_period = 40, use_kasiski = False):
+    letters = letters[:PERIOD_SAMPLE]
+    ic = PeriodCoincidence(letters, max_period)
+    if ic.max() <= 0:
+        return 1
+    candidates = np.flatnonzero(ic >= 0.9 * ic.max())
+    if use_kasiski:
+        kasiski = KasiskiScores(letters, max_period)
+        return int(candidates[np.argmax(kasiski[candidates])])
+    return int(candidates[0])
+
+# This function recovers the Vigenère key of the given length
+# from a letter array: the key columns are scored against all
+# 26 Caesar alphabets at once and the best shift is taken.
+def RecoverKey(letters, period, profile = None):
+    if profile is None:
+        profile = LetterProfile(GERMAN_FREQUENCIES)
+    scores = ChiSquared(ColumnCounts(letters, period), profile, CaesarMatrix())
+    shifts = (26 - np.argmin(scores, axis = 1)) % 26
+    return "".join(chr(ord("A") + int(k)) for k in shifts)
+
+# This function breaks a normalized Vigenère ciphertext whose
+# key advances on letters only, and returns the key.
+def SolveVigenere(text, profile = None, max_period = 40, use_kasiski = False):
+    letters = LetterArray(text)
+    if len(letters) == 0:
+        raise ValueError("No letters to analyse")
+    period = FindKeyLength(letters, max_period, use_kasiski)
+    key = RecoverKey(letters, period, profile)
+    # On short texts a multiple of the key length may be chosen,
+    # in which case the key repeats itself.
+    for period in range(1, len(key)):
+        if (len(key) % period == 0) and (key[:period] * (len(key) // period) == key):
+            return key[:period]
+    return key
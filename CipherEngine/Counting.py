@@ -0,0 +1,114 @@
+# concurrent.futures provides the worker pool for counting
+# several files
+import concurrent.futures
+
+import numpy as np
+
+from CipherEngine.Analysis import LetterArray
+from CipherEngine.Normalize import NormalizeText
+
+# This function returns the codes of all n-grams of the letter
+# array letters, i.e. the n-gram starting at index i has the
+# code l[i]*26^(n-1) + ... + l[i+n-1].
+def NgramCodes(letters, n):
+    l = letters.astype(np.intp)
+    count = len(l) - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype = np.intp)
+    codes = l[:count].copy()
+    for k in range(1, n):
+        codes *= 26
+        codes += l[k:k + count]
+    return codes
+
+# This function returns the n-gram with the given code as a
+# string.
+def NgramText(code, n):
+    s = ""
+    for k in range(n):
+        s = chr(ord("A") + code % 26) + s
+        code //= 26
+    return s
+
+# An NgramCounter counts the n-grams of a text which may arrive
+# in pieces. The counts are held in one array of 26^n integers.
+# The last n-1 letters of a piece are kept, so that n-grams
+# spanning two pieces are counted as well. Counters of different
+# texts can be merged, e.g. to count a corpus file by file.
+class NgramCounter:
+    def __init__(self, n = 1):
+        self.n = n
+        self.counts = np.zeros(26 ** n, dtype = np.int64)
+        self.tail = np.zeros(0, dtype = np.uint8)
+
+    # This method counts the n-grams of the next piece of a text,
+    # given as letter array (see Analysis.LetterArray).
+    def Update(self, letters):
+        letters = np.concatenate([self.tail, letters.astype(np.uint8)])
+        self.counts += np.bincount(NgramCodes(letters, self.n), minlength = len(self.counts))
+        self.tail = letters[len(letters) - min(len(letters), self.n - 1):]
+
+    # This method counts the n-grams of the next piece of a
+    # normalized text.
+    def UpdateText(self, text):
+        self.Update(LetterArray(text))
+
+    # This method adds the counts of the counter other, which
+    # must count n-grams of the same length.
+    def Merge(self, other):
+        if other.n != self.n:
+            raise ValueError("Cannot merge counters of different n-gram lengths")
+        self.counts += other.counts
+        return self
+
+    # This method returns the total number of n-grams counted.
+    def Total(self):
+        return int(self.counts.sum())
+
+    # This method returns the k most frequent n-grams as a list of
+    # (n-gram, count) pairs.
+    def MostCommon(self, k = 10):
+        k = min(k, len(self.counts))
+        best = np.argpartition(-self.counts, k - 1)[:k]
+        best = best[np.argsort(-self.counts[best], kind = "stable")]
+        return [(NgramText(int(code), self.n), int(self.counts[code])) for code in best]
+
+# This function returns the first size letters of text (a
+# string or any object which supports len() and slicing, e.g. a
+# MappedText) normalized with strict set. The text is read in
+# pieces of chunk_size characters, and only until enough letters
+# were found, so a large text is never copied as a whole.
+def NormalizedSample(text, size, chunk_size = 1 << 16):
+    pieces = []
+    length = 0
+    for start in range(0, len(text), chunk_size):
+        if length >= size:
+            break
+        piece = NormalizeText(text[start:start + chunk_size], strict = True)[:size - length]
+        pieces.append(piece)
+        length += len(piece)
+    return "".join(pieces)
+
+# This function counts the n-grams of the textfile path, which
+# is read in pieces of chunk_size characters and normalized with
+# strict set, and returns the counter.
+def CountFile(path, n = 1, chunk_size = 1 << 20):
+    counter = NgramCounter(n)
+    with open(path, mode = "rt", encoding = "utf-8") as File:
+        while True:
+            chunk = File.read(chunk_size)
+            if chunk == "":
+                break
+            counter.UpdateText(NormalizeText(chunk, strict = True))
+    return counter
+
+# This function counts the n-grams of all the given textfiles
+# in a pool of worker processes and merges the counters. Only
+# one counter per file travels between the processes, never the
+# texts themselves.
+def CountFiles(paths, n = 1, workers = None, chunk_size = 1 << 20):
+    total = NgramCounter(n)
+    with concurrent.futures.ProcessPoolExecutor(workers) as Pool:
+        for counter in Pool.map(CountFile, paths, [n] * len(paths), [chunk_size] * len(paths)):
+            total.Merge(counter)
+    return total
@@ -0,0 +1,181 @@
+import numpy as np
+
+from CipherEngine.Substitution import SubstitutionKey
+from CipherEngine.Vigenere import TextToArray, ArrayToText, VigenereKey
+
+# An IncrementalSubstitution applies a substitution alphabet to
+# a fixed (normalized) text and keeps an index of the positions
+# of every letter A-Z. When the alphabet changes, only the
+# positions of the letters whose substitute changed have to be
+# rewritten, which Update returns as runs of characters.
+class IncrementalSubstitution:
+    def __init__(self, text, alphabet):
+        self.text = text
+        self.key = SubstitutionKey(alphabet)
+        self.result = None
+        codes, encoding = TextToArray(text)
+        self.length = len(codes)
+        self.positions = [np.flatnonzero(codes == ord("A") + i) for i in range(26)]
+
+    # This method returns the substituted text.
+    def Result(self):
+        if self.result is None:
+            self.result = self.key.Apply(self.text)
+        return self.result
+
+    # This method changes the alphabet and returns the changed
+    # parts of the substituted text as a list of (start, end,
+    # replacement) tuples in ascending order, where neighbouring
+    # changed characters are combined into one run. If there are
+    # more than max_runs runs, None is returned instead and no
+    # run is built: rewriting that many runs costs more than
+    # substituting the whole text (see Result).
+    def Update(self, alphabet, max_runs = None):
+        old = self.key.alphabet
+        changed = [i for i in range(26) if alphabet[i] != old[i]]
+        if len(changed) == 0:
+            return []
+        self.key = SubstitutionKey(alphabet)
+        self.result = None
+        count = sum(len(self.positions[i]) for i in changed)
+        if count == 0:
+            return []
+        if (max_runs is not None) and (max_runs < 1):
+            return None
+        if count * 32 < self.length:
+            # Few positions are sorted and split into runs.
+            positions = np.sort(np.concatenate([self.positions[i] for i in changed]))
+            breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+            starts = positions[np.concatenate([[0], breaks])]
+            ends = positions[np.concatenate([breaks - 1, [len(positions) - 1]])] + 1
+        else:
+            # Many positions are marked in a mask (padded by one on
+            # both sides) instead, where the runs start and end
+            # where it switches.
+            mask = np.zeros(self.length + 2, dtype = bool)
+            for i in changed:
+                mask[1:][self.positions[i]] = True
+            switches = mask[1:] != mask[:-1]
+            if (max_runs is not None) and (np.count_nonzero(switches) > 2 * max_runs):
+                return None
+            edges = np.flatnonzero(switches)
+            starts, ends = edges[0::2], edges[1::2]
+        if (max_runs is not None) and (len(starts) > max_runs):
+            return None
+        return [(int(s), int(e), self.key.Apply(self.text[s:e])) for s, e in zip(starts, ends)]
+
+# This function returns the length of the longest common prefix
+# of the strings a and b. It halves the candidate length with
+# slice comparisons, which run at memcmp speed.
+def CommonPrefix(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+# This function returns the length of the longest common suffix
+# of the strings a and b, which is at most limit.
+def CommonSuffix(a, b, limit):
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+# This function returns the number of letters A-Z of each of the
+# lines (strings without line breaks) as an array.
+def LineLetters(lines):
+    codes, encoding = TextToArray("\n".join(lines))
+    letters = np.zeros(len(codes) + 1, dtype = np.int64)
+    np.cumsum((codes >= ord("A")) & (codes <= ord("Z")), out = letters[1:])
+    ends = np.append(np.flatnonzero(codes == ord("\n")), len(codes))
+    return np.diff(letters[ends], prepend = 0)
+
+# An IncrementalVigenere en- or decrypts a text which is being
+# edited, line by line: every line is normalized on its own and
+# en- or decrypted with the key phase given by the number of
+# letters of all lines before it, so the line breaks are kept.
+# It keeps the normalized lines and their letter counts, from
+# which the running prefix counts are computed. Update compares
+# the new text with the previous one and only normalizes the
+# changed lines; the result lines after them are only stale if
+# the number of letters changed by other than a multiple of the
+# key length. Lines returns the result for any range of lines.
+class IncrementalVigenere:
+    def __init__(self, key, sign = 1, normalizer = None, text = ""):
+        if not isinstance(key, VigenereKey):
+            key = VigenereKey(key)
+        self.key = key
+        self.sign = sign
+        self.normalizer = normalizer
+        self.text = text
+        self.lines = [self.Normalize(line) for line in text.split("\n")]
+        self.counts = LineLetters(self.lines)
+        self.prefix = None
+
+    # This method normalizes a line, if there is a normalizer.
+    def Normalize(self, line):
+        if self.normalizer is None:
+            return line
+        return self.normalizer.Apply(line)
+
+    # This method returns the number of lines.
+    def LineCount(self):
+        return len(self.lines)
+
+    # This method replaces the text by text and returns None if
+    # nothing changed, otherwise a tuple (first, removed, added,
+    # stale): the result lines first to first + removed - 1 were
+    # replaced by first to first + added - 1, and if stale is
+    # set, the key phase of all following lines has moved, so
+    # they have to be fetched again with Lines.
+    def Update(self, text):
+        old = self.text
+        start = CommonPrefix(old, text)
+        if (start == len(old)) and (start == len(text)):
+            return None
+        end = CommonSuffix(old, text, min(len(old), len(text)) - start)
+        first = text.count("\n", 0, start)
+        removed = old.count("\n", start, len(old) - end) + 1
+        added = text.count("\n", start, len(text) - end) + 1
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", len(text) - end)
+        if line_end < 0:
+            line_end = len(text)
+        lines = [self.Normalize(line) for line in text[line_start:line_end].split("\n")]
+        counts = LineLetters(lines)
+        delta = int(counts.sum() - self.counts[first:first + removed].sum())
+        self.text = text
+        self.lines[first:first + removed] = lines
+        self.counts = np.concatenate((self.counts[:first], counts,
+                                      self.counts[first + removed:]))
+        self.prefix = None
+        return first, removed, added, delta % self.key.period != 0
+
+    # This method returns the number of letters before each line.
+    def Prefix(self):
+        if self.prefix is None:
+            self.prefix = np.zeros(len(self.counts), dtype = np.int64)
+            np.cumsum(self.counts[:-1], out = self.prefix[1:])
+        return self.prefix
+
+    # This method returns the result lines start to end - 1 as a
+    # list. They are en- or decrypted together in one call.
+    def Lines(self, start, end):
+        end = min(end, len(self.lines))
+        if start >= end:
+            return []
+        codes, encoding = TextToArray("\n".join(self.lines[start:end]))
+        result = self.key.ShiftArray(codes, self.sign, phase = int(self.Prefix()[start]))
+        return ArrayToText(result, encoding).split("\n")
+
+    # This method returns the whole result.
+    def Result(self):
+        return "\n".join(self.Lines(0, len(self.lines)))
@@ -0,0 +1,133 @@
+# threading and queue run jobs in the background and pass their
+# results back; traceback reports errors of jobs
+import queue
+import threading
+import traceback
+
+# This exception is raised inside a job when it has been
+# cancelled or superseded by a newer job.
+class JobCancelled(Exception):
+    pass
+
+# A Job is handed to the work function running in the
+# background. The work function reports its progress through it
+# and is stopped there if the job has been cancelled.
+class Job:
+    def __init__(self):
+        self.cancelled = False
+        self.progress = 0.0
+
+    # This method sets the progress (between 0 and 1). It raises
+    # JobCancelled if the job has been cancelled.
+    def Progress(self, fraction):
+        if self.cancelled:
+            raise JobCancelled()
+        self.progress = fraction
+
+# This function splits text into pieces of chunk_size
+# characters and reports the progress of job before each piece.
+def Chunks(job, text, chunk_size = 1 << 20):
+    for start in range(0, len(text), chunk_size):
+        job.Progress(start / len(text))
+        yield text[start:start + chunk_size]
+    job.Progress(1.0)
+
+# BackgroundJobs runs the transforms of a GUI in worker threads,
+# so the window does not freeze. It only needs an object with
+# the methods after and after_cancel, e.g. the Tk root window,
+# which it uses to poll the results on the main thread.
+# Jobs have names: a new job replaces a running job of the same
+# name, whose result is then discarded, and Schedule debounces
+# repeated requests.
+class BackgroundJobs:
+    def __init__(self, root, interval = 50):
+        self.root = root
+        self.interval = interval
+        self.pending = {}
+        self.running = {}
+        self.results = queue.Queue()
+        self.polling = False
+        # OnProgress is called on the main thread with the progress
+        # of the running jobs, or None when no job is running.
+        self.OnProgress = None
+
+    # This method calls callback on the main thread after delay
+    # milliseconds. If the same name is scheduled again before,
+    # the earlier call is dropped.
+    def Schedule(self, name, callback, delay):
+        if name in self.pending:
+            self.root.after_cancel(self.pending[name])
+        def Fire():
+            del self.pending[name]
+            callback()
+        self.pending[name] = self.root.after(delay, Fire)
+
+    # This method tells whether a job of the given name is
+    # running.
+    def Running(self, name):
+        return name in self.running
+
+    # This method runs work(job) in a worker thread and then
+    # done(result) on the main thread, unless the job has been
+    # cancelled or superseded in the meantime. If work raises an
+    # exception, failed(error) is called on the main thread
+    # instead, e.g. to tell the user; the traceback is printed
+    # either way.
+    def Run(self, name, work, done, failed = None):
+        if name in self.running:
+            self.running[name].cancelled = True
+        job = Job()
+        self.running[name] = job
+        threading.Thread(target = self.Work, args = (name, job, work, done, failed),
+                         daemon = True).start()
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.interval, self.Poll)
+
+    # This method is run by the worker threads. It hands the
+    # result or the exception of work to Poll.
+    def Work(self, name, job, work, done, failed):
+        try:
+            self.results.put((name, job, done, failed, work(job), None))
+        except JobCancelled:
+            self.results.put((name, job, done, failed, None, None))
+        except Exception as error:
+            self.results.put((name, job, done, failed, None, error))
+
+    # This method is called periodically on the main thread while
+    # jobs are running. It hands the results of finished jobs to
+    # their done functions, and the exceptions of failed jobs to
+    # their failed functions, and reports the progress.
+    def Poll(self):
+        while not self.results.empty():
+            name, job, done, failed, result, error = self.results.get()
+            if self.running.get(name) is not job:
+                continue
+            del self.running[name]
+            if job.cancelled:
+                continue
+            if error is not None:
+                traceback.print_exception(type(error), error, error.__traceback__)
+                if failed is not None:
+                    failed(error)
+            else:
+                done(result)
+        if self.running:
+            if self.OnProgress is not None:
+                self.OnProgress(min(job.progress for job in self.running.values()))
+            self.root.after(self.interval, self.Poll)
+        else:
+            self.polling = False
+            if self.OnProgress is not None:
+                self.OnProgress(None)
+
+    # This method cancels all running and scheduled jobs.
+    def Cancel(self):
+        for job in self.running.values():
+            job.cancelled = True
+        self.running.clear()
+        for after in self.pending.values():
+            self.root.after_cancel(after)
+        self.pending.clear()
+        if self.OnProgress is not None:
+            self.OnProgress(None)
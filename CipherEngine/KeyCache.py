@@ -0,0 +1,125 @@
+# collections and threading provide the ordered and locked
+# cache entries
+import collections
+import threading
+
+from CipherEngine.Normalize import GetNormalizer, NormalizeText
+from CipherEngine.Substitution import (CaesarAlphabet, AtbashAlphabet, InverseAlphabet,
+                                       SubstitutionKey)
+from CipherEngine.Vigenere import VigenereKey
+
+# The cipher modes, named as in the batch tool and the service
+CIPHER_MODES = ("caesar", "atbash", "substitution", "vigenere")
+
+# This function returns the alphabet (substitution modes) or the
+# normalized key word (Vigenère) and the sign used to en- or
+# decrypt with key in mode. For Caesar, key is the first letter
+# of the alphabet, for general substitution the 26 substitutes
+# of A-Z, which must contain every letter once for decryption.
+# It raises ValueError if the key is not valid for mode.
+def CompileKey(mode, key, decrypt = False):
+    if mode == "vigenere":
+        key = NormalizeText(key or "", strict = True)
+        if len(key) == 0:
+            raise ValueError("Vigenère key must contain letters")
+        return key, -1 if decrypt else 1
+    if mode == "atbash":
+        # Atbash undoes itself.
+        return AtbashAlphabet(), 1
+    if mode == "caesar":
+        alphabet = CaesarAlphabet(key or "a")
+    elif mode == "substitution":
+        alphabet = key or ""
+        if len(alphabet) != 26:
+            raise ValueError("Substitution alphabet must have 26 characters")
+    else:
+        raise ValueError("Unknown cipher mode %r" % mode)
+    if decrypt:
+        alphabet = InverseAlphabet(alphabet)
+    return alphabet, 1
+
+# A CompiledKey holds everything needed to en- or decrypt texts
+# with one key: the normalizer for the options and either the
+# substitution key (translate tables) or the Vigenère key
+# (repeated shift arrays).
+class CompiledKey:
+    def __init__(self, mode, key, decrypt = False, keep_blanks = False,
+                 keep_nonalpha = False):
+        key, self.sign = CompileKey(mode, key, decrypt)
+        self.mode = mode
+        self.normalizer = GetNormalizer(keep_blanks, keep_nonalpha)
+        if mode == "vigenere":
+            self.vigenere = VigenereKey(key)
+            self.substitution = None
+        else:
+            self.vigenere = None
+            self.substitution = SubstitutionKey(key)
+
+    # This method returns the normalized key word (Vigenère) or
+    # the alphabet.
+    def Key(self):
+        if self.vigenere is not None:
+            return self.vigenere.key
+        return self.substitution.alphabet
+
+    # This method normalizes a whole text and en- or decrypts it.
+    def Apply(self, text):
+        text = self.normalizer.Apply(text)
+        if self.vigenere is not None:
+            return self.vigenere.Shift(text, self.sign)
+        return self.substitution.Apply(text)
+
+# A KeyCache keeps the maxsize most recently used compiled keys,
+# so that repeated keys are neither normalized nor compiled
+# again. It counts hits, misses and evictions and can be shared
+# between threads.
+class KeyCache:
+    def __init__(self, maxsize = 64):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # This method returns the CompiledKey for the parameters (see
+    # CompiledKey), from the cache if possible. Invalid keys raise
+    # ValueError and are not cached.
+    def Get(self, mode, key, decrypt = False, keep_blanks = False, keep_nonalpha = False):
+        name = (mode, key, bool(decrypt), bool(keep_blanks), bool(keep_nonalpha))
+        with self.lock:
+            compiled = self.entries.get(name)
+            if compiled is not None:
+                self.entries.move_to_end(name)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        compiled = CompiledKey(mode, key, decrypt, keep_blanks, keep_nonalpha)
+        with self.lock:
+            self.entries[name] = compiled
+            self.entries.move_to_end(name)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+        return compiled
+
+    # This method returns the statistics of the cache.
+    def Stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self.entries),
+                    "maxsize": self.maxsize}
+
+    # This method removes all entries and resets the statistics.
+    def Clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+# The cache shared by all users of GetCompiledKey
+Keys = KeyCache()
+
+# This function returns the CompiledKey for the parameters from
+# the shared cache.
+def GetCompiledKey(mode, key, decrypt = False, keep_blanks = False, keep_nonalpha = False):
+    return Keys.Get(mode, key, decrypt, keep_blanks, keep_nonalpha)
@@ -0,0 +1,151 @@
+# numpy provides the vectorized array operations
+import numpy as np
+
+from CipherEngine.Vigenere import CheckKey
+
+# The memory in bytes which ManyKeysChunks may use for one block
+# of ciphertexts and its temporary arrays
+MANY_KEYS_BUDGET = 1 << 28
+# Bytes used per character of a ciphertext while it is computed:
+# the result, the key stream and the temporary of np.where
+BYTES_PER_CHARACTER = 3
+
+# The functions of this module en- or decrypt one normalized
+# ASCII text with many keys at once. The ciphertexts are
+# returned as the rows of a 2-D uint8 array of character codes,
+# which ManyToTexts converts into strings.
+
+# This function converts text into a uint8 array of character
+# codes. It raises ValueError if text is not ASCII, as every
+# normalized text without "Keep non-alphabetic chars" is.
+def AsciiCodes(text):
+    if not text.isascii():
+        raise ValueError("Text must be normalized ASCII text")
+    return np.frombuffer(text.encode("ascii"), dtype = np.uint8)
+
+# This function converts the rows of codes into strings.
+def ManyToTexts(codes):
+    return [row.tobytes().decode("ascii") for row in codes]
+
+# This function returns the substitution alphabets as a (k, 26)
+# uint8 array. alphabets is a list of 26-character ASCII strings
+# or already such an array.
+def AlphabetMatrix(alphabets):
+    if isinstance(alphabets, np.ndarray):
+        matrix = alphabets.astype(np.uint8)
+    else:
+        if any((len(a) != 26) or not a.isascii() for a in alphabets):
+            raise ValueError("Substitution alphabets must have 26 ASCII characters")
+        matrix = np.frombuffer("".join(alphabets).encode("ascii"), dtype = np.uint8)
+    return matrix.reshape(-1, 26)
+
+# This function returns the Caesar alphabets (as CaesarAlphabet)
+# for an array of shifts (0 = "a", 1 = "b", ...) as a (k, 26)
+# uint8 array.
+def CaesarAlphabetMatrix(shifts):
+    shifts = np.asarray(shifts, dtype = np.intp).reshape(-1, 1)
+    return (ord("a") + (shifts + np.arange(26)) % 26).astype(np.uint8)
+
+# This function returns the inverse (as InverseAlphabet) of every
+# row of an alphabet matrix. Every row must contain each letter
+# once, in any case.
+def InverseAlphabetMatrix(matrix):
+    letters = AlphabetMatrix(matrix) & np.uint8(0xDF)
+    if not (np.sort(letters, axis = 1) == np.arange(ord("A"), ord("Z") + 1)).all():
+        raise ValueError("Substitution alphabets must contain every letter once")
+    return (ord("a") + np.argsort(letters, axis = 1)).astype(np.uint8)
+
+# This function substitutes each letter A-Z of text by every
+# alphabet (see AlphabetMatrix) and returns a (k, len(text))
+# uint8 array. One lookup table per alphabet is built and the
+# text codes index all tables at once.
+def SubstituteMany(text, alphabets):
+    codes = AsciiCodes(text)
+    matrix = AlphabetMatrix(alphabets)
+    tables = np.tile(np.arange(256, dtype = np.uint8), (len(matrix), 1))
+    tables[:, ord("A"):ord("Z") + 1] = matrix
+    return tables[:, codes]
+
+# This function returns the Vigenère keys grouped by length, as
+# a list of (rows, shifts) pairs: the indices of the keys and a
+# (len(rows), length) uint8 array of their shifts. keys is a list
+# of normalized key words or a 2-D uint8 array of the letters of
+# keys of equal length.
+def KeyGroups(keys):
+    if isinstance(keys, np.ndarray):
+        letters = keys.astype(np.uint8)
+        if ((letters < ord("A")) | (letters > ord("Z"))).any():
+            raise ValueError("Key must only contain the letters A-Z")
+        return [(np.arange(len(letters)), letters - np.uint8(ord("A")))]
+    groups = {}
+    for i, key in enumerate(keys):
+        CheckKey(key)
+        groups.setdefault(len(key), []).append(i)
+    result = []
+    for length, rows in groups.items():
+        letters = "".join(keys[i] for i in rows).encode("ascii")
+        shifts = np.frombuffer(letters, dtype = np.uint8).reshape(-1, length) - np.uint8(ord("A"))
+        result.append((np.array(rows), shifts))
+    return result
+
+# This function en- (sign 1) or decrypts (sign -1) text with
+# every Vigenère key (see KeyGroups) and returns a
+# (k, len(text)) uint8 array, identical to calling VigenereShift
+# for every key. advance_on_all and phase work as in
+# VigenereShiftArray; phase is the number of letters (or
+# characters) before text. The key stream of all keys of one
+# length is gathered with a single index array.
+def VigenereMany(text, keys, sign = 1, advance_on_all = False, phase = 0):
+    codes = AsciiCodes(text)
+    mask = (codes >= ord("A")) & (codes <= ord("Z"))
+    if advance_on_all:
+        index = np.arange(phase, phase + len(codes), dtype = np.intp)
+    else:
+        index = np.cumsum(mask, dtype = np.intp)
+        index += phase - 1
+    groups = KeyGroups(keys)
+    result = np.empty((sum(len(rows) for rows, shifts in groups), len(codes)), dtype = np.uint8)
+    # Non-letters may wrap around in the unsigned arithmetic,
+    # but they are discarded by np.where anyway.
+    letters = codes - np.uint8(ord("A"))
+    for rows, shifts in groups:
+        if sign < 0:
+            shifts = (26 - shifts) % 26
+        stream = shifts[:, index % shifts.shape[1]]
+        stream += letters
+        stream %= 26
+        stream += ord("A")
+        result[rows] = np.where(mask, stream, codes)
+    return result
+
+# This generator does the same as SubstituteMany (mode
+# "substitution", keys are alphabets) or VigenereMany (mode
+# "vigenere") in blocks whose size stays within budget bytes. It
+# yields (first_key, first_character, codes) for every block,
+# where codes holds the ciphertexts of some keys for a piece of
+# text. Keys are split first; the text is only split if a single
+# ciphertext exceeds the budget.
+def ManyKeysChunks(text, keys, mode = "vigenere", sign = 1, advance_on_all = False,
+                   budget = MANY_KEYS_BUDGET):
+    if mode not in ("substitution", "vigenere"):
+        raise ValueError("Unknown cipher mode %r" % mode)
+    if (mode == "substitution") and (sign < 0):
+        keys = InverseAlphabetMatrix(keys)
+    capacity = max(1, budget // BYTES_PER_CHARACTER)
+    columns = max(1, min(len(text), capacity))
+    rows = max(1, capacity // columns)
+    phase = 0
+    for start in range(0, len(text), columns):
+        piece = text[start:start + columns]
+        for first in range(0, len(keys), rows):
+            if mode == "substitution":
+                codes = SubstituteMany(piece, keys[first:first + rows])
+            else:
+                codes = VigenereMany(piece, keys[first:first + rows], sign,
+                                     advance_on_all, phase)
+            yield first, start, codes
+        if advance_on_all:
+            phase += len(piece)
+        else:
+            codes = AsciiCodes(piece)
+            phase += int(np.count_nonzero((codes >= ord("A")) & (codes <= ord("Z"))))
@@ -0,0 +1,73 @@
+# The UTF-8 encodings of the characters which NormalizeText
+# expands to two letters.
+UMLAUTS = [("ä", "AE"), ("Ä", "AE"), ("ö", "OE"), ("Ö", "OE"),
+           ("ü", "UE"), ("Ü", "UE"), ("ß", "SS")]
+UMLAUT_BYTES = [(c.encode("utf-8"), s.encode("ascii")) for c, s in UMLAUTS]
+
+# A Normalizer is compiled once for one combination of the
+# settings "Keep blanks" and "Keep non-alphabetic chars" (or
+# strict mode, in which only letters are kept). It works on the
+# UTF-8 encoding of the text: umlauts and sharp s are expanded
+# with bytes.replace, then a single bytes.translate call converts
+# letters to upper case and deletes unwanted characters. Pure
+# ASCII text skips the expansion.
+class Normalizer:
+    def __init__(self, keep_blanks = False, keep_nonalpha = False, strict = False):
+        if strict:
+            keep_blanks = False
+            keep_nonalpha = False
+        self.keep_blanks = keep_blanks
+        self.keep_nonalpha = keep_nonalpha
+        table = bytearray(range(256))
+        for i in range(26):
+            table[ord("a")+i] = ord("A")+i
+        table[10] = ord(" ")
+        self.table = bytes(table)
+        delete = bytearray()
+        for b in range(256):
+            if (ord("A") <= b <= ord("Z")) or (ord("a") <= b <= ord("z")):
+                continue
+            if (b == ord(" ")) or (b == 10):
+                if not keep_blanks:
+                    delete.append(b)
+            elif not keep_nonalpha:
+                # Once the umlauts are expanded, all bytes of
+                # multi-byte characters belong to non-alphabetic
+                # chars and are deleted together.
+                delete.append(b)
+        self.delete = bytes(delete)
+
+    # This method normalizes the UTF-8 bytes data and returns
+    # the result as bytes. If ascii is set, data is known to
+    # contain no umlauts.
+    def ApplyBytes(self, data, ascii = False):
+        data = bytes(data)
+        if not ascii:
+            for c, s in UMLAUT_BYTES:
+                data = data.replace(c, s)
+        return data.translate(self.table, self.delete)
+
+    # This method normalizes text.
+    def Apply(self, text):
+        if text.isascii():
+            return self.ApplyBytes(text.encode("ascii"), ascii = True).decode("ascii")
+        return self.ApplyBytes(text.encode("utf-8", "surrogatepass")).decode("utf-8", "surrogatepass")
+
+# The compiled normalizers, one for each combination of options.
+Normalizers = {}
+
+# This function returns the compiled normalizer for the given
+# options.
+def GetNormalizer(keep_blanks = False, keep_nonalpha = False, strict = False):
+    options = (bool(keep_blanks) and not strict, bool(keep_nonalpha) and not strict)
+    if options not in Normalizers:
+        Normalizers[options] = Normalizer(*options)
+    return Normalizers[options]
+
+# This function normalizes the parameter text according to the
+# options keep_blanks ("Keep blanks") and keep_nonalpha ("Keep
+# non-alphabetic chars"). Letters are converted to upper case,
+# umlauts and sharp s are expanded to two letters. If strict is
+# set, only letters are kept regardless of the options.
+def NormalizeText(text, keep_blanks = False, keep_nonalpha = False, strict = False):
+    return GetNormalizer(keep_blanks, keep_nonalpha, strict).Apply(text)
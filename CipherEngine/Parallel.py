@@ -0,0 +1,121 @@
+# concurrent.futures provides the process pool, itertools the
+# prefix sums over the chunks
+import concurrent.futures
+import itertools
+import os
+
+import numpy as np
+
+from CipherEngine.Normalize import UMLAUT_BYTES, NormalizeText
+from CipherEngine.Vigenere import KeyShifts, TextToArray, VigenereShiftArray
+
+# The bytes of the ASCII letters, all bytes except blanks, line
+# feeds and carriage returns, and a table of the bytes which
+# follow the lead byte 0xC3 in the UTF-8 encodings of the
+# umlauts and sharp s
+LETTER_BYTES = bytes(range(ord("A"), ord("Z") + 1)) + bytes(range(ord("a"), ord("z") + 1))
+NONBLANK_BYTES = bytes(b for b in range(256) if b not in b" \n\r")
+UMLAUT_FOLLOWERS = np.zeros(256, dtype = bool)
+UMLAUT_FOLLOWERS[[c[1] for c, s in UMLAUT_BYTES]] = True
+
+# This function splits the file path into byte ranges of about
+# chunk_size bytes. A boundary is moved forward until it neither
+# splits a UTF-8 sequence nor a carriage return / line feed
+# pair, so every range can be decoded on its own.
+def SplitFile(path, chunk_size):
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, mode = "rb") as File:
+        b = chunk_size
+        while b < size:
+            File.seek(b - 1)
+            prev = File.read(1)
+            while b < size:
+                c = File.read(1)
+                if (0x80 <= c[0] <= 0xBF) or ((prev == b"\r") and (c == b"\n")):
+                    prev = c
+                    b += 1
+                else:
+                    break
+            if b < size:
+                bounds.append(b)
+            b += chunk_size
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# This function reads the byte range start:end of the file path
+# and normalizes it. Line ends are translated the same way as
+# when reading the file in text mode.
+def ReadNormalizedChunk(path, start, end, keep_blanks, keep_nonalpha):
+    with open(path, mode = "rb") as File:
+        File.seek(start)
+        text = File.read(end - start).decode("utf-8")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return NormalizeText(text, keep_blanks, keep_nonalpha)
+
+# This function is the first pass of a worker. It returns the
+# number of letters and the number of output bytes of a chunk.
+# Both are counted on the raw bytes without normalizing them:
+# umlauts and sharp s become two letters, which take as many
+# bytes as their UTF-8 encoding, and a carriage return / line
+# feed pair becomes a single blank.
+def CountChunk(args):
+    path, start, end, keep_blanks, keep_nonalpha = args
+    with open(path, mode = "rb") as File:
+        File.seek(start)
+        data = File.read(end - start)
+    letters = len(data) - len(data.translate(None, LETTER_BYTES))
+    if not data.isascii():
+        codes = np.frombuffer(data, dtype = np.uint8)
+        following = codes[np.flatnonzero(codes[:-1] == 0xC3) + 1]
+        letters += 2 * int(np.count_nonzero(UMLAUT_FOLLOWERS[following]))
+    if not (keep_blanks or keep_nonalpha):
+        return letters, letters
+    pairs = data.count(b"\r\n")
+    if keep_blanks and keep_nonalpha:
+        return letters, len(data) - pairs
+    blanks = len(data.translate(None, NONBLANK_BYTES)) - pairs
+    if keep_nonalpha:
+        size = len(data) - pairs - blanks
+    else:
+        size = letters + blanks
+    return letters, size
+
+# This function is the second pass of a worker. It encrypts a
+# chunk starting with the key index phase and writes it to the
+# output file at the byte offset offset.
+def EncryptChunk(args):
+    in_path, out_path, start, end, keep_blanks, keep_nonalpha, key, sign, phase, offset = args
+    codes, encoding = TextToArray(ReadNormalizedChunk(in_path, start, end, keep_blanks, keep_nonalpha))
+    result = VigenereShiftArray(codes, KeyShifts(key), sign, phase = phase)
+    if encoding != "ascii":
+        result = np.frombuffer(result.tobytes().decode(encoding).encode("utf-8"), dtype = np.uint8)
+    with open(out_path, mode = "r+b") as File:
+        File.seek(offset)
+        File.write(result.tobytes())
+
+# This function does the same as VigenereFile, but splits the
+# file into chunks of about chunk_size bytes and processes them
+# in a pool of worker processes. A first pass counts the letters
+# and output bytes of every chunk. Their prefix sums give the
+# key index and output offset of every chunk, so the chunks can
+# be encrypted independently in a second pass and written
+# directly to their place in the output file. The output is
+# identical to VigenereFile.
+def VigenereFileParallel(in_path, out_path, key, keep_blanks = False, keep_nonalpha = False,
+                         sign = 1, chunk_size = 1 << 24, workers = None):
+    KeyShifts(key)
+    ranges = SplitFile(in_path, chunk_size)
+    with concurrent.futures.ProcessPoolExecutor(workers) as Pool:
+        counts = list(Pool.map(CountChunk,
+                               [(in_path, start, end, keep_blanks, keep_nonalpha)
+                                for start, end in ranges]))
+        phases = [0] + list(itertools.accumulate(c[0] for c in counts))
+        offsets = [0] + list(itertools.accumulate(c[1] for c in counts))
+        with open(out_path, mode = "wb") as File:
+            File.truncate(offsets[-1])
+        list(Pool.map(EncryptChunk,
+                      [(in_path, out_path, start, end, keep_blanks, keep_nonalpha,
+                        key, sign, phases[i] % len(key), offsets[i])
+                       for i, (start, end) in enumerate(ranges)]))
+    return offsets[-1]
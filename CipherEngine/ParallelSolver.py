@@ -0,0 +1,135 @@
+# concurrent.futures provides the worker pools, shared_memory
+# shares the quadgram table between the worker processes, time
+# the throughput
+import collections
+import concurrent.futures
+import time
+from multiprocessing import shared_memory, util
+
+import numpy as np
+
+from CipherEngine.Analysis import LetterArray
+from CipherEngine.Solver import SOLVER_SAMPLE, LetterQuadgramIndex, HillClimb
+
+# The data of a worker: the quadgram table, which is a view of
+# the shared memory block, the ciphertext letters and their
+# quadgram index.
+WorkerMemory = None
+WorkerTable = None
+WorkerLetters = None
+WorkerIndex = None
+
+# This function is run once in every worker process. It
+# attaches the shared memory block holding the quadgram table,
+# so the table is not pickled for every restart, and builds the
+# quadgram index of the letters. The block is closed again when
+# the worker exits. If the solver has already finished and
+# removed the block, the worker has nothing to do.
+def InitWorker(name, shape, dtype, letters):
+    global WorkerMemory, WorkerTable, WorkerLetters, WorkerIndex
+    try:
+        WorkerMemory = shared_memory.SharedMemory(name = name)
+    except FileNotFoundError:
+        return
+    WorkerTable = np.ndarray(shape, dtype = dtype, buffer = WorkerMemory.buf)
+    WorkerLetters = letters
+    WorkerIndex = LetterQuadgramIndex(letters)
+    util.Finalize(None, CloseWorker, exitpriority = 10)
+
+# This function closes the shared memory block of a worker. The
+# view of the table has to be released first.
+def CloseWorker():
+    global WorkerMemory, WorkerTable
+    WorkerTable = None
+    if WorkerMemory is not None:
+        WorkerMemory.close()
+        WorkerMemory = None
+
+# This function runs one restart: a hill climb from the random
+# key given by seed. It returns the key as a list, its score and
+# the number of swaps tried.
+def Restart(letters, table, index, seed):
+    rng = np.random.default_rng(seed)
+    key, score, tried = HillClimb(letters, table, rng.permutation(26), rng, index)
+    return key.tolist(), score, tried
+
+# This function runs one restart in a worker process with the
+# data set up by InitWorker.
+def RestartWorker(seed):
+    return Restart(WorkerLetters, WorkerTable, WorkerIndex, seed)
+
+# This function solves a general substitution with restarts
+# random restarts of the hill climb in a pool of workers
+# processes (or threads, if use_threads is set). The quadgram
+# table is placed in shared memory which all worker processes
+# read; worker threads use the table directly.
+# It is a generator: after every finished restart it yields
+# the best decryption alphabet so far (in the layout of
+# SolveSubstitution), its score, the number of finished
+# restarts, the number of swaps they tried and the seconds
+# since the solver started, whose ratio is the throughput of
+# the whole pool in swaps per second. As soon as agree restarts have ended at the best
+# key, the remaining restarts are cancelled. Keys are compared
+# only on the letters which occur in the ciphertext, since the
+# others do not change the score.
+# If job (see Jobs.Job) is given, its progress is set while the
+# restarts run and JobCancelled is raised once it is cancelled.
+# When the generator ends, is closed or raises, the restarts
+# which have not started are cancelled without waiting for the
+# running ones.
+def SolveSubstitutionParallel(text, table, restarts = 32, workers = None, agree = 3,
+                              seed = None, use_threads = False, mp_context = None,
+                              job = None, poll = 0.1):
+    start = time.perf_counter()
+    letters = LetterArray(text)[:SOLVER_SAMPLE]
+    if len(letters) < 4:
+        raise ValueError("Not enough letters to analyse")
+    present = np.flatnonzero(np.bincount(letters, minlength = 26))
+    seeds = np.random.SeedSequence(seed).generate_state(restarts)
+    memory = None
+    shared = None
+    pool = None
+    try:
+        if use_threads:
+            index = LetterQuadgramIndex(letters)
+            pool = concurrent.futures.ThreadPoolExecutor(workers)
+            futures = [pool.submit(Restart, letters, table, index, int(s)) for s in seeds]
+        else:
+            memory = shared_memory.SharedMemory(create = True, size = table.nbytes)
+            shared = np.ndarray(table.shape, dtype = table.dtype, buffer = memory.buf)
+            shared[:] = table
+            initargs = (memory.name, table.shape, table.dtype, letters)
+            pool = concurrent.futures.ProcessPoolExecutor(workers, mp_context = mp_context,
+                                                          initializer = InitWorker,
+                                                          initargs = initargs)
+            futures = [pool.submit(RestartWorker, int(s)) for s in seeds]
+        hits = collections.Counter()
+        best_key = None
+        best_score = None
+        done = 0
+        tried = 0
+        pending = set(futures)
+        while pending:
+            if job is not None:
+                job.Progress(done / restarts)
+            finished, pending = concurrent.futures.wait(
+                pending, timeout = poll if job is not None else None,
+                return_when = concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                key, score, swaps = future.result()
+                done += 1
+                tried += swaps
+                hits[tuple(np.asarray(key)[present])] += 1
+                if (best_score is None) or (score > best_score):
+                    best_key, best_score = key, score
+                yield ("".join(chr(ord("a") + k) for k in best_key), best_score, done,
+                       tried, time.perf_counter() - start)
+                if hits[tuple(np.asarray(best_key)[present])] >= agree:
+                    return
+    finally:
+        if pool is not None:
+            pool.shutdown(wait = False, cancel_futures = True)
+        shared = None
+        if memory is not None:
+            memory.close()
+            memory.unlink()
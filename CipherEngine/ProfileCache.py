@@ -0,0 +1,148 @@
+# hashlib computes the content hashes which identify cached
+# profiles, numpy stores them as .npz files
+import collections
+import hashlib
+import os
+import threading
+import zipfile
+import zlib
+
+import numpy as np
+
+from CipherEngine.Analysis import LetterArray, LetterProfile
+from CipherEngine.Counting import NgramCounter
+from CipherEngine.Normalize import NormalizeText
+from CipherEngine.Quadgrams import QuadgramTableFromCounts
+
+# The directory in which the profiles are stored.
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "substitutionEncryption")
+
+# Profiles contain the counts of all n-grams up to this length.
+PROFILE_MAX_N = 4
+
+# Version of the file format, part of the cache key.
+PROFILE_VERSION = 1
+
+# The number of profiles which are kept in memory.
+PROFILE_CACHE_SIZE = 8
+
+# The most recently used profiles, by cache key, and the lock
+# which guards them, as profiles are also requested by
+# background jobs.
+Profiles = collections.OrderedDict()
+ProfilesLock = threading.Lock()
+
+# A ReferenceProfile holds the unigram to quadgram counts of a
+# sample text and the path of the file it is stored in, if any.
+class ReferenceProfile:
+    def __init__(self, path = None, counts = None):
+        self.path = path
+        self.counts = dict(counts or {})
+
+    # This method returns the array of 26^n n-gram counts.
+    def Counts(self, n):
+        return self.counts[n]
+
+    # This method returns the number of letters of the sample.
+    def Letters(self):
+        return int(self.Counts(1).sum())
+
+    # This method returns the relative letter frequencies.
+    def LetterProfile(self):
+        return LetterProfile(self.Counts(1))
+
+    # This method returns the quadgram table of the sample.
+    def QuadgramTable(self):
+        return QuadgramTableFromCounts(self.Counts(4))
+
+# This function returns the cache key of a sample text whose
+# content has the given SHA-256 digest. Profiles are always
+# counted on the text normalized with strict set, so this is
+# the only normalization option in the key.
+def ProfileKey(digest):
+    return "profile-v%d-strict-%s" % (PROFILE_VERSION, digest)
+
+# This function counts the n-grams up to PROFILE_MAX_N of the
+# text given as an iterable of pieces and returns the profile.
+# If possible, it is stored as cache_path.
+def BuildProfile(pieces, cache_path):
+    counters = [NgramCounter(n) for n in range(1, PROFILE_MAX_N + 1)]
+    for piece in pieces:
+        letters = LetterArray(NormalizeText(piece, strict = True))
+        for counter in counters:
+            counter.Update(letters)
+    counts = {counter.n: counter.counts for counter in counters}
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+        with open(cache_path + ".tmp", mode = "wb") as File:
+            np.savez_compressed(File, **{"n%d" % n: c for n, c in counts.items()})
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError:
+        return ReferenceProfile(counts = counts)
+    return ReferenceProfile(cache_path, counts)
+
+# This function loads the profile stored as cache_path. All
+# arrays are read at once and the file is closed again. If the
+# file is missing, damaged or incomplete, None is returned.
+def LoadProfile(cache_path):
+    try:
+        with np.load(cache_path) as data:
+            counts = {n: data["n%d" % n] for n in range(1, PROFILE_MAX_N + 1)}
+    # A plain .npy file is no context manager and raises TypeError.
+    except (OSError, ValueError, KeyError, EOFError, TypeError, zipfile.BadZipFile,
+            zlib.error):
+        return None
+    if any(counts[n].shape != (26 ** n,) for n in counts):
+        return None
+    return ReferenceProfile(cache_path, counts)
+
+# This function returns the profile with the given key, either
+# from memory, from the cache directory or by building it from
+# the pieces returned by GetPieces. A damaged file in the cache
+# directory is replaced by a newly built profile. Only the
+# PROFILE_CACHE_SIZE most recently used profiles are kept in
+# memory.
+def GetProfile(key, GetPieces, cache_dir = None):
+    with ProfilesLock:
+        profile = Profiles.get(key)
+        if profile is not None:
+            Profiles.move_to_end(key)
+            return profile
+    cache_path = os.path.join(cache_dir or CACHE_DIR, key + ".npz")
+    profile = LoadProfile(cache_path)
+    if profile is None:
+        profile = BuildProfile(GetPieces(), cache_path)
+    with ProfilesLock:
+        Profiles[key] = profile
+        Profiles.move_to_end(key)
+        while len(Profiles) > PROFILE_CACHE_SIZE:
+            Profiles.popitem(last = False)
+    return profile
+
+# This function reads the textfile path in pieces of chunk_size
+# characters.
+def ReadPieces(path, chunk_size = 1 << 20):
+    with open(path, mode = "rt", encoding = "utf-8") as File:
+        while True:
+            chunk = File.read(chunk_size)
+            if chunk == "":
+                break
+            yield chunk
+
+# This function returns the profile of the sample textfile
+# path. The file is only counted the first time; later calls
+# only hash its content.
+def ProfileForFile(path, cache_dir = None):
+    digest = hashlib.sha256()
+    with open(path, mode = "rb") as File:
+        while True:
+            chunk = File.read(1 << 20)
+            if chunk == b"":
+                break
+            digest.update(chunk)
+    return GetProfile(ProfileKey(digest.hexdigest()), lambda: ReadPieces(path), cache_dir)
+
+# This function returns the profile of the sample text text.
+def ProfileForText(text, cache_dir = None):
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    return GetProfile(ProfileKey(digest), lambda: [text], cache_dir)
@@ -0,0 +1,46 @@
+# numpy provides the quadgram table as an array
+import numpy as np
+
+# Number of possible quadgrams (26^4)
+QUADGRAMS = 26 ** 4
+
+# This function returns the codes of all quadgrams of the
+# letter array letters (see Analysis.LetterArray), i.e. the
+# quadgram starting at index i has the code
+# l[i]*26^3 + l[i+1]*26^2 + l[i+2]*26 + l[i+3].
+def QuadgramCodes(letters):
+    l = letters.astype(np.intp)
+    return ((l[:-3] * 26 + l[1:-2]) * 26 + l[2:-1]) * 26 + l[3:]
+
+# This function builds a table of the logarithmic probabilities
+# of all 26^4 quadgrams from the letter array of a sample text.
+def BuildQuadgramTable(letters):
+    return QuadgramTableFromCounts(np.bincount(QuadgramCodes(letters), minlength = QUADGRAMS))
+
+# This function builds the table of logarithmic probabilities
+# from an array of 26^4 quadgram counts. Quadgrams which do not
+# occur get the probability of 1/100 of an occurrence.
+def QuadgramTableFromCounts(counts):
+    counts = np.asarray(counts, dtype = np.float64)
+    total = max(counts.sum(), 1.0)
+    counts = np.where(counts == 0, 0.01, counts)
+    return np.log(counts / total).astype(np.float32)
+
+# This function saves a quadgram table, e.g. one built from a
+# large corpus, so it can be loaded instead of being rebuilt.
+def SaveQuadgramTable(path, table):
+    np.save(path, table)
+
+# This function loads a quadgram table saved by
+# SaveQuadgramTable.
+def LoadQuadgramTable(path):
+    table = np.load(path)
+    if table.shape != (QUADGRAMS,):
+        raise ValueError("Not a quadgram table")
+    return table.astype(np.float32, copy = False)
+
+# This function returns the quadgram score of the letter array
+# letters, i.e. the sum of the logarithmic probabilities of all
+# its quadgrams.
+def QuadgramScore(letters, table):
+    return float(table[QuadgramCodes(letters)].sum(dtype = np.float64))
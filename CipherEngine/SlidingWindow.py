@@ -0,0 +1,177 @@
+# numpy provides the vectorized counting and scoring
+import numpy as np
+
+from CipherEngine.Analysis import GERMAN_FREQUENCIES, LetterArray, LetterProfile
+from CipherEngine.Normalize import NormalizeText
+
+# The default number of letters of a window and the number of
+# letters it moves per step
+WINDOW_SIZE = 2000
+WINDOW_STEP = 100
+# The change score (see SlidingWindow) above which a position is
+# reported as a change point. The score of two windows of the
+# same source has the mean 25 (the degrees of freedom).
+CHANGE_THRESHOLD = 100.0
+
+# A SlidingWindow slides a window of size letters across a text
+# which arrives in pieces, moving step letters at a time. The
+# letters are counted in blocks of step letters, and the counts
+# of the window are kept rolling: the block which enters is
+# added and the block which leaves is subtracted, so each step
+# costs the same however large the window is. For every window
+# the index of coincidence and the chi-squared statistic against
+# the reference profile are computed from its 26 counts.
+# The change score of a position compares the windows just
+# before and just after it with the two-sample chi-squared
+# statistic, which jumps where the letter frequencies change,
+# e.g. where messages under different keys were concatenated.
+# The maximum of every run of scores above threshold is recorded
+# as a change point. Only the last 2 * size letters are kept, so
+# texts of any length are analysed in a single pass.
+class SlidingWindow:
+    def __init__(self, size = WINDOW_SIZE, step = WINDOW_STEP, profile = None,
+                 threshold = CHANGE_THRESHOLD):
+        if (step < 1) or (size < step):
+            raise ValueError("The window must hold at least one step")
+        if profile is None:
+            profile = LetterProfile(GERMAN_FREQUENCIES)
+        self.step = step
+        self.blocks = size // step
+        self.size = self.blocks * step
+        self.profile = np.asarray(profile, dtype = np.float64)
+        self.threshold = threshold
+        self.tail = np.zeros(0, dtype = np.uint8)
+        # The counts of the last 2 * blocks blocks, the number of
+        # letters in all blocks and the letter counts before the
+        # first kept block
+        self.history = np.zeros((0, 26), dtype = np.int64)
+        self.position = 0
+        self.base = np.zeros(26, dtype = np.int64)
+        # The change points as (position, score) pairs, the letter
+        # counts before each of them and the open run of scores
+        # above threshold
+        self.changes = []
+        self.marks = []
+        self.candidate = None
+
+    # This method processes the next piece of a text, given as
+    # letter array (see Analysis.LetterArray). It returns the
+    # windows which were completed as a tuple of arrays (ends, ic,
+    # chi, score): the letter position after each window, its
+    # index of coincidence, its chi-squared statistic and the
+    # change score at its start, which is NaN for the first
+    # windows of the text. Letters which do not fill a whole step
+    # are kept for the next piece.
+    def Update(self, letters):
+        letters = np.concatenate([self.tail, letters.astype(np.uint8)])
+        count = len(letters) // self.step
+        self.tail = letters[count * self.step:].copy()
+        view = letters[:count * self.step].reshape(count, self.step)
+        index = view + (26 * np.arange(count, dtype = np.intp))[:, None]
+        new = np.bincount(index.ravel(), minlength = 26 * count).reshape(count, 26)
+        blocks = np.concatenate([self.history, new])
+        running = np.zeros((len(blocks) + 1, 26), dtype = np.int64)
+        np.cumsum(blocks, axis = 0, out = running[1:])
+        origin = self.position - len(self.history) * self.step
+        b = self.blocks
+        # The windows end after the blocks first to last - 1; their
+        # counts are differences of slices of running.
+        first = max(b, len(self.history) + 1)
+        last = max(first, len(blocks) + 1)
+        ends = np.arange(first, last)
+        counts = running[first:last] - running[first - b:last - b]
+        # As the counts of a window add up to n, both statistics
+        # follow from the sum of the (weighted) squared counts:
+        # IC = (sum c^2 - n) / (n (n - 1)) and
+        # chi-squared = sum c^2 / (n p) - n.
+        n = self.size
+        squares = counts * counts
+        ic = (np.einsum("ij->i", squares) - n) / (n * max(n - 1, 1))
+        chi = np.einsum("ij,j->i", squares, 1 / (n * self.profile)) - n
+        score = np.full(len(ends), np.nan)
+        skip = min(max(0, 2 * b - first), last - first)
+        middle = running[first + skip - b:last - b]
+        before = middle - running[first + skip - 2 * b:last - 2 * b]
+        after = counts[skip:]
+        difference = after - before
+        difference *= difference
+        total = before + after
+        np.maximum(total, 1, out = total)
+        score[skip:] = np.einsum("ij->i", difference / total)
+        self.FindChanges(origin + (ends[skip:] - b) * self.step, score[skip:],
+                         self.base + middle)
+        keep = min(len(blocks), 2 * b)
+        self.base = self.base + running[len(blocks) - keep]
+        self.history = blocks[len(blocks) - keep:].copy()
+        self.position += count * self.step
+        return origin + ends * self.step, ic, chi, score
+
+    # This method processes the next piece of a normalized text.
+    def UpdateText(self, text):
+        return self.Update(LetterArray(text))
+
+    # This method records the maximum of every run of scores
+    # above threshold as a change point, with the letter counts
+    # before it. A run which reaches the end of the scores is kept
+    # open for the next piece.
+    def FindChanges(self, positions, scores, totals):
+        if len(scores) == 0:
+            return
+        above = np.concatenate([[0], (scores > self.threshold).view(np.int8), [0]])
+        edges = np.flatnonzero(np.diff(above))
+        starts, stops = edges[0::2], edges[1::2]
+        if (self.candidate is not None) and ((len(starts) == 0) or (starts[0] > 0)):
+            self.CloseRun()
+        for start, stop in zip(starts, stops):
+            best = start + int(np.argmax(scores[start:stop]))
+            if (self.candidate is None) or (scores[best] > self.candidate[1]):
+                self.candidate = (int(positions[best]), float(scores[best]),
+                                  totals[best].copy())
+            if stop < len(scores):
+                self.CloseRun()
+
+    # This method records the open run as a change point.
+    def CloseRun(self):
+        position, score, totals = self.candidate
+        self.changes.append((position, score))
+        self.marks.append(totals)
+        self.candidate = None
+
+    # This method ends the text: an open run is recorded and the
+    # letter counts of the whole text are returned.
+    def Finish(self):
+        if self.candidate is not None:
+            self.CloseRun()
+        return self.base + self.history.sum(axis = 0) + np.bincount(self.tail, minlength = 26)
+
+    # This method ends the text and returns the segments between
+    # the change points as a list of (start, end, counts) tuples,
+    # where start and end are letter positions and counts the 26
+    # letter counts of the segment.
+    def Segments(self):
+        totals = self.Finish()
+        bounds = [0] + [position for position, score in self.changes]
+        bounds.append(self.position + len(self.tail))
+        marks = [np.zeros(26, dtype = np.int64)] + self.marks + [totals]
+        return [(bounds[i], bounds[i + 1], marks[i + 1] - marks[i])
+                for i in range(len(bounds) - 1)]
+
+# This function slides a window (see SlidingWindow) across the
+# textfile path in a single pass. The file is read in pieces of
+# chunk_size characters and normalized with strict set. If
+# windows is given, it is called with the arrays returned by
+# SlidingWindow.Update for every piece. The finished
+# SlidingWindow is returned.
+def WindowFile(path, size = WINDOW_SIZE, step = WINDOW_STEP, profile = None,
+               threshold = CHANGE_THRESHOLD, chunk_size = 1 << 20, windows = None):
+    window = SlidingWindow(size, step, profile, threshold)
+    with open(path, mode = "rt", encoding = "utf-8") as File:
+        while True:
+            chunk = File.read(chunk_size)
+            if chunk == "":
+                break
+            result = window.UpdateText(NormalizeText(chunk, strict = True))
+            if windows is not None:
+                windows(*result)
+    window.Finish()
+    return window
@@ -0,0 +1,97 @@
+# numpy provides the vectorized scoring, time the throughput
+import time
+
+import numpy as np
+
+from CipherEngine.Analysis import GERMAN_FREQUENCIES, LetterArray
+from CipherEngine.Quadgrams import QuadgramScore
+
+# Only this many letters of the ciphertext are used to solve a
+# general substitution, which is plenty for the quadgram
+# statistics.
+SOLVER_SAMPLE = 20000
+
+# This function returns, for each of the 26 ciphertext letters,
+# the sorted indices of all quadgrams of the letter array
+# letters which contain that letter. When two letters of the
+# key are swapped, only these quadgrams change their score.
+def LetterQuadgramIndex(letters):
+    count = len(letters) - 3
+    index = []
+    for c in range(26):
+        starts = np.flatnonzero(letters == c)[:, None] - np.arange(4)
+        starts = starts[(starts >= 0) & (starts < count)]
+        index.append(np.unique(starts))
+    return index
+
+# This function returns the decryption key (an array mapping
+# each ciphertext letter to a plaintext letter) which assigns the
+# letters by descending frequency to the letters of profile by
+# descending frequency.
+def FrequencyKey(letters, profile = None):
+    if profile is None:
+        profile = GERMAN_FREQUENCIES
+    ciph_order = np.argsort(-np.bincount(letters, minlength = 26), kind = "stable")
+    plain_order = np.argsort(-np.asarray(profile), kind = "stable")
+    key = np.zeros(26, dtype = np.intp)
+    key[ciph_order] = plain_order
+    return key
+
+# This function improves the decryption key key of the letter
+# array letters by swapping pairs of key letters as long as a
+# swap increases the quadgram score. After a swap of the letters
+# a and b, only the quadgrams containing a or b are rescored.
+# It returns the key, its score and the number of swaps tried.
+def HillClimb(letters, table, key, rng = None, index = None):
+    if rng is None:
+        rng = np.random.default_rng()
+    if index is None:
+        index = LetterQuadgramIndex(letters)
+    key = np.array(key, dtype = np.intp)
+    c = letters.astype(np.intp)
+    score = QuadgramScore(key[c], table)
+    pairs = np.array([(a, b) for a in range(26) for b in range(a + 1, 26)])
+    tried = 0
+    improved = True
+    while improved:
+        improved = False
+        for a, b in pairs[rng.permutation(len(pairs))]:
+            tried += 1
+            affected = np.union1d(index[a], index[b])
+            if len(affected) == 0:
+                continue
+            c0 = c[affected]
+            c1 = c[affected + 1]
+            c2 = c[affected + 2]
+            c3 = c[affected + 3]
+            old = ((key[c0] * 26 + key[c1]) * 26 + key[c2]) * 26 + key[c3]
+            swapped = key.copy()
+            swapped[a], swapped[b] = key[b], key[a]
+            new = ((swapped[c0] * 26 + swapped[c1]) * 26 + swapped[c2]) * 26 + swapped[c3]
+            delta = float(table[new].sum(dtype = np.float64) - table[old].sum(dtype = np.float64))
+            if delta > 0:
+                key = swapped
+                score += delta
+                improved = True
+    return key, score, tried
+
+# This function solves a general substitution: it hill-climbs
+# from the frequency key of the first SOLVER_SAMPLE letters of
+# the (normalized) ciphertext, or from a random key if seed is
+# given. It returns the decryption alphabet in the layout of the
+# decryption GUI (the lower case plaintext letter of every
+# ciphertext letter), the quadgram score and the number of swaps
+# tried per second.
+def SolveSubstitution(text, table, seed = None, profile = None):
+    letters = LetterArray(text)[:SOLVER_SAMPLE]
+    if len(letters) < 4:
+        raise ValueError("Not enough letters to analyse")
+    rng = np.random.default_rng(seed)
+    if seed is None:
+        key = FrequencyKey(letters, profile)
+    else:
+        key = rng.permutation(26)
+    start = time.perf_counter()
+    key, score, tried = HillClimb(letters, table, key, rng)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    return "".join(chr(ord("a") + int(k)) for k in key), score, tried / elapsed
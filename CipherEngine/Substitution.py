@@ -0,0 +1,172 @@
+# mmap and re are used to transform files without reading
+# them into memory
+import mmap
+import re
+
+from CipherEngine.Normalize import NormalizeText
+
+# A substitution alphabet is a string of 26 characters. The
+# character at index i replaces the letter chr(ord("A")+i).
+# This is the same layout as the 26 combo boxes of the
+# monoalphabetic GUIs.
+
+# This function returns the alphabet which leaves every
+# letter unchanged (the initial state of the "General" mode).
+def IdentityAlphabet():
+    return "".join(chr(ord("A")+i) for i in range(26))
+
+# This function returns the Caesar alphabet whose first
+# letter is first, i.e. ascending letters starting from first.
+def CaesarAlphabet(first = "a"):
+    first = first.lower()
+    if (len(first) != 1) or (ord(first) < ord("a")) or (ord(first) > ord("z")):
+        raise ValueError("Caesar key must be a single letter")
+    shift = ord(first) - ord("a")
+    return "".join(chr(ord("a") + (shift+i) % 26) for i in range(26))
+
+# This function returns the Atbash alphabet, i.e. the
+# reversed alphabet.
+def AtbashAlphabet():
+    return "".join(chr(ord("Z")-i) for i in range(26))
+
+# This function returns the alphabet which undoes the
+# substitution alphabet, i.e. which replaces every substitute
+# by the (lower case) letter it stands for. alphabet must
+# consist of the 26 letters in any order and case.
+def InverseAlphabet(alphabet):
+    letters = alphabet.upper()
+    if sorted(letters) != [chr(ord("A")+i) for i in range(26)]:
+        raise ValueError("Substitution alphabet must contain every letter once")
+    inverse = [""] * 26
+    for i, c in enumerate(letters):
+        inverse[ord(c) - ord("A")] = chr(ord("a")+i)
+    return "".join(inverse)
+
+# A SubstitutionKey compiles a substitution alphabet once into
+# translation tables, so that it can be applied to any number of
+# texts in a single pass of str.translate or bytes.translate.
+class SubstitutionKey:
+    def __init__(self, alphabet):
+        if len(alphabet) != 26:
+            raise ValueError("Substitution alphabet must have 26 characters")
+        self.alphabet = alphabet
+        self.table = str.maketrans(IdentityAlphabet(), alphabet)
+        # The byte table maps every byte to itself except A-Z. It
+        # only exists if the alphabet consists of ASCII characters.
+        if all(ord(c) < 128 for c in alphabet):
+            t = bytearray(range(256))
+            for i in range(26):
+                t[ord("A")+i] = ord(alphabet[i])
+            self.bytetable = bytes(t)
+        else:
+            self.bytetable = None
+
+    # This method replaces each letter A-Z of the (normalized)
+    # text by the corresponding character of the alphabet.
+    def Apply(self, text):
+        return text.translate(self.table)
+
+    # This method does the same as Apply for bytes, bytearray or
+    # memoryview objects containing ASCII text.
+    def ApplyBytes(self, data):
+        if self.bytetable is None:
+            raise ValueError("Substitution alphabet is not ASCII")
+        return bytes(data).translate(self.bytetable)
+
+# This function replaces each letter A-Z of the (normalized)
+# text by the corresponding character of alphabet. All other
+# characters are kept. Use SubstitutionKey directly to apply
+# the same alphabet repeatedly.
+def Substitute(text, alphabet):
+    return SubstitutionKey(alphabet).Apply(text)
+
+# The UTF-8 encodings of the characters which change the length
+# of a text when it is read and normalized: ä, Ä, ö, Ö, ü, Ü and
+# ß are expanded to two letters, and carriage returns are
+# dropped when a file is read in text mode.
+LENGTH_CHANGING = re.compile(b"\r|\xc3[\x84\x96\x9c\xa4\xb6\xbc\x9f]")
+
+# The size of the pieces in which mapped files are translated.
+MAP_WINDOW = 1 << 24
+
+# This function returns a 256-byte table which normalizes a
+# UTF-8 byte with "Keep blanks" and "Keep non-alphabetic chars"
+# set (lower case letters become upper case, line feeds become
+# blanks) and then applies key. Every other byte, including the
+# bytes of multi-byte characters, is kept.
+def NormalizingByteTable(key):
+    if key.bytetable is None:
+        raise ValueError("Substitution alphabet is not ASCII")
+    t = bytearray(key.bytetable)
+    for i in range(26):
+        t[ord("a")+i] = key.bytetable[ord("A")+i]
+    t[10] = ord(" ")
+    return bytes(t)
+
+# This function raises a ValueError if the mapped bytes source
+# contains characters which change the length of the text.
+def CheckLengthPreserving(source):
+    if LENGTH_CHANGING.search(source) is not None:
+        raise ValueError("File contains umlauts, sharp s or carriage returns")
+
+# This function translates the mapped bytes source into the
+# mapped bytes target (which may be the same object) piece by
+# piece.
+def TranslateMapped(source, target, table):
+    for start in range(0, len(source), MAP_WINDOW):
+        end = min(start + MAP_WINDOW, len(source))
+        target[start:end] = source[start:end].translate(table)
+
+# This function normalizes the UTF-8 textfile path with "Keep
+# blanks" and "Keep non-alphabetic chars" set and applies key
+# to it in place, using a memory map. A ValueError is raised,
+# and the file is left unchanged, if the file contains
+# characters which change the length of the text.
+def SubstituteFileInPlace(path, key):
+    with open(path, mode = "r+b") as File:
+        if File.seek(0, 2) == 0:
+            return
+        with mmap.mmap(File.fileno(), 0) as Map:
+            CheckLengthPreserving(Map)
+            TranslateMapped(Map, Map, NormalizingByteTable(key))
+
+# This function does the same as SubstituteFileInPlace, but
+# writes the result to a preallocated file out_path and leaves
+# in_path unchanged.
+def SubstituteFileMapped(in_path, out_path, key):
+    table = NormalizingByteTable(key)
+    with open(in_path, mode = "rb") as InFile:
+        size = InFile.seek(0, 2)
+        if size == 0:
+            open(out_path, mode = "wb").close()
+            return
+        with mmap.mmap(InFile.fileno(), 0, access = mmap.ACCESS_READ) as InMap:
+            CheckLengthPreserving(InMap)
+            with open(out_path, mode = "w+b") as OutFile:
+                OutFile.truncate(size)
+                with mmap.mmap(OutFile.fileno(), 0) as OutMap:
+                    TranslateMapped(InMap, OutMap, table)
+
+# This function normalizes the textfile in_path, applies key
+# and writes the result to out_path. If both "Keep blanks" and
+# "Keep non-alphabetic chars" are set, the fast memory mapped
+# translation is tried first. If the file contains characters
+# whose normalization changes the length of the text, or the
+# options require removing characters, the file is processed
+# as text in pieces of chunk_size characters instead.
+def SubstituteFile(in_path, out_path, key, keep_blanks = False, keep_nonalpha = False,
+                   chunk_size = 1 << 20):
+    if keep_blanks and keep_nonalpha and (key.bytetable is not None):
+        try:
+            SubstituteFileMapped(in_path, out_path, key)
+        except ValueError:
+            pass
+        else:
+            return
+    with open(in_path, mode = "rt", encoding = "utf-8") as InFile:
+        with open(out_path, mode = "wt", encoding = "utf-8") as OutFile:
+            while True:
+                chunk = InFile.read(chunk_size)
+                if chunk == "":
+                    break
+                OutFile.write(key.Apply(NormalizeText(chunk, keep_blanks, keep_nonalpha)))
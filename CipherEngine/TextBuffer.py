@@ -0,0 +1,59 @@
+# mmap and tempfile keep large texts outside the Python heap
+import mmap
+import tempfile
+
+# A MappedText holds a large text in a memory-mapped temporary
+# file instead of a Python string. Pure ASCII text is stored with
+# one byte per character, any other text as UTF-32, so that a
+# character range can be located without decoding the text
+# before it. It supports len() and slicing like a string.
+class MappedText:
+    def __init__(self, text, chunk_size = 1 << 20):
+        if text.isascii():
+            self.encoding = "ascii"
+            self.width = 1
+        else:
+            self.encoding = "utf-32-le"
+            self.width = 4
+        self.file = tempfile.TemporaryFile()
+        for start in range(0, len(text), chunk_size):
+            self.file.write(text[start:start + chunk_size].encode(self.encoding, "surrogatepass"))
+        self.file.flush()
+        self.length = len(text)
+        if self.length > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            self.map = b""
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self.length
+            if (index < 0) or (index >= self.length):
+                raise IndexError("MappedText index out of range")
+            return self[index:index + 1]
+        start, stop, step = index.indices(self.length)
+        if step != 1:
+            raise ValueError("MappedText only supports contiguous slices")
+        if stop <= start:
+            return ""
+        return self.map[start * self.width:stop * self.width].decode(self.encoding, "surrogatepass")
+
+    # This method returns the text in pieces of chunk_size
+    # characters.
+    def Chunks(self, chunk_size = 1 << 20):
+        for start in range(0, self.length, chunk_size):
+            yield self[start:start + chunk_size]
+
+    # This method releases the memory map and deletes the file.
+    # It is also called when the last reference is dropped.
+    def Close(self):
+        if self.length > 0:
+            self.map.close()
+        self.file.close()
+
+    def __del__(self):
+        self.Close()
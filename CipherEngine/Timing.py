@@ -0,0 +1,166 @@
+# json writes the timings as JSON lines; os and sys find the log
+# file; threading protects it; time measures the stages
+import json
+import os
+import sys
+import threading
+import time
+
+# The environment variable which enables the timings. Its value
+# is the file the JSON lines are appended to, or "-" for stderr.
+TIMINGS_VARIABLE = "CIPHER_TIMINGS"
+
+# This function returns the size in bytes of data: the length of
+# bytes, the UTF-8 length of a string or the number itself.
+def ByteCount(data):
+    if isinstance(data, str):
+        return len(data.encode("utf-8", "surrogatepass"))
+    if isinstance(data, int):
+        return data
+    return len(data)
+
+# This function formats a number of bytes for the feedback
+# labels.
+def FormatBytes(count):
+    for unit in ("B", "KB", "MB"):
+        if count < 1000:
+            return "%d %s" % (count, unit) if unit == "B" else "%.1f %s" % (count, unit)
+        count /= 1000
+    return "%.1f GB" % count
+
+# A Stage measures the time spent in a with block and the bytes
+# counted in it. A trace may contain several stages of the same
+# name, e.g. one per piece of a text, which are added up.
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.bytes = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self.start
+        return False
+
+    # This method adds the size of data (see ByteCount) to the
+    # stage.
+    def Count(self, data):
+        self.bytes = (self.bytes or 0) + ByteCount(data)
+
+    # This method adds the size of the file path to the stage.
+    def CountFile(self, path):
+        self.Count(os.path.getsize(path))
+
+# A Trace collects the stages of one operation of a GUI, e.g.
+# loading a file or encrypting the plaintext. Stages may be
+# measured in a background job and on the main thread.
+class Trace:
+    def __init__(self, timer, operation):
+        self.timer = timer
+        self.operation = operation
+        self.stages = []
+        self.start = time.perf_counter()
+
+    def __bool__(self):
+        return True
+
+    # This method returns a new stage name of the trace to be
+    # used in a with statement.
+    def Stage(self, name):
+        stage = Stage(name)
+        self.stages.append(stage)
+        return stage
+
+    # This method returns the stages added up by name, in the
+    # order in which they were first measured.
+    def Totals(self):
+        totals = {}
+        for stage in self.stages:
+            seconds, count = totals.get(stage.name, (0.0, None))
+            if stage.bytes is not None:
+                count = (count or 0) + stage.bytes
+            totals[stage.name] = (seconds + stage.seconds, count)
+        return totals
+
+    # This method ends the operation, writes its timings to the
+    # log of the timer and returns message followed by a summary
+    # of the timings for a feedback label.
+    def Finish(self, message = ""):
+        total = time.perf_counter() - self.start
+        totals = self.Totals()
+        self.timer.Emit({"time": time.time(), "operation": self.operation,
+                         "seconds": total,
+                         "stages": [{"stage": name, "seconds": seconds, "bytes": count}
+                                    for name, (seconds, count) in totals.items()]})
+        parts = []
+        for name, (seconds, count) in totals.items():
+            part = "%s %.1f ms" % (name, seconds * 1000)
+            if count is not None:
+                part += " " + FormatBytes(count)
+            parts.append(part)
+        return ("%s (%s)" % (message, ", ".join(parts))).strip()
+
+# The NullStage and NullTrace are used while the timings are
+# disabled. They measure nothing, so the instrumented code only
+# pays for a few method calls. A NullTrace is false, so a GUI
+# can skip updating a label with "if trace:".
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def Count(self, data):
+        pass
+
+    def CountFile(self, path):
+        pass
+
+NULL_STAGE = NullStage()
+
+class NullTrace:
+    def __bool__(self):
+        return False
+
+    def Stage(self, name):
+        return NULL_STAGE
+
+    def Finish(self, message = ""):
+        return message
+
+NULL_TRACE = NullTrace()
+
+# A Timer creates the traces of a GUI and writes finished traces
+# as JSON lines to log (a file object), if it is enabled.
+class Timer:
+    def __init__(self, log = None):
+        self.log = log
+        self.enabled = log is not None
+        self.lock = threading.Lock()
+
+    # This method starts a trace for operation.
+    def Begin(self, operation):
+        if not self.enabled:
+            return NULL_TRACE
+        return Trace(self, operation)
+
+    # This method writes record to the log as one JSON line.
+    def Emit(self, record):
+        with self.lock:
+            self.log.write(json.dumps(record) + "\n")
+            self.log.flush()
+
+# This function returns a timer which is enabled if the
+# environment variable CIPHER_TIMINGS is set (see
+# TIMINGS_VARIABLE).
+def TimerFromEnvironment():
+    path = os.environ.get(TIMINGS_VARIABLE, "")
+    if path == "":
+        return Timer()
+    if path == "-":
+        return Timer(sys.stderr)
+    return Timer(open(path, "a", encoding = "utf-8"))
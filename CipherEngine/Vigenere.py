@@ -0,0 +1,167 @@
+# numpy provides the vectorized array operations
+import numpy as np
+
+from CipherEngine.Normalize import NormalizeText
+
+# This function checks that key is a non-empty string of the
+# letters A-Z, as produced by NormalizeText(key, strict = True).
+def CheckKey(key):
+    if len(key) == 0:
+        raise ValueError("No valid key entered")
+    for k in key:
+        if (ord(k) < ord("A")) or (ord(k) > ord("Z")):
+            raise ValueError("Key must only contain the letters A-Z")
+
+# This function converts key into an array of shifts (A = 0,
+# B = 1, ...).
+def KeyShifts(key):
+    CheckKey(key)
+    return np.frombuffer(key.encode("ascii"), dtype = np.uint8) - np.uint8(ord("A"))
+
+# This function converts text into an array of character codes.
+# Pure ASCII text becomes a uint8 array, any other text an
+# array of 32-bit code points. The encoding is returned as
+# well, so that ArrayToText can convert the result back.
+def TextToArray(text):
+    if text.isascii():
+        return np.frombuffer(text.encode("ascii"), dtype = np.uint8), "ascii"
+    return np.frombuffer(text.encode("utf-32-le"), dtype = np.uint32), "utf-32-le"
+
+# This function converts an array created by TextToArray back
+# into a string.
+def ArrayToText(codes, encoding):
+    return codes.tobytes().decode(encoding)
+
+# This function shifts every letter A-Z in the array codes by
+# the corresponding element of shifts, multiplied by sign (1 to
+# encrypt, -1 to decrypt), and returns the result as a new
+# array. Other characters are kept.
+# If advance_on_all is set, the key advances on every character
+# (like main.encrypt), otherwise only on letters (like the
+# Vigenère GUI), i.e. the key index of a letter is the
+# cumulative count of letters before it. phase is the key index
+# of the first character, which allows processing a text in
+# pieces. shifts may also hold the key repeated several times
+# (see VigenereKey), with period the length of the key; texts
+# which fit into it need no modulo for the key index.
+def VigenereShiftArray(codes, shifts, sign, advance_on_all = False, phase = 0,
+                       period = None):
+    if period is None:
+        period = len(shifts)
+    if sign < 0:
+        shifts = (26 - shifts) % 26
+    mask = (codes >= ord("A")) & (codes <= ord("Z"))
+    phase %= period
+    if advance_on_all:
+        if phase + len(codes) <= len(shifts):
+            index = slice(phase, phase + len(codes))
+        else:
+            index = np.arange(phase, phase + len(codes), dtype = np.intp)
+            index %= period
+    else:
+        index = np.cumsum(mask, dtype = np.intp)
+        index += phase - 1
+        if phase + len(codes) > len(shifts):
+            index %= period
+    stream = shifts[index].astype(codes.dtype)
+    # Non-letters may wrap around in the unsigned arithmetic,
+    # but they are discarded by np.where anyway.
+    stream += codes
+    stream -= ord("A")
+    stream %= 26
+    stream += ord("A")
+    return np.where(mask, stream, codes)
+
+# This function shifts every letter A-Z of text by the
+# corresponding key letter, multiplied by sign (see
+# VigenereShiftArray).
+def VigenereShift(text, key, sign, advance_on_all = False):
+    shifts = KeyShifts(key)
+    codes, encoding = TextToArray(text)
+    return ArrayToText(VigenereShiftArray(codes, shifts, sign, advance_on_all), encoding)
+
+# This function encrypts text with key.
+def VigenereEncrypt(text, key, advance_on_all = False):
+    return VigenereShift(text, key, 1, advance_on_all)
+
+# This function decrypts text with key.
+def VigenereDecrypt(text, key, advance_on_all = False):
+    return VigenereShift(text, key, -1, advance_on_all)
+
+# The number of key letters a VigenereKey is repeated to
+KEY_BLOCK = 1 << 12
+
+# A VigenereKey is a key compiled once for repeated use: its
+# shifts for en- and decryption, each repeated to at least
+# block letters, so that texts of up to block characters are
+# processed without computing the key index modulo the key
+# length.
+class VigenereKey:
+    def __init__(self, key, block = KEY_BLOCK):
+        shifts = KeyShifts(key)
+        self.key = key
+        self.period = len(shifts)
+        repeat = -(-block // self.period) + 1
+        self.tiled = {1: np.tile(shifts, repeat), -1: np.tile((26 - shifts) % 26, repeat)}
+
+    # This method does the same as VigenereShiftArray with the
+    # compiled key.
+    def ShiftArray(self, codes, sign, advance_on_all = False, phase = 0):
+        return VigenereShiftArray(codes, self.tiled[1 if sign > 0 else -1], 1,
+                                  advance_on_all, phase, self.period)
+
+    # This method shifts every letter A-Z of text (see
+    # VigenereShift).
+    def Shift(self, text, sign, advance_on_all = False):
+        codes, encoding = TextToArray(text)
+        return ArrayToText(self.ShiftArray(codes, sign, advance_on_all), encoding)
+
+# A VigenereStream en- or decrypts a normalized text which
+# arrives in pieces. It carries the key phase (the number of
+# letters, or characters if advance_on_all is set, seen so far
+# modulo the key length) from one piece to the next, so the
+# result is identical to processing the whole text at once.
+# key is a key word or a VigenereKey.
+class VigenereStream:
+    def __init__(self, key, sign = 1, advance_on_all = False):
+        if not isinstance(key, VigenereKey):
+            key = VigenereKey(key)
+        self.key = key
+        self.sign = sign
+        self.advance_on_all = advance_on_all
+        self.phase = 0
+
+    # This method processes the next piece of text and returns
+    # the result.
+    def Feed(self, text):
+        codes, encoding = TextToArray(text)
+        result = self.key.ShiftArray(codes, self.sign, self.advance_on_all, self.phase)
+        if self.advance_on_all:
+            self.phase += len(codes)
+        else:
+            self.phase += int(np.count_nonzero((codes >= ord("A")) & (codes <= ord("Z"))))
+        self.phase %= self.key.period
+        return ArrayToText(result, encoding)
+
+# This function reads the textfile in_path in pieces of
+# chunk_size characters, normalizes each piece, en- or decrypts
+# it with key and appends the result to the textfile out_path.
+# Only one piece is held in memory at a time. Umlauts whose
+# UTF-8 bytes are split between two pieces are reassembled by
+# the decoder of the text file, and NormalizeText works
+# character by character, so the output is identical to
+# normalizing and encrypting the whole file at once.
+# The number of characters written is returned.
+def VigenereFile(in_path, out_path, key, keep_blanks = False, keep_nonalpha = False,
+                 sign = 1, chunk_size = 1 << 20):
+    stream = VigenereStream(key, sign)
+    written = 0
+    with open(in_path, mode = "rt", encoding = "utf-8") as InFile:
+        with open(out_path, mode = "wt", encoding = "utf-8") as OutFile:
+            while True:
+                chunk = InFile.read(chunk_size)
+                if chunk == "":
+                    break
+                chunk = NormalizeText(chunk, keep_blanks, keep_nonalpha)
+                written += OutFile.write(stream.Feed(chunk))
+    return written
@@ -0,0 +1,41 @@
+# The package CipherEngine contains the cipher logic used by the
+# three GUIs. It does not depend on tkinter, so all transforms can
+# be run headless, e.g. in batch jobs or on a server. All options
+# which the GUIs read from Tk variables are passed explicitly.
+from CipherEngine.Normalize import Normalizer, GetNormalizer, NormalizeText
+from CipherEngine.Substitution import (IdentityAlphabet, CaesarAlphabet,
+                                       AtbashAlphabet, InverseAlphabet, SubstitutionKey,
+                                       Substitute, SubstituteFileInPlace,
+                                       SubstituteFileMapped, SubstituteFile)
+from CipherEngine.Vigenere import (KeyShifts, TextToArray, ArrayToText,
+                                   VigenereShiftArray, VigenereEncrypt,
+                                   VigenereDecrypt, KEY_BLOCK, VigenereKey,
+                                   VigenereStream, VigenereFile)
+from CipherEngine.Parallel import VigenereFileParallel
+from CipherEngine.Analysis import (GERMAN_FREQUENCIES, LetterArray, LetterCounts,
+                                   LetterProfile, CaesarMatrix, ChiSquared,
+                                   SolveCaesar, ColumnCounts, PeriodCoincidence,
+                                   KasiskiScores, FindKeyLength, RecoverKey,
+                                   SolveVigenere)
+from CipherEngine.Quadgrams import (QUADGRAMS, QuadgramCodes, BuildQuadgramTable,
+                                    QuadgramTableFromCounts,
+                                    SaveQuadgramTable, LoadQuadgramTable,
+                                    QuadgramScore)
+from CipherEngine.Solver import (SOLVER_SAMPLE, LetterQuadgramIndex, FrequencyKey,
+                                 HillClimb, SolveSubstitution)
+from CipherEngine.ParallelSolver import SolveSubstitutionParallel
+from CipherEngine.Counting import (NgramCodes, NgramText, NgramCounter, NormalizedSample,
+                                   CountFile, CountFiles)
+from CipherEngine.ProfileCache import (CACHE_DIR, ReferenceProfile, ProfileForFile,
+                                       ProfileForText)
+from CipherEngine.Incremental import IncrementalSubstitution, IncrementalVigenere
+from CipherEngine.Jobs import JobCancelled, Job, Chunks, BackgroundJobs
+from CipherEngine.TextBuffer import MappedText
+from CipherEngine.KeyCache import (CIPHER_MODES, CompileKey, CompiledKey, KeyCache, Keys,
+                                   GetCompiledKey)
+from CipherEngine.Timing import TIMINGS_VARIABLE, NULL_TRACE, Timer, TimerFromEnvironment
+from CipherEngine.ManyKeys import (MANY_KEYS_BUDGET, ManyToTexts, AlphabetMatrix,
+                                   CaesarAlphabetMatrix, InverseAlphabetMatrix,
+                                   SubstituteMany, VigenereMany, ManyKeysChunks)
+from CipherEngine.SlidingWindow import (WINDOW_SIZE, WINDOW_STEP, CHANGE_THRESHOLD,
+                                        SlidingWindow, WindowFile)
@@ -0,0 +1,386 @@
+# This script runs a local HTTP service which en- and decrypts
+# texts for other processes, so they neither have to open a GUI
+# nor use the prompt of main.py. Texts are sent as the body of a
+# POST request and the result is streamed back:
+#
+#   POST /caesar?key=d[&decrypt=1]
+#   POST /atbash
+#   POST /substitution?key=qwertzuiopasdfghjklyxcvbnm[&decrypt=1]
+#   POST /vigenere?key=Geheim[&decrypt=1]
+#   POST /frequencies          (returns the letter counts as JSON)
+#   GET  /stats                (returns the statistics of the key cache)
+#
+# The options keep_blanks=1 and keep_nonalpha=1 work as the check
+# boxes of the GUIs. Request bodies (with Content-Length or
+# chunked) are read and response bodies are written piece by
+# piece, so the memory in use does not grow with the size of a
+# text. Large pieces are transformed in a process pool, so the
+# event loop keeps serving other connections meanwhile and
+# requests run in parallel on all cores: the normalization holds
+# the GIL, so a thread pool would only run one piece at a time.
+# The pool receives the transform of a request with every piece
+# and returns it with its new state (see FeedPiece). Its workers
+# are started by a fork server (or spawned where there is none):
+# forked from the server, they would inherit the sockets of the
+# open connections and keep them from being closed. With
+# --threads a thread pool is used instead, which avoids the
+# worker processes where only the event loop has to be kept free.
+#
+# A request whose transform fails is answered with 400 (invalid
+# input) or 500 (any other error). If the response has already
+# started, the connection is closed without the final chunk, so
+# the client sees the body is incomplete.
+#
+# HTTP/1.0 clients get HTTP/1.0 responses. As they do not know
+# chunked encoding, bodies of unknown length are written without
+# framing and end when the connection is closed after every
+# request, so a transform failing after the response started
+# cannot be told from the end of the body.
+#
+# Usage: python Cipher_server.py [--host 127.0.0.1] [--port 8765] [--workers N]
+#            [--threads]
+import argparse
+import asyncio
+import codecs
+import concurrent.futures
+import json
+import multiprocessing
+import signal
+import traceback
+import urllib.parse
+
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+
+# Number of bytes read from a request body at once
+CHUNK = 1 << 16
+# Pieces with fewer characters than this are transformed on the
+# event loop, because handing them to the pool costs more than
+# transforming them.
+INLINE = 1 << 14
+# Limits for the request line and headers
+MAX_LINE = 1 << 13
+MAX_HEADERS = 100
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required",
+           431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+# This exception is raised while a request is parsed or checked.
+# It is answered with status and message.
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# The compiled keys of recent requests. Clients usually send
+# many requests with the same few keys.
+Keys = CipherEngine.KeyCache(maxsize = 256)
+
+# A CipherTransform en- or decrypts the pieces of a text with a
+# CompiledKey. Feed returns the result of a piece and Finish what
+# is left at the end (nothing for ciphers).
+class CipherTransform:
+    content_type = "text/plain; charset=utf-8"
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        if compiled.vigenere is not None:
+            self.stream = CipherEngine.VigenereStream(compiled.vigenere, compiled.sign)
+        else:
+            self.stream = None
+
+    def Feed(self, text):
+        text = self.compiled.normalizer.Apply(text)
+        if self.stream is not None:
+            return self.stream.Feed(text)
+        return self.compiled.substitution.Apply(text)
+
+    def Finish(self):
+        return ""
+
+# A FrequencyTransform counts the letters of the pieces of a text
+# and returns the counts as JSON at the end.
+class FrequencyTransform:
+    content_type = "application/json"
+
+    def __init__(self):
+        self.counter = CipherEngine.NgramCounter(1)
+
+    def Feed(self, text):
+        self.counter.UpdateText(CipherEngine.NormalizeText(text, strict = True))
+        return ""
+
+    def Finish(self):
+        counts = [int(c) for c in self.counter.counts]
+        total = sum(counts)
+        pairs = total * (total - 1)
+        coincidence = sum(c * (c - 1) for c in counts) / pairs if pairs > 0 else 0.0
+        return json.dumps({"total": total, "coincidence": coincidence,
+                           "counts": {chr(ord("A") + i): counts[i] for i in range(26)}})
+
+# This function feeds the piece text to transform and returns the
+# transform with its new state and the result. It runs in the
+# executor; in a process pool, the transform is pickled to the
+# worker and back, which costs far less than transforming a
+# large piece.
+def FeedPiece(transform, text):
+    result = transform.Feed(text)
+    return transform, result
+
+# This function returns the transform for the path and query of
+# a request. It raises HttpError if they are not valid.
+def MakeTransform(path, query):
+    mode = path.strip("/")
+    options = {name: values[-1] for name, values in urllib.parse.parse_qs(query).items()}
+    if mode == "frequencies":
+        return FrequencyTransform()
+    if mode not in CipherEngine.CIPHER_MODES:
+        raise HttpError(404, "Unknown cipher %r" % mode)
+    try:
+        compiled = Keys.Get(mode, options.get("key"), options.get("decrypt") == "1",
+                            options.get("keep_blanks") == "1",
+                            options.get("keep_nonalpha") == "1")
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    return CipherTransform(compiled)
+
+# This function reads one line of the request head.
+async def ReadLine(reader):
+    try:
+        line = await reader.readuntil(b"\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Line too long")
+    return line.decode("latin-1").rstrip("\r\n")
+
+# This function reads the request line and the headers. It
+# returns None if the client closed the connection.
+async def ReadHead(reader):
+    try:
+        line = await ReadLine(reader)
+    except asyncio.IncompleteReadError:
+        return None
+    parts = line.split()
+    if len(parts) != 3:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await ReadLine(reader)
+        if line == "":
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(431, "Too many headers")
+        name, sep, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], parts[2], headers
+
+# This generator yields the body of a request piece by piece,
+# for both Content-Length and chunked transfer encoding.
+async def ReadBody(reader, headers):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            line = await ReadLine(reader)
+            try:
+                size = int(line.split(";")[0], 16)
+            except ValueError:
+                raise HttpError(400, "Malformed chunk size")
+            if size == 0:
+                while await ReadLine(reader) != "":
+                    pass
+                return
+            while size > 0:
+                data = await reader.readexactly(min(size, CHUNK))
+                size -= len(data)
+                yield data
+            await reader.readexactly(2)
+    elif "content-length" in headers:
+        try:
+            remaining = int(headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length")
+        while remaining > 0:
+            data = await reader.readexactly(min(remaining, CHUNK))
+            remaining -= len(data)
+            yield data
+    else:
+        raise HttpError(411, "Content-Length or chunked body required")
+
+# This function returns the HTTP version of the response to a
+# request of the given version: HTTP/1.0 for HTTP/1.0 requests,
+# HTTP/1.1 otherwise.
+def ResponseVersion(version):
+    return "HTTP/1.0" if version == "HTTP/1.0" else "HTTP/1.1"
+
+# This function writes the status line and headers of a response
+# to a request of the given version. A body of unknown length is
+# chunked in HTTP/1.1 and unframed in HTTP/1.0.
+def WriteHead(writer, status, content_type, keep_alive, length = None, version = "HTTP/1.1"):
+    version = ResponseVersion(version)
+    head = ["%s %d %s" % (version, status, REASONS.get(status, "")),
+            "Content-Type: " + content_type,
+            "Connection: " + ("keep-alive" if keep_alive else "close")]
+    if length is not None:
+        head.append("Content-Length: %d" % length)
+    elif version == "HTTP/1.1":
+        head.append("Transfer-Encoding: chunked")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+# This function writes one piece of a response body, as a chunk
+# if chunked is set.
+def WriteChunk(writer, data, chunked = True):
+    if len(data) > 0:
+        if chunked:
+            writer.write(b"%x\r\n" % len(data) + data + b"\r\n")
+        else:
+            writer.write(data)
+
+# A CipherServer answers the requests of its connections. The
+# transforms of large pieces run in executor.
+class CipherServer:
+    def __init__(self, executor, inline = INLINE):
+        self.executor = executor
+        self.inline = inline
+
+    # This method transforms text with transform, on the event
+    # loop if it is short and in the executor otherwise. It
+    # returns the transform with its new state and the result
+    # (see FeedPiece).
+    async def Transform(self, transform, text):
+        if len(text) < self.inline:
+            return FeedPiece(transform, text)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, FeedPiece, transform, text)
+
+    # This method answers one request. It returns whether the
+    # connection can be kept open, which is never the case for
+    # HTTP/1.0 requests.
+    async def Answer(self, reader, writer, method, target, version, headers):
+        keep_alive = (version == "HTTP/1.1") and (headers.get("connection", "").lower() != "close")
+        chunked = ResponseVersion(version) == "HTTP/1.1"
+        url = urllib.parse.urlsplit(target)
+        if (method == "GET") and (url.path == "/stats"):
+            body = json.dumps({"keys": Keys.Stats()}).encode("utf-8")
+            WriteHead(writer, 200, "application/json", keep_alive, len(body), version)
+            writer.write(body)
+            await writer.drain()
+            return keep_alive
+        if method != "POST":
+            raise HttpError(405, "Only POST is supported")
+        transform = MakeTransform(url.path, url.query)
+        if ("content-length" not in headers) and ("transfer-encoding" not in headers):
+            raise HttpError(411, "Content-Length or chunked body required")
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        # The head is only written with the first result, so that
+        # an error in the first piece can still be answered.
+        started = False
+        try:
+            async for data in ReadBody(reader, headers):
+                transform, result = await self.Transform(transform, decoder.decode(data))
+                if not started:
+                    WriteHead(writer, 200, transform.content_type, keep_alive,
+                              version = version)
+                    started = True
+                WriteChunk(writer, result.encode("utf-8"), chunked)
+                await writer.drain()
+            result = transform.Feed(decoder.decode(b"", final = True)) + transform.Finish()
+        except HttpError:
+            if not started:
+                raise
+            # The response has already started, so the error can
+            # only be signalled by closing the connection.
+            return False
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as error:
+            traceback.print_exception(type(error), error, error.__traceback__)
+            if not started:
+                status = 400 if isinstance(error, ValueError) else 500
+                raise HttpError(status, "Transform failed: %s" % error)
+            return False
+        if not started:
+            WriteHead(writer, 200, transform.content_type, keep_alive, version = version)
+        WriteChunk(writer, result.encode("utf-8"), chunked)
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+    # This method serves one connection until it is closed. An
+    # invalid request is answered with an error and the connection
+    # is closed, because the rest of its body has not been read.
+    # Errors in the request line are answered in HTTP/1.1.
+    async def Serve(self, reader, writer):
+        try:
+            while True:
+                version = "HTTP/1.1"
+                try:
+                    head = await ReadHead(reader)
+                    if head is None:
+                        break
+                    version = head[2]
+                    if not await self.Answer(reader, writer, *head):
+                        break
+                except HttpError as error:
+                    message = (error.message + "\n").encode("utf-8")
+                    WriteHead(writer, error.status, "text/plain; charset=utf-8",
+                              False, len(message), version)
+                    writer.write(message)
+                    await writer.drain()
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as error:
+            # An unexpected error only closes its own connection.
+            traceback.print_exception(type(error), error, error.__traceback__)
+        finally:
+            writer.close()
+
+# This function returns the executor for the transforms of large
+# pieces: a pool of up to workers processes, or threads if
+# use_threads is set.
+def MakeExecutor(workers = None, use_threads = False):
+    if use_threads:
+        return concurrent.futures.ThreadPoolExecutor(max_workers = workers)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+    else:
+        context = multiprocessing.get_context("spawn")
+    return concurrent.futures.ProcessPoolExecutor(max_workers = workers, mp_context = context)
+
+# This function starts the service on host and port and returns
+# the asyncio server. Large pieces are transformed in executor
+# (see MakeExecutor).
+async def StartServer(host = "127.0.0.1", port = 8765, executor = None):
+    server = CipherServer(executor or MakeExecutor())
+    return await asyncio.start_server(server.Serve, host, port, limit = MAX_LINE)
+
+# This function serves until the process is interrupted or
+# terminated and then shuts the worker pool down.
+async def Main(host, port, workers, use_threads):
+    with MakeExecutor(workers, use_threads) as executor:
+        server = await StartServer(host, port, executor)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        except NotImplementedError:
+            # Signal handlers are not supported on Windows.
+            pass
+        print("Serving on %s:%d" % (host, port), flush = True)
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Local en- and decryption service.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--workers", type = int, help = "processes for large pieces")
+    parser.add_argument("--threads", action = "store_true",
+                        help = "transform large pieces in threads instead of processes")
+    args = parser.parse_args()
+    try:
+        asyncio.run(Main(args.host, args.port, args.workers, args.threads))
+    except KeyboardInterrupt:
+        pass
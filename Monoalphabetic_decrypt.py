@@ -1,40 +1,40 @@
+# os and time are used to measure the startup time. It is
+# measured from the clock value (time.time()) in the environment
+# variable CIPHER_STARTUP if the launcher set it (see
+# benchmarks/startup.py), otherwise from the start of the script.
+import os
+import time
+StartTime = float(os.environ.get("CIPHER_STARTUP", time.time()))
 # tkinter provides GUI objects and commands
-# matplotlib provides the commands to print
-# the statistical analysis of the letter
-# frequencies
 import tkinter as tk
 import tkinter.ttk as ttk
-import matplotlib.pyplot as plt
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+# PagedTextView shows large texts page by page
+import PagedTextView
+# multiprocessing, threading and queue are used to run the
+# solver in the background
+import multiprocessing
+import queue
+import sys
+import threading
 
-# An object (root) is created which represents the window.
-# Its title and full screen property are set.
-root = tk.Tk()
-root.title("Monoalphabetic decryption")
-root.wm_state("zoomed")
+# A worker process of the general solver imports this script
+# again under the name __mp_main__ (see SolverContext). It only
+# needs CipherEngine, so the window is only built if the script
+# is not imported by a worker.
+IS_WORKER = (__name__ == "__mp_main__")
+
+# Delay in milliseconds before a change of the key is applied
+DEBOUNCE = 150
 
 # This function normalizes the parameter text according to the
 # settings "Keep blanks" and "Keep non-alphabetic chars".
 def NormalizeText(text, strict = False):
-    s = ""
-    for c in text:
-        if ((ord(c) <= ord("Z")) and (ord(c) >= ord("A"))):
-            s += c
-        elif ((ord(c) <= ord("z")) and (ord(c) >= ord("a"))):
-            s += chr(ord(c) + ord("A") - ord("a"))
-        elif ((c == "ä") or (c == "Ä")):
-            s += "AE"
-        elif ((c == "ö") or (c == "Ö")):
-            s += "OE"
-        elif ((c == "ü") or (c == "Ü")):
-            s += "UE"
-        elif (c == "ß"):
-            s += "SS"
-        elif ((c == " ") or (ord(c) == 10)):
-            if ((KeepBlanks.get() == "1") and not strict):
-                s += " "
-        elif ((KeepNonalpha.get() == "1") and not strict):
-            s += c
-    return s
+    return CipherEngine.NormalizeText(text,
+                                      keep_blanks = (KeepBlanks.get() == "1"),
+                                      keep_nonalpha = (KeepNonalpha.get() == "1"),
+                                      strict = strict)
 
 # The labels used to interact with the user are cleared.
 def ClearFeedbackLabels():
@@ -42,6 +42,11 @@ def ClearFeedbackLabels():
     LabelCiphFeedback["text"] = ""
     LabelFreqAnFeedback["text"] = ""
 
+# This function tells the user in label that a background job
+# failed with error.
+def ShowJobError(label, error):
+    label["text"] = "An error occurred: %s" % error
+
 # This function is invoked when the user clicks the button
 # "Save plaintext to file".
 # It tries to create or rewrite a textfile with the name
@@ -51,18 +56,21 @@ def ClearFeedbackLabels():
 # textfile succeeded.
 def ButtonPlainSaveClick():
     ClearFeedbackLabels()
-    plain = TextPlain.get("1.0", "end")[:-1]
-    if len(plain) < 1:
+    length = ViewPlain.Length()
+    if length < 1:
         LabelPlainFeedback["text"] = "Nothing to save"
         return
+    trace = Timer.Begin("save plaintext")
     try:
-        with open(PathPlain.get(), mode = "wt", encoding = "utf-8") as PlainFile:
-            if (PlainFile.write(plain) != len(plain)):
-                raise Exception
+        with trace.Stage("save") as stage:
+            with open(PathPlain.get(), mode = "wt", encoding = "utf-8") as PlainFile:
+                if (ViewPlain.Save(PlainFile) != length):
+                    raise Exception
+            stage.CountFile(PathPlain.get())
     except:
         LabelPlainFeedback["text"] = "An error occurred while saving to file."
     else:
-        LabelPlainFeedback["text"] = "Plaintext saved successfully."
+        LabelPlainFeedback["text"] = trace.Finish("Plaintext saved successfully.")
 
 # This function is invoked when the user clicks the button
 # "Load ciphertext from file".
@@ -72,54 +80,131 @@ def ButtonPlainSaveClick():
 # prints its contents in the text field below.
 def ButtonCiphLoadClick():
     ClearFeedbackLabels()
+    trace = Timer.Begin("load ciphertext")
     try:
-        with open(PathCiph.get(), mode = "rt", encoding = "utf-8") as CiphFile:
-            ciph = CiphFile.read()
+        with trace.Stage("load") as stage:
+            with open(PathCiph.get(), mode = "rt", encoding = "utf-8") as CiphFile:
+                ciph = CiphFile.read()
+            stage.CountFile(PathCiph.get())
     except:
         LabelCiphFeedback["text"] = "An error occurred while reading the file."
     else:
         if ciph == "":
             LabelCiphFeedback["text"] = "File empty"
         else:
-            ciph = NormalizeText(ciph)
-            TextCiph.delete("1.0", "end")
-            TextCiph.insert("1.0", ciph)
-            LabelCiphFeedback["text"] = "File loaded successfully."
+            with trace.Stage("normalize") as stage:
+                ciph = NormalizeText(ciph)
+                stage.Count(ciph)
+            with trace.Stage("display"):
+                ViewCiph.Set(ciph)
+            LabelCiphFeedback["text"] = trace.Finish("File loaded successfully.")
+
+# The number of characters of the sample text which are shown
+# in the text field. The profile is counted on the whole file.
+SAMPLE_PREVIEW = 1 << 16
+
+# The profile of the sample textfile loaded last, or None.
+SampleFileProfile = None
 
 # This function is invoked when the user clicks the button
 # "Load sample text from file".
 # It tries to open a textfile with the name specified in the
-# corresponding entry field. Further, it tells the user
-# whether the loading of the textfile succeeded and, if so,
-# prints its contents in the text field below.
+# corresponding entry field and builds its profile (see
+# ProfileForFile). Further, it tells the user whether the
+# loading of the textfile succeeded and, if so, prints the
+# beginning of its contents in the text field below.
 def ButtonFreqAnLoadClick():
+    global SampleFileProfile
     ClearFeedbackLabels()
     try:
         with open(PathFreqAn.get(), mode = "rt", encoding = "utf-8") as SampleFile:
-            FreqAnText = SampleFile.read()
+            FreqAnText = SampleFile.read(SAMPLE_PREVIEW)
+        if FreqAnText != "":
+            profile = CipherEngine.ProfileForFile(PathFreqAn.get())
     except:
         LabelFreqAnFeedback["text"] = "An error occurred while reading the file."
     else:
         if FreqAnText == "":
             LabelFreqAnFeedback["text"] = "File empty"
         else:
+            SampleFileProfile = profile
             TextFreqAn.delete("1.0", "end")
             TextFreqAn.insert("1.0", FreqAnText)
+            TextFreqAn.edit_modified(False)
             LabelFreqAnFeedback["text"] = "File loaded successfully."
 
+# This function returns the n-gram counts of the sample text:
+# the profile of the loaded sample file, or, if no file was
+# loaded or the text field was edited since, the profile of the
+# text field, which is loaded from the profile cache.
+def GetSampleProfile():
+    if (SampleFileProfile is not None) and not TextFreqAn.edit_modified():
+        return SampleFileProfile
+    return CipherEngine.ProfileForText(TextFreqAn.get("1.0", "end")[:-1])
+
 # This function is invoked when the user clicks the button
 # "Compare letter frequencies".
 # It counts each letter in both the cipher and the sample
-# text and prints the frequencies by use of matplotlib.
+# text in the background and then prints the frequencies.
 def ButtonFreqCheckClick():
-    ciph = NormalizeText(TextCiph.get("1.0", "end")[:-1], strict = True)
-    samp = NormalizeText(TextFreqAn.get("1.0", "end")[:-1], strict = True)
-    FreqCiph = [[chr(ord("A") + i), 0] for i in range(26)]
-    FreqSamp = [[chr(ord("a") + i), 0] for i in range(26)]
-    for c in ciph:
-        FreqCiph[ord(c) - ord("A")][1] += 1
-    for c in samp:
-        FreqSamp[ord(c) - ord("A")][1] += 1
+    ciph = ViewCiph.Source()
+    profile = GetSampleProfile()
+    trace = Timer.Begin("compare frequencies")
+    Jobs.Run("frequencies", lambda job: FrequencyWork(job, ciph, profile, trace),
+             lambda result: ShowFrequencies(result, trace),
+             lambda error: ShowJobError(LabelFreqAnFeedback, error))
+
+# This function runs in the background. It counts the letters
+# of the ciphertext piece by piece.
+def CountLettersWork(job, ciph, trace):
+    CountCiph = CipherEngine.NgramCounter(1)
+    for piece in CipherEngine.Chunks(job, ciph):
+        with trace.Stage("normalize") as stage:
+            piece = CipherEngine.NormalizeText(piece, strict = True)
+            stage.Count(piece)
+        with trace.Stage("count"):
+            CountCiph.UpdateText(piece)
+    return CountCiph.counts
+
+# This function runs in the background. It counts the letters
+# of the ciphertext piece by piece and takes the letter counts
+# of the sample text from its profile.
+def FrequencyWork(job, ciph, profile, trace):
+    return CountLettersWork(job, ciph, trace), profile.Counts(1)
+
+# The chart of the letter frequencies. It is created on first
+# use, so matplotlib is only loaded when it is needed.
+Chart = None
+
+# This function returns the canvas, the two axes and the two
+# rows of 26 bars of the chart, which is embedded above the
+# sample text. matplotlib is imported here and the chart is
+# created the first time it is called.
+def GetChart():
+    global Chart
+    if Chart is None:
+        # matplotlib provides the commands to print the
+        # statistical analysis of the letter frequencies
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        figure = Figure(figsize = (6, 3))
+        axes = [figure.add_subplot(211), figure.add_subplot(212)]
+        bars = [ax.bar(range(26), [0] * 26) for ax in axes]
+        for ax in axes:
+            ax.set_xticks(range(26))
+        canvas = FigureCanvasTkAgg(figure, master = FrameFreqAn)
+        canvas.get_tk_widget().pack(side = "top", fill = "x", padx = 20,
+                                    before = TextFreqAn)
+        Chart = (canvas, axes, bars)
+    return Chart
+
+# This function prints the letter frequencies counted by
+# FrequencyWork into the chart. The bars are updated in place
+# instead of drawing a new figure.
+def ShowFrequencies(result, trace):
+    CountCiph, CountSamp = result
+    FreqCiph = [[chr(ord("A") + i), int(CountCiph[i])] for i in range(26)]
+    FreqSamp = [[chr(ord("a") + i), int(CountSamp[i])] for i in range(26)]
     SortCiph = sorted(FreqCiph, key = lambda x: x[1], reverse = True)
     SortSamp = sorted(FreqSamp, key = lambda x: x[1], reverse = True)
     ColoCiph = [(0,0,0) for i in range(26)]
@@ -131,18 +216,125 @@ def ButtonFreqCheckClick():
             ColoCiph[i] = ColoCiph[i-1]
         if SortSamp[i][1] == SortSamp[i-1][1]:
             ColoSamp[i] = ColoSamp[i-1]
-    plt.figure("Letter frequencies")
-    plt.subplot(211)
-    plt.bar([i for i in range(26)],
-            [SortCiph[i][1] for i in range(26)],
-            tick_label = [SortCiph[i][0] for i in range(26)],
-            color = ColoCiph)
-    plt.subplot(212)
-    plt.bar([i for i in range(26)],
-            [SortSamp[i][1] for i in range(26)],
-            tick_label = [SortSamp[i][0] for i in range(26)],
-            color = ColoSamp)
-    plt.show()
+    canvas, axes, bars = GetChart()
+    for ax, bar, Sort, Colo in zip(axes, bars, (SortCiph, SortSamp), (ColoCiph, ColoSamp)):
+        for i in range(26):
+            bar[i].set_height(Sort[i][1])
+            bar[i].set_color(Colo[i])
+        ax.set_xticklabels([Sort[i][0] for i in range(26)])
+        ax.set_ylim(0, max(1, Sort[0][1]) * 1.05)
+    canvas.draw_idle()
+    if trace:
+        LabelFreqAnFeedback["text"] = trace.Finish()
+
+# This function is invoked when the user clicks the button
+# "Solve Caesar/Atbash".
+# It counts the letters of the ciphertext in the background.
+# Then all Caesar alphabets and the Atbash alphabet are scored
+# against the letter frequencies of the sample text (or of
+# German, if there is no sample text) and the best one is
+# selected.
+def ButtonFreqSolveClick():
+    ClearFeedbackLabels()
+    ciph = ViewCiph.Source()
+    SampleProfile = GetSampleProfile()
+    if SampleProfile.Letters() == 0:
+        profile = None
+    else:
+        profile = SampleProfile.LetterProfile()
+    trace = Timer.Begin("solve caesar")
+    Jobs.Run("solve caesar", lambda job: CountLettersWork(job, ciph, trace),
+             lambda counts: SolveCaesarDone(counts, profile, trace),
+             lambda error: ShowJobError(LabelFreqAnFeedback, error))
+
+# This function selects the best Caesar or Atbash alphabet for
+# the letter counts of the ciphertext (see ButtonFreqSolveClick).
+def SolveCaesarDone(counts, profile, trace):
+    if counts.sum() == 0:
+        LabelFreqAnFeedback["text"] = "No ciphertext to analyse"
+        return
+    mode, first, score = CipherEngine.SolveCaesar(counts, profile)
+    GeneralMode.set(mode)
+    ChangeMode()
+    if mode == 0:
+        ComboText[0].set(first)
+        UpdateCombosCaesarMode()
+        UpdatePlaintext()
+    LabelFreqAnFeedback["text"] = trace.Finish("Best key found (chi-squared: %.1f)" % score)
+
+# This function is invoked when the user clicks the button
+# "Solve general substitution".
+# It builds a quadgram table from the sample text and starts
+# random restarts of a hill climb on the first SOLVER_SAMPLE
+# letters of the ciphertext in the background, which
+# search the general substitution key that makes the plaintext
+# look most like the sample text. The best key found so far is
+# shown while the search runs.
+def ButtonFreqSolveGeneralClick():
+    global SolverThread, SolverJob
+    ClearFeedbackLabels()
+    if SolverThread is not None:
+        LabelFreqAnFeedback["text"] = "The solver is already running"
+        return
+    ciph = CipherEngine.NormalizedSample(ViewCiph.Source(), CipherEngine.SOLVER_SAMPLE)
+    SampleProfile = GetSampleProfile()
+    if SampleProfile.Letters() < 4:
+        LabelFreqAnFeedback["text"] = "Load a sample text first"
+        return
+    if len(ciph) < 4:
+        LabelFreqAnFeedback["text"] = "No ciphertext to analyse"
+        return
+    table = SampleProfile.QuadgramTable()
+    GeneralMode.set(1)
+    ChangeMode()
+    SolverJob = CipherEngine.Job()
+    SolverThread = threading.Thread(target = RunSolver, args = (ciph, table, SolverJob),
+                                    daemon = True)
+    SolverThread.start()
+    LabelFreqAnFeedback["text"] = "Searching key..."
+    root.after(100, PollSolver)
+
+# This function runs in a background thread. It passes every
+# result of the parallel solver to the queue SolverUpdates and
+# None when the solver has finished. Cancelling job stops the
+# solver and the restarts which have not started yet.
+def RunSolver(ciph, table, job):
+    try:
+        for update in CipherEngine.SolveSubstitutionParallel(ciph, table,
+                                                              mp_context = SolverContext,
+                                                              job = job):
+            SolverUpdates.put(update)
+    except CipherEngine.JobCancelled:
+        pass
+    finally:
+        SolverUpdates.put(None)
+
+# This function is called periodically while the solver runs.
+# It shows the best key found so far in the combo boxes and the
+# throughput of the solver.
+def PollSolver():
+    global SolverThread
+    latest = None
+    finished = False
+    while not SolverUpdates.empty():
+        update = SolverUpdates.get()
+        if update is None:
+            finished = True
+        else:
+            latest = update
+    if latest is not None:
+        alphabet, score, done, tried, elapsed = latest
+        for i in range(26):
+            ComboText[i].set(alphabet[i])
+        UpdatePlaintext()
+        LabelFreqAnFeedback["text"] = ("Best key after %d restarts (%.0f swaps/s)"
+                                       % (done, tried / max(elapsed, 1e-9)))
+    if finished:
+        SolverThread = None
+        if SolverJob.cancelled:
+            LabelFreqAnFeedback["text"] = "Cancelled"
+    else:
+        root.after(100, PollSolver)
 
 # This function is invoked when the user selects a radio
 # button corresponding to one of the various cipher modes.
@@ -223,154 +415,369 @@ def FocusOutCombo(contents, index):
                 break
     UpdatePlaintext()
 
+# This function returns the substitution key given by the
+# combo boxes. The keys of recently used alphabets are taken
+# from the key cache of CipherEngine instead of being compiled
+# again. While a combo box does not hold exactly one character,
+# e.g. because the user is still editing it, None is returned.
+def GetSubstitutionKey():
+    substitutes = [ComboText[i].get() for i in range(26)]
+    if any(len(c) != 1 for c in substitutes):
+        return None
+    try:
+        return CipherEngine.GetCompiledKey("substitution", "".join(substitutes)).substitution
+    except ValueError:
+        return None
+
 # This function is invoked whenever the encryption mode
-# is changed. It applies the decryption to the ciphertext.
+# is changed. The decryption is applied shortly afterwards, so that
+# rapid changes of the key only cause one update.
 def UpdatePlaintext():
-    ciph = NormalizeText(TextCiph.get("1.0", "end")[:-1])
-    TextCiph.delete("1.0", "end")
-    TextCiph.insert("1.0", ciph)
-    plain = ""
-    for c in ciph:
-        if ((ord(c) < ord("A")) or (ord(c) > ord("Z"))):
-            plain += c
-        else:
-            plain += ComboText[ord(c)-ord("A")].get()
-    TextPlain.delete("1.0", "end")
-    TextPlain.insert("1.0", plain)
-
-# The window is divided into three frames.
-FramePlain = ttk.Frame(master = root)
-FramePlain["borderwidth"] = 5
-FramePlain["relief"] = "sunken"
-FrameKey = ttk.Frame(master = root)
-FrameKey["borderwidth"] = 5
-FrameKey["relief"] = "sunken"
-FrameCiph = ttk.Frame(master = root)
-FrameCiph["borderwidth"] = 5
-FrameCiph["relief"] = "sunken"
-FrameCiph.pack(side = "left", fill = "both", expand = True)
-FrameKey.pack(side = "left", fill = "y")
-FramePlain.pack(side = "left", fill = "both", expand = True)
-
-# The labels, entries, buttons and text fields
-# are defined and adjusted.
-LabelPlainCaption = ttk.Label(master = FramePlain, text = "Plaintext")
-LabelPlainCaption.pack(side = "top", pady = 5)
-FramePlainBtnEntry = ttk.Frame(master = FramePlain)
-FramePlainBtnEntry.pack(side = "top", padx = 15, pady = 5, fill = "x")
-ButtonPlainSave = ttk.Button(master = FramePlainBtnEntry,
-                             text = "Save plaintext to file:",
-                             width = 30,
-                             command = ButtonPlainSaveClick)
-PathPlain = tk.StringVar(value = "./text.txt")
-EntryPlain = ttk.Entry(master = FramePlainBtnEntry, text = PathPlain)
-ButtonPlainSave.pack(side = "left", padx = 10)
-EntryPlain.pack(side = "left", padx = 10, fill = "x", expand = True)
-LabelPlainFeedback = ttk.Label(master = FramePlain, text = "")
-LabelPlainFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
-TextPlain = tk.Text(master = FramePlain, width = 10)
-TextPlain.pack(side = "bottom", fill = "both", expand = True, padx = 25, pady = 10)
-
-LabelKeyCaption = ttk.Label(master = FrameKey, text = "Key")
-LabelKeyCaption.pack(side = "top", pady = 5)
-KeepBlanks = tk.StringVar(value = 1)
-KeepNonalpha = tk.StringVar(value = 1)
-CheckKeyKeepBlanks = ttk.Checkbutton(master = FrameKey, text = "Keep blanks",
-                                     variable = KeepBlanks)
-CheckKeyKeepSpecials = ttk.Checkbutton(master = FrameKey, text = "Keep non-alphabetic chars",
-                                       variable = KeepNonalpha)
-CheckKeyKeepBlanks.pack(side = "top", padx = 25, pady = 5, fill = "x")
-CheckKeyKeepSpecials.pack(side = "top", padx = 25, pady = 5, fill = "x")
-GeneralMode = tk.IntVar(value = 0)
-RadioButtonAtbash = ttk.Radiobutton(master = FrameKey, text = "Atbash",
-                                    value = -1, variable = GeneralMode,
-                                    command = ChangeMode)
-RadioButtonCaesar = ttk.Radiobutton(master = FrameKey, text = "Caesar",
-                                    value = 0, variable = GeneralMode,
-                                    command = ChangeMode)
-RadioButtonGeneral = ttk.Radiobutton(master = FrameKey, text = "General",
-                                    value = 1, variable = GeneralMode,
-                                    command = ChangeMode)
-RadioButtonAtbash.pack(side = "top", fill = "x", padx = 25, pady = 5)
-RadioButtonCaesar.pack(side = "top", fill = "x", padx = 25, pady = 5)
-RadioButtonGeneral.pack(side = "top", fill = "x", padx = 25, pady = 5)
-FrameKeyPad1 = ttk.Frame(master = FrameKey)
-FrameKeyPad2 = ttk.Frame(master = FrameKey)
-FrameKeyPad2["borderwidth"] = 5
-FrameKeyPad2["relief"] = "sunken"
-FrameKeyPad3 = ttk.Frame(master = FrameKey)
-FrameKeyPad1.pack(side = "left", fill = "both", padx = 25)
-FrameKeyPad3.pack(side = "right", fill = "both", padx = 25)
-FrameKeyPad2.pack(side = "right", fill = "both", expand = True)
-FramesSubst = []
-LabelSubst = []
-ComboSubst = []
-ComboText = []
-for i in range(26):
-    if i < 13:
-        FramesSubst.append(ttk.Frame(master = FrameKeyPad1))
+    Jobs.Schedule("update", ApplyKey, DEBOUNCE)
+
+# This function applies the decryption to the ciphertext.
+# The normalized ciphertext and the positions of its letters are
+# kept, so as long as neither text field has been edited, only
+# the characters whose substitute has changed are rewritten in
+# the plaintext, or the whole text is substituted in the
+# background if they form more than MAX_RUNS runs. Otherwise
+# the ciphertext is normalized again in the background. trace
+# continues the timings of an update which normalized the text
+# first.
+def ApplyKey(trace = None):
+    if trace is None:
+        trace = Timer.Begin("apply key")
+    options = (KeepBlanks.get(), KeepNonalpha.get())
+    key = GetSubstitutionKey()
+    if key is None:
+        # The key is incomplete; FocusOutCombo schedules the
+        # update again once the combo box has been left.
+        return
+    alphabet = key.alphabet
+    if ((Incremental is None) or (IncrementalOptions != options)
+            or ViewPlain.Modified() or ViewCiph.Modified()):
+        text = ViewCiph.Source()
+        Jobs.Run("update",
+                 lambda job: SubstitutionWork(job, text, alphabet, options, trace),
+                 lambda result: SubstitutionDone(result, trace),
+                 lambda error: ShowJobError(LabelPlainFeedback, error))
+        return
+    # A paged view only renders the visible rows, and while a
+    # whole text is being substituted, the runs would be applied
+    # to the text before it, so both take the whole text.
+    max_runs = MAX_RUNS
+    if ViewPlain.Paged() or Jobs.Running("substitute"):
+        max_runs = 0
+    with trace.Stage("transform"):
+        runs = Incremental.Update(alphabet, max_runs)
+    if runs is None:
+        incremental = Incremental
+        substitution = incremental.key
+        Jobs.Run("substitute",
+                 lambda job: SubstituteWork(job, incremental.text, substitution, trace),
+                 lambda result: SubstituteDone(incremental, result, trace),
+                 lambda error: ShowJobError(LabelPlainFeedback, error))
+        return
+    with trace.Stage("display"):
+        for start, end, text in runs:
+            ViewPlain.Replace(start, end, text)
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    if trace:
+        LabelPlainFeedback["text"] = trace.Finish()
+
+# This function runs in the background. It normalizes the
+# ciphertext piece by piece and prepares its decryption.
+def SubstitutionWork(job, text, alphabet, options, trace):
+    keep_blanks = (options[0] == "1")
+    keep_nonalpha = (options[1] == "1")
+    normalized = []
+    for piece in CipherEngine.Chunks(job, text):
+        with trace.Stage("normalize") as stage:
+            normalized.append(CipherEngine.NormalizeText(piece, keep_blanks, keep_nonalpha))
+            stage.Count(normalized[-1])
+    with trace.Stage("transform"):
+        incremental = CipherEngine.IncrementalSubstitution("".join(normalized), alphabet)
+        incremental.Result()
+    return incremental, options
+
+# This function runs in the background. It substitutes the
+# whole text with the SubstitutionKey substitution, when too
+# many characters changed to rewrite them one run at a time.
+def SubstituteWork(job, text, substitution, trace):
+    with trace.Stage("transform") as stage:
+        result = substitution.Apply(text)
+        stage.Count(result)
+    return result
+
+# This function shows the result of SubstituteWork in the
+# plaintext field, unless the text has been normalized again in
+# the meantime.
+def SubstituteDone(incremental, result, trace):
+    if incremental is not Incremental:
+        return
+    with trace.Stage("display"):
+        ViewPlain.Set(result)
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    if trace:
+        LabelPlainFeedback["text"] = trace.Finish()
+
+# This function shows the result of SubstitutionWork in the
+# text fields. Changes of the key made in the meantime are
+# applied afterwards.
+def SubstitutionDone(result, trace):
+    global Incremental, IncrementalOptions
+    Incremental, IncrementalOptions = result
+    with trace.Stage("display"):
+        ViewCiph.Set(Incremental.text)
+        ViewPlain.Set(Incremental.Result())
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    ApplyKey(trace)
+
+# This function is invoked when the user clicks the button
+# "Cancel". It stops the running jobs and the general solver.
+def ButtonCancelClick():
+    Jobs.Cancel()
+    if SolverJob is not None:
+        SolverJob.cancelled = True
+
+# This function shows the progress of the running jobs
+# (between 0 and 1, or None if no job is running).
+def ShowProgress(fraction):
+    if fraction is None:
+        Progress.set(0)
     else:
-        FramesSubst.append(ttk.Frame(master = FrameKeyPad3))
-    FramesSubst[i].pack(side = "top", fill = "both", expand = True)
-    LabelSubst.append(ttk.Label(master = FramesSubst[i], text = chr(ord("A")+i) + " "))
-    ComboText.append(tk.StringVar(value = chr(ord("A")+i)))
-    ComboSubst.append(ttk.Combobox(master = FramesSubst[i],
-                                   width = 2,
-                                   textvariable = ComboText[i],
-                                   postcommand = lambda i=i: FillComboList(i)))
-    ComboSubst[i].bind("<FocusOut>", lambda event, i=i: FocusOutCombo(ComboText[i], i))   
-for i in range(13):
-    LabelSubst[i].pack(side = "left", fill = "x", expand = True)
-    ComboSubst[i].pack(side = "right")
-    LabelSubst[i+13].pack(side = "left", fill = "x", expand = True)
-    ComboSubst[i+13].pack(side = "right")
-
-LabelCiphCaption = ttk.Label(master = FrameCiph, text = "Ciphertext")
-LabelCiphCaption.pack(side = "top", pady = 5)
-FrameCiphBtnEntry = ttk.Frame(master = FrameCiph)
-FrameCiphBtnEntry.pack(side = "top", padx = 15, pady = 5, fill = "x")
-ButtonCiphLoad = ttk.Button(master = FrameCiphBtnEntry,
-                            text = "Load ciphertext from file:",
-                            width = ButtonPlainSave.cget("width"),
-                            command = ButtonCiphLoadClick)
-PathCiph = tk.StringVar(value = "./text.txt")
-EntryCiph = ttk.Entry(master = FrameCiphBtnEntry, text = PathCiph)
-ButtonCiphLoad.pack(side = "left", padx = 10)
-EntryCiph.pack(side = "left", padx = 10, fill = "x", expand = True)
-LabelCiphFeedback = ttk.Label(master = FrameCiph, text = "")
-LabelCiphFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
-TextCiph = tk.Text(master = FrameCiph, width = 10)
-TextCiph.pack(side = "top", fill = "both", expand = True, padx = 25, pady = 10)
-
-# The frame for the sample text and the frequency analysis
-# is defined.
-FrameFreqAn = ttk.Frame(master = FrameCiph)
-FrameFreqAn["relief"] = "groove"
-FrameFreqAn.pack(side = "bottom", fill = "both")
-LabelFreqAnCaption = ttk.Label(master = FrameFreqAn, text = "Sample text to estimate letter frequencies")
-LabelFreqAnCaption.pack(side = "top", pady = 5)
-FrameFreqAnBtnEntry = ttk.Frame(master = FrameFreqAn)
-FrameFreqAnBtnEntry.pack(side = "top", padx = 10, pady = 5, fill = "x")
-ButtonFreqAnLoad = ttk.Button(master = FrameFreqAnBtnEntry,
-                            text = "Load sample text from file:",
-                            width = ButtonPlainSave.cget("width"),
-                            command = ButtonFreqAnLoadClick)
-PathFreqAn = tk.StringVar(value = "./sample.txt")
-EntryFreqAn = ttk.Entry(master = FrameFreqAnBtnEntry, text = PathFreqAn)
-ButtonFreqAnLoad.pack(side = "left", padx = 10)
-EntryFreqAn.pack(side = "left", padx = 10, fill = "x", expand = True)
-FrameFreqAnLblBtn = ttk.Frame(master = FrameFreqAn)
-FrameFreqAnLblBtn.pack(side = "top", padx = 10, pady = 5, fill = "x")
-LabelFreqAnFeedback = ttk.Label(master = FrameFreqAnLblBtn, text = "")
-ButtonFreqCheck = ttk.Button(master = FrameFreqAnLblBtn,
-                            text = "Compare letter frequencies",
-                            width = ButtonPlainSave.cget("width"),
-                            command = ButtonFreqCheckClick)
-LabelFreqAnFeedback.pack(side = "left", padx = 10, pady = 5, fill = "x")
-ButtonFreqCheck.pack(side = "right", padx = 10, fill = "x")
-TextFreqAn = tk.Text(master = FrameFreqAn, width = 10, height = 5)
-TextFreqAn.pack(side = "bottom", fill = "both", expand = True, padx = 20, pady = 10)
-
-    
-ChangeMode()
-root.mainloop()
+        Progress.set(fraction)
+
+# This function is invoked when the user clicks the button
+# "Decode file to file".
+# It normalizes the file specified in the ciphertext entry
+# field, decodes it with the current key and writes the result
+# to the file specified in the plaintext entry field, without
+# loading the files into the text fields. Large ASCII files
+# are translated through a memory map.
+def ButtonFileDecodeClick():
+    ClearFeedbackLabels()
+    key = GetSubstitutionKey()
+    if key is None:
+        LabelPlainFeedback["text"] = "Incomplete key"
+        return
+    trace = Timer.Begin("decode file")
+    try:
+        with trace.Stage("transform") as stage:
+            CipherEngine.SubstituteFile(PathCiph.get(), PathPlain.get(), key,
+                                        keep_blanks = (KeepBlanks.get() == "1"),
+                                        keep_nonalpha = (KeepNonalpha.get() == "1"))
+            stage.CountFile(PathCiph.get())
+    except:
+        LabelPlainFeedback["text"] = "An error occurred while decoding the file."
+    else:
+        LabelPlainFeedback["text"] = trace.Finish("File decoded successfully.")
+
+# This function is bound to the first <Expose> event of the
+# window, i.e. when it is mapped on the screen. It processes the
+# pending redraws of all widgets, prints the time from StartTime
+# until then and closes the window. It is used by
+# benchmarks/startup.py.
+def ReportStartup(event):
+    if event.widget is not root:
+        return
+    root.unbind("<Expose>")
+    root.update()
+    print("Startup time: %.3f s" % (time.time() - StartTime), flush = True)
+    root.after_idle(root.destroy)
+
+if not IS_WORKER:
+    # An object (root) is created which represents the window.
+    # Its title and full screen property are set.
+    root = tk.Tk()
+    root.title("Monoalphabetic decryption")
+    root.wm_state("zoomed")
+
+    # The transforms run in the background, so the window does not
+    # freeze on large texts.
+    Jobs = CipherEngine.BackgroundJobs(root)
+    # If the environment variable CIPHER_TIMINGS is set, the time
+    # spent in every stage of an operation is shown in the feedback
+    # labels and logged as JSON lines.
+    Timer = CipherEngine.TimerFromEnvironment()
+
+    # The window is divided into three frames.
+    FramePlain = ttk.Frame(master = root)
+    FramePlain["borderwidth"] = 5
+    FramePlain["relief"] = "sunken"
+    FrameKey = ttk.Frame(master = root)
+    FrameKey["borderwidth"] = 5
+    FrameKey["relief"] = "sunken"
+    FrameCiph = ttk.Frame(master = root)
+    FrameCiph["borderwidth"] = 5
+    FrameCiph["relief"] = "sunken"
+    FrameCiph.pack(side = "left", fill = "both", expand = True)
+    FrameKey.pack(side = "left", fill = "y")
+    FramePlain.pack(side = "left", fill = "both", expand = True)
+
+    # The labels, entries, buttons and text fields
+    # are defined and adjusted.
+    LabelPlainCaption = ttk.Label(master = FramePlain, text = "Plaintext")
+    LabelPlainCaption.pack(side = "top", pady = 5)
+    FramePlainBtnEntry = ttk.Frame(master = FramePlain)
+    FramePlainBtnEntry.pack(side = "top", padx = 15, pady = 5, fill = "x")
+    ButtonPlainSave = ttk.Button(master = FramePlainBtnEntry,
+                                 text = "Save plaintext to file:",
+                                 width = 30,
+                                 command = ButtonPlainSaveClick)
+    PathPlain = tk.StringVar(value = "./text.txt")
+    EntryPlain = ttk.Entry(master = FramePlainBtnEntry, text = PathPlain)
+    ButtonPlainSave.pack(side = "left", padx = 10)
+    EntryPlain.pack(side = "left", padx = 10, fill = "x", expand = True)
+    LabelPlainFeedback = ttk.Label(master = FramePlain, text = "")
+    LabelPlainFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
+    TextPlain = tk.Text(master = FramePlain, width = 10)
+    TextPlain.pack(side = "bottom", fill = "both", expand = True, padx = 25, pady = 10)
+
+    LabelKeyCaption = ttk.Label(master = FrameKey, text = "Key")
+    LabelKeyCaption.pack(side = "top", pady = 5)
+    KeepBlanks = tk.StringVar(value = 1)
+    KeepNonalpha = tk.StringVar(value = 1)
+    CheckKeyKeepBlanks = ttk.Checkbutton(master = FrameKey, text = "Keep blanks",
+                                         variable = KeepBlanks)
+    CheckKeyKeepSpecials = ttk.Checkbutton(master = FrameKey, text = "Keep non-alphabetic chars",
+                                           variable = KeepNonalpha)
+    CheckKeyKeepBlanks.pack(side = "top", padx = 25, pady = 5, fill = "x")
+    CheckKeyKeepSpecials.pack(side = "top", padx = 25, pady = 5, fill = "x")
+    GeneralMode = tk.IntVar(value = 0)
+    RadioButtonAtbash = ttk.Radiobutton(master = FrameKey, text = "Atbash",
+                                        value = -1, variable = GeneralMode,
+                                        command = ChangeMode)
+    RadioButtonCaesar = ttk.Radiobutton(master = FrameKey, text = "Caesar",
+                                        value = 0, variable = GeneralMode,
+                                        command = ChangeMode)
+    RadioButtonGeneral = ttk.Radiobutton(master = FrameKey, text = "General",
+                                        value = 1, variable = GeneralMode,
+                                        command = ChangeMode)
+    RadioButtonAtbash.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    RadioButtonCaesar.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    RadioButtonGeneral.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    ButtonFileDecode = ttk.Button(master = FrameKey,
+                                  text = "Decode file to file",
+                                  command = ButtonFileDecodeClick)
+    ButtonFileDecode.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    Progress = tk.DoubleVar(value = 0)
+    ProgressBar = ttk.Progressbar(master = FrameKey, variable = Progress, maximum = 1)
+    ProgressBar.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    ButtonCancel = ttk.Button(master = FrameKey,
+                              text = "Cancel",
+                              command = ButtonCancelClick)
+    ButtonCancel.pack(side = "top", fill = "x", padx = 25, pady = 5)
+    Jobs.OnProgress = ShowProgress
+    FrameKeyPad1 = ttk.Frame(master = FrameKey)
+    FrameKeyPad2 = ttk.Frame(master = FrameKey)
+    FrameKeyPad2["borderwidth"] = 5
+    FrameKeyPad2["relief"] = "sunken"
+    FrameKeyPad3 = ttk.Frame(master = FrameKey)
+    FrameKeyPad1.pack(side = "left", fill = "both", padx = 25)
+    FrameKeyPad3.pack(side = "right", fill = "both", padx = 25)
+    FrameKeyPad2.pack(side = "right", fill = "both", expand = True)
+    FramesSubst = []
+    LabelSubst = []
+    ComboSubst = []
+    ComboText = []
+    Incremental = None
+    IncrementalOptions = None
+    # If more runs of characters change, the whole text is replaced.
+    MAX_RUNS = 10000
+    SolverThread = None
+    SolverUpdates = queue.Queue()
+    SolverJob = None
+    # The worker processes of the solver are not forked from this
+    # process, which runs Tk and several threads, but started by a
+    # fork server (or spawned where there is none). They import
+    # this script as __mp_main__, which does not open a window.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        SolverContext = multiprocessing.get_context("forkserver")
+    else:
+        SolverContext = multiprocessing.get_context("spawn")
+    for i in range(26):
+        if i < 13:
+            FramesSubst.append(ttk.Frame(master = FrameKeyPad1))
+        else:
+            FramesSubst.append(ttk.Frame(master = FrameKeyPad3))
+        FramesSubst[i].pack(side = "top", fill = "both", expand = True)
+        LabelSubst.append(ttk.Label(master = FramesSubst[i], text = chr(ord("A")+i) + " "))
+        ComboText.append(tk.StringVar(value = chr(ord("A")+i)))
+        ComboSubst.append(ttk.Combobox(master = FramesSubst[i],
+                                       width = 2,
+                                       textvariable = ComboText[i],
+                                       postcommand = lambda i=i: FillComboList(i)))
+        ComboSubst[i].bind("<FocusOut>", lambda event, i=i: FocusOutCombo(ComboText[i], i))   
+    for i in range(13):
+        LabelSubst[i].pack(side = "left", fill = "x", expand = True)
+        ComboSubst[i].pack(side = "right")
+        LabelSubst[i+13].pack(side = "left", fill = "x", expand = True)
+        ComboSubst[i+13].pack(side = "right")
+
+    LabelCiphCaption = ttk.Label(master = FrameCiph, text = "Ciphertext")
+    LabelCiphCaption.pack(side = "top", pady = 5)
+    FrameCiphBtnEntry = ttk.Frame(master = FrameCiph)
+    FrameCiphBtnEntry.pack(side = "top", padx = 15, pady = 5, fill = "x")
+    ButtonCiphLoad = ttk.Button(master = FrameCiphBtnEntry,
+                                text = "Load ciphertext from file:",
+                                width = ButtonPlainSave.cget("width"),
+                                command = ButtonCiphLoadClick)
+    PathCiph = tk.StringVar(value = "./text.txt")
+    EntryCiph = ttk.Entry(master = FrameCiphBtnEntry, text = PathCiph)
+    ButtonCiphLoad.pack(side = "left", padx = 10)
+    EntryCiph.pack(side = "left", padx = 10, fill = "x", expand = True)
+    LabelCiphFeedback = ttk.Label(master = FrameCiph, text = "")
+    LabelCiphFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
+    TextCiph = tk.Text(master = FrameCiph, width = 10)
+    TextCiph.pack(side = "top", fill = "both", expand = True, padx = 25, pady = 10)
+    # The views page through texts too large for the text fields.
+    ViewPlain = PagedTextView.TextView(TextPlain)
+    ViewCiph = PagedTextView.TextView(TextCiph)
+
+    # The frame for the sample text and the frequency analysis
+    # is defined.
+    FrameFreqAn = ttk.Frame(master = FrameCiph)
+    FrameFreqAn["relief"] = "groove"
+    FrameFreqAn.pack(side = "bottom", fill = "both")
+    LabelFreqAnCaption = ttk.Label(master = FrameFreqAn, text = "Sample text to estimate letter frequencies")
+    LabelFreqAnCaption.pack(side = "top", pady = 5)
+    FrameFreqAnBtnEntry = ttk.Frame(master = FrameFreqAn)
+    FrameFreqAnBtnEntry.pack(side = "top", padx = 10, pady = 5, fill = "x")
+    ButtonFreqAnLoad = ttk.Button(master = FrameFreqAnBtnEntry,
+                                text = "Load sample text from file:",
+                                width = ButtonPlainSave.cget("width"),
+                                command = ButtonFreqAnLoadClick)
+    PathFreqAn = tk.StringVar(value = "./sample.txt")
+    EntryFreqAn = ttk.Entry(master = FrameFreqAnBtnEntry, text = PathFreqAn)
+    ButtonFreqAnLoad.pack(side = "left", padx = 10)
+    EntryFreqAn.pack(side = "left", padx = 10, fill = "x", expand = True)
+    FrameFreqAnLblBtn = ttk.Frame(master = FrameFreqAn)
+    FrameFreqAnLblBtn.pack(side = "top", padx = 10, pady = 5, fill = "x")
+    LabelFreqAnFeedback = ttk.Label(master = FrameFreqAnLblBtn, text = "")
+    ButtonFreqCheck = ttk.Button(master = FrameFreqAnLblBtn,
+                                text = "Compare letter frequencies",
+                                width = ButtonPlainSave.cget("width"),
+                                command = ButtonFreqCheckClick)
+    LabelFreqAnFeedback.pack(side = "left", padx = 10, pady = 5, fill = "x")
+    ButtonFreqSolve = ttk.Button(master = FrameFreqAnLblBtn,
+                                text = "Solve Caesar/Atbash",
+                                command = ButtonFreqSolveClick)
+    ButtonFreqCheck.pack(side = "right", padx = 10, fill = "x")
+    ButtonFreqSolve.pack(side = "right", padx = 10, fill = "x")
+    ButtonFreqSolveGeneral = ttk.Button(master = FrameFreqAnLblBtn,
+                                       text = "Solve general substitution",
+                                       command = ButtonFreqSolveGeneralClick)
+    ButtonFreqSolveGeneral.pack(side = "right", padx = 10, fill = "x")
+    TextFreqAn = tk.Text(master = FrameFreqAn, width = 10, height = 5)
+    TextFreqAn.pack(side = "bottom", fill = "both", expand = True, padx = 20, pady = 10)
+
+
+    ChangeMode()
+
+    if "--startup-time" in sys.argv:
+        root.bind("<Expose>", ReportStartup)
+    root.mainloop()
@@ -1,6 +1,10 @@
 # tkinter provides GUI objects and commands
 import tkinter as tk
 import tkinter.ttk as ttk
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+# PagedTextView shows large texts page by page
+import PagedTextView
 
 # An object (root) is created which represents the window.
 # Its title and full screen property are set.
@@ -8,35 +12,34 @@ root = tk.Tk()
 root.title("Monoalphabetic encryption")
 root.wm_state("zoomed")
 
+# The transforms run in the background, so the window does not
+# freeze on large texts.
+Jobs = CipherEngine.BackgroundJobs(root)
+# If the environment variable CIPHER_TIMINGS is set, the time
+# spent in every stage of an operation is shown in the feedback
+# labels and logged as JSON lines.
+Timer = CipherEngine.TimerFromEnvironment()
+# Delay in milliseconds before a change of the key is applied
+DEBOUNCE = 150
+
 # This function normalizes the parameter text according to the
 # settings "Keep blanks" and "Keep non-alphabetic chars".
 def NormalizeText(text, strict = False):
-    s = ""
-    for c in text:
-        if ((ord(c) <= ord("Z")) and (ord(c) >= ord("A"))):
-            s += c
-        elif ((ord(c) <= ord("z")) and (ord(c) >= ord("a"))):
-            s += chr(ord(c) + ord("A") - ord("a"))
-        elif ((c == "ä") or (c == "Ä")):
-            s += "AE"
-        elif ((c == "ö") or (c == "Ö")):
-            s += "OE"
-        elif ((c == "ü") or (c == "Ü")):
-            s += "UE"
-        elif (c == "ß"):
-            s += "SS"
-        elif ((c == " ") or (ord(c) == 10)):
-            if ((KeepBlanks.get() == "1") and not strict):
-                s += " "
-        elif ((KeepNonalpha.get() == "1") and not strict):
-            s += c
-    return s
+    return CipherEngine.NormalizeText(text,
+                                      keep_blanks = (KeepBlanks.get() == "1"),
+                                      keep_nonalpha = (KeepNonalpha.get() == "1"),
+                                      strict = strict)
 
 # The labels used to interact with the user are cleared.
 def ClearFeedbackLabels():
     LabelPlainFeedback["text"] = ""
     LabelCiphFeedback["text"] = ""
 
+# This function tells the user in label that a background job
+# failed with error.
+def ShowJobError(label, error):
+    label["text"] = "An error occurred: %s" % error
+
 # This function is invoked when the user clicks the button
 # "Load plaintext from file".
 # It tries to open a textfile with the name specified in the
@@ -45,19 +48,24 @@ def ClearFeedbackLabels():
 # prints its contents in the text field below.
 def ButtonPlainLoadClick():
     ClearFeedbackLabels()
+    trace = Timer.Begin("load plaintext")
     try:
-        with open(PathPlain.get(), mode = "rt", encoding = "utf-8") as PlainFile:
-            plain = PlainFile.read()
+        with trace.Stage("load") as stage:
+            with open(PathPlain.get(), mode = "rt", encoding = "utf-8") as PlainFile:
+                plain = PlainFile.read()
+            stage.CountFile(PathPlain.get())
     except:
         LabelPlainFeedback["text"] = "An error occurred while reading the file."
     else:
         if plain == "":
             LabelPlainFeedback["text"] = "File empty"
         else:
-            plain = NormalizeText(plain)
-            TextPlain.delete("1.0", "end")
-            TextPlain.insert("1.0", plain)
-            LabelPlainFeedback["text"] = "File loaded successfully."
+            with trace.Stage("normalize") as stage:
+                plain = NormalizeText(plain)
+                stage.Count(plain)
+            with trace.Stage("display"):
+                ViewPlain.Set(plain)
+            LabelPlainFeedback["text"] = trace.Finish("File loaded successfully.")
 
 # This function is invoked when the user clicks the button
 # "Save ciphertext to file".
@@ -68,18 +76,21 @@ def ButtonPlainLoadClick():
 # textfile succeeded.
 def ButtonCiphSaveClick():
     ClearFeedbackLabels()
-    ciph = TextCiph.get("1.0", "end")[:-1]
-    if len(ciph) < 1:
+    length = ViewCiph.Length()
+    if length < 1:
         LabelCiphFeedback["text"] = "Nothing to save"
         return
+    trace = Timer.Begin("save ciphertext")
     try:
-        with open(PathCiph.get(), mode = "wt", encoding = "utf-8") as CiphFile:
-            if (CiphFile.write(ciph) != len(ciph)):
-                raise Exception
+        with trace.Stage("save") as stage:
+            with open(PathCiph.get(), mode = "wt", encoding = "utf-8") as CiphFile:
+                if (ViewCiph.Save(CiphFile) != length):
+                    raise Exception
+            stage.CountFile(PathCiph.get())
     except:
         LabelCiphFeedback["text"] = "An error occurred while saving to file."
     else:
-        LabelCiphFeedback["text"] = "Ciphertext saved successfully."
+        LabelCiphFeedback["text"] = trace.Finish("Ciphertext saved successfully.")
 
 # This function is invoked when the user selects a radio
 # button corresponding to one of the various cipher modes.
@@ -160,20 +171,164 @@ def FocusOutCombo(contents, index):
                 break
     UpdatePlaintext()
 
+# This function returns the substitution key given by the
+# combo boxes. The keys of recently used alphabets are taken
+# from the key cache of CipherEngine instead of being compiled
+# again. While a combo box does not hold exactly one character,
+# e.g. because the user is still editing it, None is returned.
+def GetSubstitutionKey():
+    substitutes = [ComboText[i].get() for i in range(26)]
+    if any(len(c) != 1 for c in substitutes):
+        return None
+    try:
+        return CipherEngine.GetCompiledKey("substitution", "".join(substitutes)).substitution
+    except ValueError:
+        return None
+
 # This function is invoked whenever the encryption mode
-# is changed. It applies the encryption to the plaintext.
+# is changed. The encryption is applied shortly afterwards, so that
+# rapid changes of the key only cause one update.
 def UpdatePlaintext():
-    plain = NormalizeText(TextPlain.get("1.0", "end")[:-1])
-    TextPlain.delete("1.0", "end")
-    TextPlain.insert("1.0", plain)
-    cipher = ""
-    for c in plain:
-        if ((ord(c) < ord("A")) or (ord(c) > ord("Z"))):
-            cipher += c
-        else:
-            cipher += ComboText[ord(c)-ord("A")].get()
-    TextCiph.delete("1.0", "end")
-    TextCiph.insert("1.0", cipher)
+    Jobs.Schedule("update", ApplyKey, DEBOUNCE)
+
+# This function applies the encryption to the plaintext.
+# The normalized plaintext and the positions of its letters are
+# kept, so as long as neither text field has been edited, only
+# the characters whose substitute has changed are rewritten in
+# the ciphertext, or the whole text is substituted in the
+# background if they form more than MAX_RUNS runs. Otherwise
+# the plaintext is normalized again in the background. trace
+# continues the timings of an update which normalized the text
+# first.
+def ApplyKey(trace = None):
+    if trace is None:
+        trace = Timer.Begin("apply key")
+    options = (KeepBlanks.get(), KeepNonalpha.get())
+    key = GetSubstitutionKey()
+    if key is None:
+        # The key is incomplete; FocusOutCombo schedules the
+        # update again once the combo box has been left.
+        return
+    alphabet = key.alphabet
+    if ((Incremental is None) or (IncrementalOptions != options)
+            or ViewPlain.Modified() or ViewCiph.Modified()):
+        text = ViewPlain.Source()
+        Jobs.Run("update",
+                 lambda job: SubstitutionWork(job, text, alphabet, options, trace),
+                 lambda result: SubstitutionDone(result, trace),
+                 lambda error: ShowJobError(LabelCiphFeedback, error))
+        return
+    # A paged view only renders the visible rows, and while a
+    # whole text is being substituted, the runs would be applied
+    # to the text before it, so both take the whole text.
+    max_runs = MAX_RUNS
+    if ViewCiph.Paged() or Jobs.Running("substitute"):
+        max_runs = 0
+    with trace.Stage("transform"):
+        runs = Incremental.Update(alphabet, max_runs)
+    if runs is None:
+        incremental = Incremental
+        substitution = incremental.key
+        Jobs.Run("substitute",
+                 lambda job: SubstituteWork(job, incremental.text, substitution, trace),
+                 lambda result: SubstituteDone(incremental, result, trace),
+                 lambda error: ShowJobError(LabelCiphFeedback, error))
+        return
+    with trace.Stage("display"):
+        for start, end, text in runs:
+            ViewCiph.Replace(start, end, text)
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    if trace:
+        LabelCiphFeedback["text"] = trace.Finish()
+
+# This function runs in the background. It normalizes the
+# plaintext piece by piece and prepares its encryption.
+def SubstitutionWork(job, text, alphabet, options, trace):
+    keep_blanks = (options[0] == "1")
+    keep_nonalpha = (options[1] == "1")
+    normalized = []
+    for piece in CipherEngine.Chunks(job, text):
+        with trace.Stage("normalize") as stage:
+            normalized.append(CipherEngine.NormalizeText(piece, keep_blanks, keep_nonalpha))
+            stage.Count(normalized[-1])
+    with trace.Stage("transform"):
+        incremental = CipherEngine.IncrementalSubstitution("".join(normalized), alphabet)
+        incremental.Result()
+    return incremental, options
+
+# This function runs in the background. It substitutes the
+# whole text with the SubstitutionKey substitution, when too
+# many characters changed to rewrite them one run at a time.
+def SubstituteWork(job, text, substitution, trace):
+    with trace.Stage("transform") as stage:
+        result = substitution.Apply(text)
+        stage.Count(result)
+    return result
+
+# This function shows the result of SubstituteWork in the
+# ciphertext field, unless the text has been normalized again in
+# the meantime.
+def SubstituteDone(incremental, result, trace):
+    if incremental is not Incremental:
+        return
+    with trace.Stage("display"):
+        ViewCiph.Set(result)
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    if trace:
+        LabelCiphFeedback["text"] = trace.Finish()
+
+# This function shows the result of SubstitutionWork in the
+# text fields. Changes of the key made in the meantime are
+# applied afterwards.
+def SubstitutionDone(result, trace):
+    global Incremental, IncrementalOptions
+    Incremental, IncrementalOptions = result
+    with trace.Stage("display"):
+        ViewPlain.Set(Incremental.text)
+        ViewCiph.Set(Incremental.Result())
+    ViewPlain.ResetModified()
+    ViewCiph.ResetModified()
+    ApplyKey(trace)
+
+# This function is invoked when the user clicks the button
+# "Cancel". It stops the running jobs.
+def ButtonCancelClick():
+    Jobs.Cancel()
+
+# This function shows the progress of the running jobs
+# (between 0 and 1, or None if no job is running).
+def ShowProgress(fraction):
+    if fraction is None:
+        Progress.set(0)
+    else:
+        Progress.set(fraction)
+
+# This function is invoked when the user clicks the button
+# "Encode file to file".
+# It normalizes the file specified in the plaintext entry
+# field, encodes it with the current key and writes the result
+# to the file specified in the ciphertext entry field, without
+# loading the files into the text fields. Large ASCII files
+# are translated through a memory map.
+def ButtonFileEncodeClick():
+    ClearFeedbackLabels()
+    key = GetSubstitutionKey()
+    if key is None:
+        LabelCiphFeedback["text"] = "Incomplete key"
+        return
+    trace = Timer.Begin("encode file")
+    try:
+        with trace.Stage("transform") as stage:
+            CipherEngine.SubstituteFile(PathPlain.get(), PathCiph.get(), key,
+                                        keep_blanks = (KeepBlanks.get() == "1"),
+                                        keep_nonalpha = (KeepNonalpha.get() == "1"))
+            stage.CountFile(PathPlain.get())
+    except:
+        LabelCiphFeedback["text"] = "An error occurred while encoding the file."
+    else:
+        LabelCiphFeedback["text"] = trace.Finish("File encoded successfully.")
 
 # The window is divided into three frames.
 FramePlain = ttk.Frame(master = root)
@@ -231,6 +386,18 @@ RadioButtonGeneral = ttk.Radiobutton(master = FrameKey, text = "General",
 RadioButtonAtbash.pack(side = "top", fill = "x", padx = 25, pady = 5)
 RadioButtonCaesar.pack(side = "top", fill = "x", padx = 25, pady = 5)
 RadioButtonGeneral.pack(side = "top", fill = "x", padx = 25, pady = 5)
+ButtonFileEncode = ttk.Button(master = FrameKey,
+                              text = "Encode file to file",
+                              command = ButtonFileEncodeClick)
+ButtonFileEncode.pack(side = "top", fill = "x", padx = 25, pady = 5)
+Progress = tk.DoubleVar(value = 0)
+ProgressBar = ttk.Progressbar(master = FrameKey, variable = Progress, maximum = 1)
+ProgressBar.pack(side = "top", fill = "x", padx = 25, pady = 5)
+ButtonCancel = ttk.Button(master = FrameKey,
+                          text = "Cancel",
+                          command = ButtonCancelClick)
+ButtonCancel.pack(side = "top", fill = "x", padx = 25, pady = 5)
+Jobs.OnProgress = ShowProgress
 FrameKeyPad1 = ttk.Frame(master = FrameKey)
 FrameKeyPad2 = ttk.Frame(master = FrameKey)
 FrameKeyPad2["borderwidth"] = 5
@@ -243,6 +410,10 @@ FramesSubst = []
 LabelSubst = []
 ComboSubst = []
 ComboText = []
+Incremental = None
+IncrementalOptions = None
+# If more runs of characters change, the whole text is replaced.
+MAX_RUNS = 10000
 for i in range(26):
     if i < 13:
         FramesSubst.append(ttk.Frame(master = FrameKeyPad1))
@@ -278,6 +449,9 @@ LabelCiphFeedback = ttk.Label(master = FrameCiph, text = "")
 LabelCiphFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
 TextCiph = tk.Text(master = FrameCiph, width = 10)
 TextCiph.pack(side = "bottom", fill = "both", expand = True, padx = 25, pady = 10)
+# The views page through texts too large for the text fields.
+ViewPlain = PagedTextView.TextView(TextPlain)
+ViewCiph = PagedTextView.TextView(TextCiph)
 
     
 ChangeMode()
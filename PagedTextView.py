@@ -0,0 +1,145 @@
+# tkinter provides GUI objects and commands
+import tkinter.font
+import tkinter.ttk as ttk
+# CipherEngine provides the memory-mapped text buffer
+import CipherEngine
+
+# Texts with more characters than this are shown page by page.
+LARGE_TEXT = 1 << 20
+
+# A TextView manages one of the text fields of the GUIs. Small
+# texts are simply inserted into the text field. Large texts are
+# kept in a memory-mapped buffer instead, and the text field is
+# made read-only and only shows the rows of the buffer which are
+# visible, split at the width of the text field. A scrollbar is
+# added to move through the buffer.
+class TextView:
+    def __init__(self, text, large = LARGE_TEXT):
+        self.text = text
+        self.large = large
+        self.buffer = None
+        self.first = 0
+        self.changed = False
+        self.font = tkinter.font.Font(font = text.cget("font"))
+        self.scrollbar = ttk.Scrollbar(master = text.master, orient = "vertical",
+                                       command = self.Scroll)
+        text.bind("<Configure>", lambda event: self.Render())
+        text.bind("<MouseWheel>", lambda event: self.Wheel(-event.delta))
+        text.bind("<Button-4>", lambda event: self.Wheel(-1))
+        text.bind("<Button-5>", lambda event: self.Wheel(1))
+
+    # This method tells whether the text is shown page by page.
+    def Paged(self):
+        return self.buffer is not None
+
+    # This method returns the number of characters of the text.
+    def Length(self):
+        if self.Paged():
+            return len(self.buffer)
+        return len(self.text.get("1.0", "end")) - 1
+
+    # This method returns the whole text.
+    def Get(self):
+        if self.Paged():
+            return self.buffer[0:len(self.buffer)]
+        return self.text.get("1.0", "end")[:-1]
+
+    # This method returns the text for the background jobs, which
+    # read it piece by piece: the whole text of a small text, but
+    # the buffer of a paged text, so it is not decoded at once.
+    def Source(self):
+        if self.Paged():
+            return self.buffer
+        return self.Get()
+
+    # This method replaces the whole text. The buffer of a paged
+    # text is not closed, as a background job may still read it
+    # (see Source); it is released with its last reference.
+    def Set(self, s):
+        self.buffer = None
+        self.text["state"] = "normal"
+        self.text.delete("1.0", "end")
+        if len(s) > self.large:
+            self.buffer = CipherEngine.MappedText(s)
+            self.first = 0
+            self.scrollbar.pack(side = "right", fill = "y", before = self.text)
+            self.Render()
+        else:
+            self.scrollbar.pack_forget()
+            self.text.insert("1.0", s)
+        self.changed = True
+
+    # This method replaces the characters start to end of a text
+    # without line breaks, which is not shown page by page.
+    def Replace(self, start, end, s):
+        self.text.replace("1.%d" % start, "1.%d" % end, s)
+
+    # This method tells whether the text has been set or edited
+    # by the user since the last reset. Paged texts cannot be
+    # edited.
+    def Modified(self):
+        if self.Paged():
+            return self.changed
+        return self.changed or self.text.edit_modified()
+
+    # This method marks the text as not modified.
+    def ResetModified(self):
+        self.changed = False
+        self.text.edit_modified(False)
+
+    # This method returns the number of characters per row and
+    # the number of visible rows.
+    def Geometry(self):
+        columns = max(1, self.text.winfo_width() // self.font.measure("0") - 1)
+        rows = max(1, self.text.winfo_height() // self.font.metrics("linespace"))
+        return columns, rows
+
+    # This method shows the visible rows of a paged text.
+    def Render(self):
+        if not self.Paged():
+            return
+        columns, rows = self.Geometry()
+        total = max(1, -(-len(self.buffer) // columns))
+        row = min(self.first // columns, max(0, total - rows))
+        self.first = row * columns
+        lines = [self.buffer[self.first + i * columns:self.first + (i + 1) * columns]
+                 for i in range(rows)]
+        self.text["state"] = "normal"
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+        self.text["state"] = "disabled"
+        self.scrollbar.set(row / total, min(1.0, (row + rows) / total))
+
+    # This method is invoked by the scrollbar.
+    def Scroll(self, action, amount, unit = None):
+        columns, rows = self.Geometry()
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.buffer))
+        elif unit == "pages":
+            self.first += int(amount) * rows * columns
+        else:
+            self.first += int(amount) * columns
+        self.first = max(0, min(self.first, len(self.buffer)))
+        self.Render()
+
+    # This method scrolls a paged text by three rows up or down
+    # when the mouse wheel is turned.
+    def Wheel(self, direction):
+        if not self.Paged():
+            return None
+        if direction < 0:
+            self.Scroll("scroll", -3, "units")
+        else:
+            self.Scroll("scroll", 3, "units")
+        return "break"
+
+    # This method writes the whole text to the open textfile
+    # File piece by piece and returns the number of characters
+    # written.
+    def Save(self, File):
+        if not self.Paged():
+            return File.write(self.Get())
+        written = 0
+        for piece in self.buffer.Chunks():
+            written += File.write(piece)
+        return written
@@ -0,0 +1,73 @@
+# This script looks for the places where a long ciphertext
+# changes its letter statistics, e.g. where messages encrypted
+# with different keys were concatenated. It slides a window
+# across the file in a single pass (see CipherEngine.SlidingWindow)
+# and prints the change points and, for each segment between
+# them, its length, index of coincidence and chi-squared
+# statistic against the reference profile. Positions count the
+# letters of the text normalized with only letters kept.
+#
+# Usage: python Segment_analysis.py FILE [--window 2000] [--step 100]
+#            [--threshold 100] [--sample FILE] [--csv FILE]
+import argparse
+import time
+
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+
+# This function returns the index of coincidence of letter counts.
+def Coincidence(counts):
+    total = int(counts.sum())
+    if total < 2:
+        return 0.0
+    return float((counts * (counts - 1)).sum()) / (total * (total - 1))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Find the segments of a ciphertext.")
+    parser.add_argument("path", metavar = "FILE")
+    parser.add_argument("--window", type = int, default = CipherEngine.WINDOW_SIZE,
+                        help = "letters per window")
+    parser.add_argument("--step", type = int, default = CipherEngine.WINDOW_STEP,
+                        help = "letters the window moves per step")
+    parser.add_argument("--threshold", type = float, default = CipherEngine.CHANGE_THRESHOLD,
+                        help = "change score of a change point")
+    parser.add_argument("--sample", help = "sample text for the reference profile")
+    parser.add_argument("--csv", help = "write the statistics of every window to this file")
+    parser.add_argument("--chunk-size", type = int, default = 1 << 20,
+                        help = "characters read at once")
+    args = parser.parse_args()
+
+    profile = None
+    if args.sample is not None:
+        profile = CipherEngine.ProfileForFile(args.sample).LetterProfile()
+    CsvFile = None
+    windows = None
+    if args.csv is not None:
+        CsvFile = open(args.csv, mode = "wt", encoding = "utf-8")
+        CsvFile.write("end,ic,chi_squared,change_score\n")
+        def windows(ends, ic, chi, score):
+            for row in zip(ends.tolist(), ic.tolist(), chi.tolist(), score.tolist()):
+                CsvFile.write("%d,%.6f,%.2f,%.2f\n" % row)
+    start = time.perf_counter()
+    try:
+        window = CipherEngine.WindowFile(args.path, args.window, args.step, profile,
+                                         args.threshold, args.chunk_size, windows)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    finally:
+        if CsvFile is not None:
+            CsvFile.close()
+    elapsed = time.perf_counter() - start
+
+    segments = window.Segments()
+    print("%d letters, %d change points in %.2f s"
+          % (segments[-1][1], len(window.changes), elapsed))
+    for position, score in window.changes:
+        print("change at %d (score %.1f)" % (position, score))
+    for first, end, counts in segments:
+        print("segment %d-%d: %d letters, IC %.4f" % (first, end, end - first,
+                                                     Coincidence(counts)), end = "")
+        if counts.sum() > 0:
+            print(", chi-squared %.1f" % CipherEngine.ChiSquared(
+                counts, window.profile, [list(range(26))])[0], end = "")
+        print()
@@ -1,6 +1,10 @@
 # tkinter provides GUI objects and commands
 import tkinter as tk
 import tkinter.ttk as ttk
+# CipherEngine provides the headless cipher logic
+import CipherEngine
+# PagedTextView shows large texts page by page
+import PagedTextView
 
 # An object (root) is created which represents the window.
 # Its title and full screen property are set.
@@ -8,29 +12,25 @@ root = tk.Tk()
 root.title("Vigenère Encryption")
 root.wm_state("zoomed")
 
+# The transforms run in the background, so the window does not
+# freeze on large texts.
+Jobs = CipherEngine.BackgroundJobs(root)
+# If the environment variable CIPHER_TIMINGS is set, the time
+# spent in every stage of an operation is shown in the feedback
+# labels and logged as JSON lines.
+Timer = CipherEngine.TimerFromEnvironment()
+
+# The number of ciphertext lines which the live encryption
+# updates at once in the background, after the visible lines
+LIVE_BLOCK = 200
+
 # This function normalizes the parameter text according to the
 # settings "Keep blanks" and "Keep non-alphabetic chars".
 def NormalizeText(text, strict = False):
-    s = ""
-    for c in text:
-        if ((ord(c) <= ord("Z")) and (ord(c) >= ord("A"))):
-            s += c
-        elif ((ord(c) <= ord("z")) and (ord(c) >= ord("a"))):
-            s += chr(ord(c) + ord("A") - ord("a"))
-        elif ((c == "ä") or (c == "Ä")):
-            s += "AE"
-        elif ((c == "ö") or (c == "Ö")):
-            s += "OE"
-        elif ((c == "ü") or (c == "Ü")):
-            s += "UE"
-        elif (c == "ß"):
-            s += "SS"
-        elif ((c == " ") or (ord(c) == 10)):
-            if ((KeepBlanks.get() == "1") and not strict):
-                s += " "
-        elif ((KeepNonalpha.get() == "1") and not strict):
-            s += c
-    return s
+    return CipherEngine.NormalizeText(text,
+                                      keep_blanks = (KeepBlanks.get() == "1"),
+                                      keep_nonalpha = (KeepNonalpha.get() == "1"),
+                                      strict = strict)
 
 # The labels used to interact with the user are cleared.
 def ClearFeedbackLabels():
@@ -38,6 +38,11 @@ def ClearFeedbackLabels():
     LabelKeyFeedback["text"] = ""
     LabelCiphFeedback["text"] = ""
 
+# This function tells the user in label that a background job
+# failed with error.
+def ShowJobError(label, error):
+    label["text"] = "An error occurred: %s" % error
+
 # This function is invoked when the user clicks the button
 # "Load plaintext from file".
 # It tries to open a textfile with the name specified in the
@@ -46,19 +51,24 @@ def ClearFeedbackLabels():
 # prints its contents in the text field below.
 def ButtonPlainLoadClick():
     ClearFeedbackLabels()
+    trace = Timer.Begin("load plaintext")
     try:
-        with open(PathPlain.get(), mode = "rt", encoding = "utf-8") as PlainFile:
-            plain = PlainFile.read()
+        with trace.Stage("load") as stage:
+            with open(PathPlain.get(), mode = "rt", encoding = "utf-8") as PlainFile:
+                plain = PlainFile.read()
+            stage.CountFile(PathPlain.get())
     except:
         LabelPlainFeedback["text"] = "An error occurred while reading the file."
     else:
         if plain == "":
             LabelPlainFeedback["text"] = "File empty"
         else:
-            plain = NormalizeText(plain)
-            TextPlain.delete("1.0", "end")
-            TextPlain.insert("1.0", plain)
-            LabelPlainFeedback["text"] = "File loaded successfully."
+            with trace.Stage("normalize") as stage:
+                plain = NormalizeText(plain)
+                stage.Count(plain)
+            with trace.Stage("display"):
+                ViewPlain.Set(plain)
+            LabelPlainFeedback["text"] = trace.Finish("File loaded successfully.")
 
 # This function is invoked when the user clicks the button
 # "Save ciphertext to file".
@@ -69,48 +79,303 @@ def ButtonPlainLoadClick():
 # textfile succeeded.
 def ButtonCiphSaveClick():
     ClearFeedbackLabels()
-    ciph = TextCiph.get("1.0", "end")[:-1]
-    if len(ciph) < 1:
+    length = ViewCiph.Length()
+    if length < 1:
         LabelCiphFeedback["text"] = "Nothing to save"
         return
+    trace = Timer.Begin("save ciphertext")
     try:
-        with open(PathCiph.get(), mode = "wt", encoding = "utf-8") as CiphFile:
-            if (CiphFile.write(ciph) != len(ciph)):
-                raise Exception
+        with trace.Stage("save") as stage:
+            with open(PathCiph.get(), mode = "wt", encoding = "utf-8") as CiphFile:
+                if (ViewCiph.Save(CiphFile) != length):
+                    raise Exception
+            stage.CountFile(PathCiph.get())
     except:
         LabelCiphFeedback["text"] = "An error occurred while saving to file."
     else:
-        LabelCiphFeedback["text"] = "Ciphertext saved successfully."
+        LabelCiphFeedback["text"] = trace.Finish("Ciphertext saved successfully.")
+
+# This function runs in the background. It normalizes source
+# piece by piece and en- or decrypts it with the CompiledKey
+# compiled. It returns the normalized text and the result. The
+# time of each stage is measured in trace.
+def VigenereWork(job, source, compiled, trace):
+    stream = CipherEngine.VigenereStream(compiled.vigenere, compiled.sign)
+    normalized = []
+    result = []
+    for piece in CipherEngine.Chunks(job, source):
+        with trace.Stage("normalize") as stage:
+            piece = compiled.normalizer.Apply(piece)
+            stage.Count(piece)
+        normalized.append(piece)
+        with trace.Stage("transform"):
+            result.append(stream.Feed(piece))
+    return "".join(normalized), "".join(result)
+
+# This function returns the compiled key for the key entry and
+# the current options, to en- (sign 1) or decrypt (sign -1).
+# Recently used keys are taken from the key cache of
+# CipherEngine. The normalized key is shown in the entry. If the
+# key is not valid, None is returned.
+def GetVigenereKey(sign):
+    try:
+        compiled = CipherEngine.GetCompiledKey("vigenere", Key.get(), sign < 0,
+                                               keep_blanks = (KeepBlanks.get() == "1"),
+                                               keep_nonalpha = (KeepNonalpha.get() == "1"))
+    except ValueError:
+        SetKey(NormalizeText(Key.get(), strict = True))
+        return None
+    SetKey(compiled.Key())
+    return compiled
+
+# This function shows key in the key entry. The entry is only
+# written if the key changed, as every write restarts the live
+# encryption.
+def SetKey(key):
+    if Key.get() != key:
+        Key.set(key)
+
+# This function normalizes the text of the view source and the
+# key, checks if the key is valid and executes the en- or
+# decryption (sign 1 or -1) into the view target in the
+# background.
+def StartVigenere(source, target, sign):
+    ClearFeedbackLabels()
+    text = source.Source()
+    compiled = GetVigenereKey(sign)
+    if compiled is None:
+        source.Set(NormalizeText(source.Get()))
+        LabelKeyFeedback["text"] = "No valid key entered"
+        return
+    trace = Timer.Begin("encode" if sign > 0 else "decode")
+    label = LabelCiphFeedback if sign > 0 else LabelPlainFeedback
+    def Done(result):
+        with trace.Stage("display"):
+            source.Set(result[0])
+            target.Set(result[1])
+        if trace:
+            label["text"] = trace.Finish()
+        # The live encryption keeps the line breaks, so it is
+        # started again on the new texts.
+        if Live is not None:
+            StartLive()
+    Jobs.Run("transform",
+             lambda job: VigenereWork(job, text, compiled, trace),
+             Done, lambda error: ShowJobError(label, error))
 
 # This function is invoked when the user clicks the button
 # "Encode".
-# It normalizes the plain text and the key, checks if the
-# key is valid and executes the encryption.
+# It executes the encryption of the plaintext.
 def ButtonEncodeClick():
-    ClearFeedbackLabels()   
-    ciph = ""
-    plain = TextPlain.get("1.0", "end")[:-1]
-    plain = NormalizeText(plain)
-    TextPlain.delete("1.0", "end")
-    TextPlain.insert("1.0", plain)
-    key = NormalizeText(Key.get(), strict = True)
-    Key.set(key) 
-    keylength = len(key)
-    if keylength == 0:
+    StartVigenere(ViewPlain, ViewCiph, 1)
+
+# This function is invoked when the user clicks the button
+# "Decode".
+# It executes the decryption of the ciphertext.
+def ButtonDecodeClick():
+    StartVigenere(ViewCiph, ViewPlain, -1)
+
+# This function is invoked when the user clicks the button
+# "Cancel". It stops the running en- or decryption.
+def ButtonCancelClick():
+    Jobs.Cancel()
+    LabelKeyFeedback["text"] = "Cancelled"
+
+# This function shows the progress of the running jobs
+# (between 0 and 1, or None if no job is running).
+def ShowProgress(fraction):
+    if fraction is None:
+        Progress.set(0)
+    else:
+        Progress.set(fraction)
+
+# This function is invoked when the user clicks the button
+# "Find key".
+# It estimates the key length from the first SOLVER_SAMPLE
+# letters of the ciphertext, recovers the key from their letter
+# frequencies and decrypts the ciphertext with it.
+def ButtonFindKeyClick():
+    ClearFeedbackLabels()
+    ciph = CipherEngine.NormalizedSample(ViewCiph.Source(), CipherEngine.SOLVER_SAMPLE)
+    try:
+        key = CipherEngine.SolveVigenere(ciph, use_kasiski = True)
+    except ValueError:
+        LabelKeyFeedback["text"] = "No ciphertext to analyse"
+        return
+    Key.set(key)
+    ButtonDecodeClick()
+    LabelKeyFeedback["text"] = "Key found"
+
+# This function starts (or restarts) the live encryption of the
+# plaintext: the whole plaintext is encrypted line by line into
+# the ciphertext field, which is afterwards kept in sync with
+# every edit of the plaintext (see LiveUpdate). Texts shown page
+# by page cannot be edited and are not encrypted live.
+def StartLive():
+    global Live
+    StopLive()
+    if LiveEncode.get() != "1":
+        return
+    compiled = GetVigenereKey(1)
+    if compiled is None:
         LabelKeyFeedback["text"] = "No valid key entered"
         return
-    i = 0
-    for p in plain:
-        if ((ord(p) < ord("A")) or (ord(p) > ord("Z"))):
-            ciph += p
-        else:
-            a = ord(p) + ord(key[i % keylength]) - ord("A")
-            i += 1
-            if a > ord("Z"):
-                a -= 26
-            ciph += chr(a)
-    TextCiph.delete("1.0", "end")
-    TextCiph.insert("1.0", ciph)
+    trace = Timer.Begin("live encode")
+    live = None
+    if not ViewPlain.Paged():
+        with trace.Stage("transform") as stage:
+            live = CipherEngine.IncrementalVigenere(compiled.vigenere, compiled.sign,
+                                                    compiled.normalizer, ViewPlain.Get())
+            result = live.Result()
+            stage.Count(result)
+    if (live is None) or (len(result) > ViewCiph.large):
+        LabelPlainFeedback["text"] = "Text too large for live encoding"
+        return
+    with trace.Stage("display"):
+        ViewCiph.Set(result)
+    TextPlain.edit_modified(False)
+    Live = live
+    if trace:
+        LabelCiphFeedback["text"] = trace.Finish()
+
+# This function stops the live encryption and its scheduled
+# updates.
+def StopLive():
+    global Live, LiveStale, LiveUpdateId, LiveDeferredId
+    for after_id in (LiveUpdateId, LiveDeferredId):
+        if after_id is not None:
+            root.after_cancel(after_id)
+    Live = None
+    LiveStale = None
+    LiveUpdateId = None
+    LiveDeferredId = None
+
+# This function is invoked when the user checks or unchecks
+# "Live encode".
+def CheckLiveClick():
+    ClearFeedbackLabels()
+    if LiveEncode.get() == "1":
+        StartLive()
+    else:
+        StopLive()
+
+# This function is invoked when the key or an option changes.
+# The live encryption is started again once the change is
+# complete.
+def LiveOptionsChanged(*args):
+    global LiveRestartId
+    if (LiveEncode.get() == "1") and (LiveRestartId is None):
+        LiveRestartId = root.after_idle(LiveRestart)
+
+# This function restarts the live encryption after a change of
+# the key or the options.
+def LiveRestart():
+    global LiveRestartId
+    LiveRestartId = None
+    StartLive()
+
+# This function is invoked when the plaintext field is modified.
+# The ciphertext is updated once all pending events have been
+# processed, so fast typing is handled in one update.
+def PlainModified(event):
+    global LiveUpdateId
+    if (Live is not None) and (LiveUpdateId is None) and TextPlain.edit_modified():
+        LiveUpdateId = root.after_idle(LiveUpdate)
+
+# This function replaces the lines first to first + removed - 1
+# of the ciphertext field by lines.
+def ReplaceCiphLines(first, removed, lines):
+    TextCiph.delete("%d.0" % (first + 1), "%d.end" % (first + removed))
+    TextCiph.insert("%d.0" % (first + 1), "\n".join(lines))
+
+# This function returns the first line of the ciphertext field
+# which is visible and the line after the last one.
+def VisibleCiphLines():
+    top = int(TextCiph.index("@0,0").split(".")[0]) - 1
+    bottom = int(TextCiph.index("@0,%d" % TextCiph.winfo_height()).split(".")[0])
+    return top, bottom
+
+# This function brings the ciphertext in line with the edited
+# plaintext. Only the changed lines are encrypted again, and if
+# the number of letters changed, the key phase of all following
+# lines moves: these lines are marked as stale from LiveStale
+# on. The stale lines which are visible are updated at once, the
+# others by LiveDeferred in blocks of LIVE_BLOCK lines between
+# the events of the window.
+def LiveUpdate():
+    global LiveUpdateId, LiveStale, LiveDeferredId
+    LiveUpdateId = None
+    if Live is None:
+        return
+    TextPlain.edit_modified(False)
+    if ViewPlain.Paged():
+        StopLive()
+        LiveEncode.set("0")
+        LabelPlainFeedback["text"] = "Text too large for live encoding"
+        return
+    trace = Timer.Begin("live update")
+    with trace.Stage("diff"):
+        change = Live.Update(ViewPlain.Get())
+    if change is None:
+        return
+    first, removed, added, stale = change
+    with trace.Stage("transform"):
+        ReplaceCiphLines(first, removed, Live.Lines(first, first + added))
+        if (LiveStale is not None) and (LiveStale > first):
+            LiveStale = max(first + added, LiveStale + added - removed)
+        if stale and ((LiveStale is None) or (LiveStale > first + added)):
+            LiveStale = first + added
+        TextCiph.see("%d.0" % (first + 1))
+        if LiveStale is not None:
+            top, bottom = VisibleCiphLines()
+            start = max(LiveStale, top)
+            end = min(bottom, Live.LineCount())
+            if start < end:
+                ReplaceCiphLines(start, end - start, Live.Lines(start, end))
+            if LiveDeferredId is None:
+                LiveDeferredId = root.after(1, LiveDeferred)
+    if trace:
+        LabelCiphFeedback["text"] = trace.Finish()
+
+# This function updates the next LIVE_BLOCK stale lines of the
+# ciphertext and schedules itself again until none are left.
+def LiveDeferred():
+    global LiveStale, LiveDeferredId
+    LiveDeferredId = None
+    if (Live is None) or (LiveStale is None):
+        return
+    end = min(LiveStale + LIVE_BLOCK, Live.LineCount())
+    ReplaceCiphLines(LiveStale, end - LiveStale, Live.Lines(LiveStale, end))
+    if end < Live.LineCount():
+        LiveStale = end
+        LiveDeferredId = root.after(1, LiveDeferred)
+    else:
+        LiveStale = None
+
+# This function is invoked when the user clicks the button
+# "Encode file to file".
+# It normalizes and encrypts the file specified in the plaintext
+# entry field piece by piece and writes the ciphertext to the
+# file specified in the ciphertext entry field, so that files
+# of any size can be encrypted without loading them into the
+# text fields.
+def ButtonFileEncodeClick():
+    ClearFeedbackLabels()
+    compiled = GetVigenereKey(1)
+    if compiled is None:
+        LabelKeyFeedback["text"] = "No valid key entered"
+        return
+    trace = Timer.Begin("encode file")
+    try:
+        with trace.Stage("transform") as stage:
+            CipherEngine.VigenereFile(PathPlain.get(), PathCiph.get(), compiled.vigenere,
+                                      keep_blanks = (KeepBlanks.get() == "1"),
+                                      keep_nonalpha = (KeepNonalpha.get() == "1"))
+            stage.CountFile(PathPlain.get())
+    except:
+        LabelCiphFeedback["text"] = "An error occurred while encoding the file."
+    else:
+        LabelCiphFeedback["text"] = trace.Finish("File encoded successfully.")
 
 # The window is divided into three frames.
 FramePlain = ttk.Frame(master = root)
@@ -160,10 +425,35 @@ CheckKeyKeepSpecials = ttk.Checkbutton(master = FrameKey, text = "Keep non-alpha
                                        variable = KeepNonalpha)
 CheckKeyKeepBlanks.pack(side = "top", padx = 25, pady = 5, fill = "x")
 CheckKeyKeepSpecials.pack(side = "top", padx = 25, pady = 5, fill = "x")
+LiveEncode = tk.StringVar(value = 0)
+CheckLive = ttk.Checkbutton(master = FrameKey, text = "Live encode",
+                            variable = LiveEncode,
+                            command = CheckLiveClick)
+CheckLive.pack(side = "top", padx = 25, pady = 5, fill = "x")
 ButtonEncode = ttk.Button(master = FrameKey,
                             text = "Encode",
                             command = ButtonEncodeClick)
 ButtonEncode.pack(side = "top", padx = 25, pady = 25, fill = "x")
+ButtonDecode = ttk.Button(master = FrameKey,
+                          text = "Decode",
+                          command = ButtonDecodeClick)
+ButtonDecode.pack(side = "top", padx = 25, pady = 5, fill = "x")
+ButtonFindKey = ttk.Button(master = FrameKey,
+                           text = "Find key",
+                           command = ButtonFindKeyClick)
+ButtonFindKey.pack(side = "top", padx = 25, pady = 5, fill = "x")
+ButtonFileEncode = ttk.Button(master = FrameKey,
+                              text = "Encode file to file",
+                              command = ButtonFileEncodeClick)
+ButtonFileEncode.pack(side = "top", padx = 25, pady = 5, fill = "x")
+Progress = tk.DoubleVar(value = 0)
+ProgressBar = ttk.Progressbar(master = FrameKey, variable = Progress, maximum = 1)
+ProgressBar.pack(side = "top", padx = 25, pady = 5, fill = "x")
+ButtonCancel = ttk.Button(master = FrameKey,
+                          text = "Cancel",
+                          command = ButtonCancelClick)
+ButtonCancel.pack(side = "top", padx = 25, pady = 5, fill = "x")
+Jobs.OnProgress = ShowProgress
 
 LabelCiphCaption = ttk.Label(master = FrameCiph, text = "Ciphertext")
 LabelCiphCaption.pack(side = "top", pady = 5)
@@ -181,6 +471,19 @@ LabelCiphFeedback = ttk.Label(master = FrameCiph, text = "")
 LabelCiphFeedback.pack(side = "top", padx = 25, pady = 5, fill = "x")
 TextCiph = tk.Text(master = FrameCiph, width = 10)
 TextCiph.pack(side = "bottom", fill = "both", expand = True, padx = 25, pady = 10)
+# The views page through texts too large for the text fields.
+ViewPlain = PagedTextView.TextView(TextPlain)
+ViewCiph = PagedTextView.TextView(TextCiph)
+# While "Live encode" is checked, the ciphertext follows every
+# edit of the plaintext, the key and the options.
+Live = None
+LiveStale = None
+LiveUpdateId = None
+LiveDeferredId = None
+LiveRestartId = None
+TextPlain.bind("<<Modified>>", PlainModified)
+for variable in (Key, KeepBlanks, KeepNonalpha):
+    variable.trace_add("write", LiveOptionsChanged)
 
 
 root.mainloop()
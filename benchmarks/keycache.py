@@ -0,0 +1,72 @@
+# This script measures the latency of many small messages which
+# are en- or decrypted with a small set of hot keys, once
+# compiling the key for every message and once taking it from
+# a KeyCache, and prints the statistics of the cache.
+#
+# Usage: python benchmarks/keycache.py [--messages 20000] [--size 200]
+#            [--keys 8] [--maxsize 64]
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import CipherEngine
+# run provides the synthetic texts of the benchmark suite
+from run import SyntheticText
+
+# This function en- or decrypts message as before the cache:
+# the key is normalized and compiled for every message.
+def Uncached(mode, key, decrypt, message):
+    key, sign = CipherEngine.CompileKey(mode, key, decrypt)
+    text = CipherEngine.NormalizeText(message)
+    if mode == "vigenere":
+        return CipherEngine.VigenereStream(key, sign).Feed(text)
+    return CipherEngine.SubstitutionKey(key).Apply(text)
+
+# This function does the same with a key from cache.
+def Cached(cache, mode, key, decrypt, message):
+    return cache.Get(mode, key, decrypt).Apply(message)
+
+# This function returns the mean time per message of run.
+def MeanTime(run, requests):
+    start = time.perf_counter()
+    for request in requests:
+        run(*request)
+    return (time.perf_counter() - start) / len(requests)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the key cache.")
+    parser.add_argument("--messages", type = int, default = 20000)
+    parser.add_argument("--size", type = int, default = 200, help = "bytes per message")
+    parser.add_argument("--keys", type = int, default = 8, help = "number of hot keys")
+    parser.add_argument("--maxsize", type = int, default = 64, help = "size of the cache")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    text = SyntheticText("umlaut", 1 << 20)
+    keys = []
+    for i in range(args.keys):
+        alphabet = list("abcdefghijklmnopqrstuvwxyz")
+        rng.shuffle(alphabet)
+        keys.append(rng.choice([("vigenere", "".join(alphabet[:rng.randint(3, 12)])),
+                                ("substitution", "".join(alphabet)),
+                                ("caesar", alphabet[0])]))
+    requests = []
+    for i in range(args.messages):
+        mode, key = rng.choice(keys)
+        start = rng.randrange(len(text) - args.size)
+        requests.append((mode, key, rng.random() < 0.5, text[start:start + args.size]))
+
+    cache = CipherEngine.KeyCache(args.maxsize)
+    for request in requests:
+        assert Cached(cache, *request) == Uncached(*request)
+    cache.Clear()
+    uncached = MeanTime(Uncached, requests)
+    cached = MeanTime(lambda *request: Cached(cache, *request), requests)
+    print("uncached: %.1f us per message" % (uncached * 1e6))
+    print("cached:   %.1f us per message (%.2fx faster)" % (cached * 1e6, uncached / cached))
+    print("cache:    %s" % cache.Stats())
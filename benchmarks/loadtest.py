@@ -0,0 +1,136 @@
+# This script puts load on a local Cipher_server.py. It keeps
+# several connections open, sends POST requests with synthetic
+# texts over each of them one after another and reports the
+# requests per second, the throughput and the latency
+# percentiles. With --spawn it starts the server itself.
+#
+# Usage: python benchmarks/loadtest.py [--host 127.0.0.1] [--port 8765]
+#            [--path /vigenere?key=Geheim] [--connections 16]
+#            [--requests 2000] [--size 4K] [--spawn]
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+# run provides the synthetic texts of the benchmark suite
+from run import ParseSize, SyntheticText
+
+# This function reads a response and returns its status and the
+# length of its body.
+async def ReadResponse(reader):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if line == "":
+            break
+        name, sep, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = 0
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            length += size
+    else:
+        length = int(headers.get("content-length", "0"))
+        await reader.readexactly(length)
+    return status, length, headers.get("connection", "").lower() != "close"
+
+# This function sends requests over one connection as long as
+# remaining (a one-element list shared by all connections) is
+# positive and appends the latencies to latencies.
+async def Client(host, port, path, body, remaining, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = ("POST %s HTTP/1.1\r\nHost: %s\r\nContent-Length: %d\r\n\r\n"
+               % (path, host, len(body))).encode("latin-1") + body
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, length, keep_alive = await ReadResponse(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+# This function runs the load test and returns the latencies,
+# the errors and the elapsed time.
+async def LoadTest(host, port, path, body, connections, requests):
+    remaining = [requests]
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(Client(host, port, path, body, remaining, latencies, errors)
+                           for i in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+# This function waits until the server accepts connections.
+async def WaitForServer(host, port, timeout = 10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+
+# This function returns the percentile (0-100) of the sorted
+# values.
+def Percentile(values, percent):
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Load test for Cipher_server.py.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--path", default = "/vigenere?key=Geheim")
+    parser.add_argument("--connections", type = int, default = 16)
+    parser.add_argument("--requests", type = int, default = 2000)
+    parser.add_argument("--size", default = "4K", help = "size of each request body")
+    parser.add_argument("--mix", default = "umlaut", help = "text mix of the bodies")
+    parser.add_argument("--spawn", action = "store_true", help = "start the server")
+    args = parser.parse_args()
+
+    body = SyntheticText(args.mix, ParseSize(args.size)).encode("utf-8")
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "Cipher_server.py"),
+                                   "--host", args.host, "--port", str(args.port)],
+                                  stdout = subprocess.DEVNULL)
+    try:
+        asyncio.run(WaitForServer(args.host, args.port))
+        latencies, errors, elapsed = asyncio.run(
+            LoadTest(args.host, args.port, args.path, body, args.connections, args.requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print("%d requests, %d errors in %.2f s" % (len(latencies), len(errors), elapsed))
+    print("requests/s: %.1f" % (len(latencies) / elapsed))
+    print("throughput: %.1f MB/s" % (len(latencies) * len(body) / elapsed / 1e6))
+    print("latency p50: %.2f ms, p99: %.2f ms, max: %.2f ms"
+          % (Percentile(latencies, 50) * 1000, Percentile(latencies, 99) * 1000,
+             latencies[-1] * 1000))
+    print("mean latency: %.2f ms" % (statistics.mean(latencies) * 1000))
+    sys.exit(1 if errors else 0)
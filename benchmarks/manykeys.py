@@ -0,0 +1,56 @@
+# This script compares en- or decrypting one text with many
+# keys one by one against doing it at once with VigenereMany and
+# SubstituteMany, and checks that both give the same ciphertexts.
+#
+# Usage: python benchmarks/manykeys.py [--keys 1000] [--size 4K]
+#            [--budget 64M]
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import CipherEngine
+# run provides the synthetic texts of the benchmark suite
+from run import ParseSize, SyntheticText
+
+# This function returns the result of run and its duration.
+def Timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the many-keys API.")
+    parser.add_argument("--keys", type = int, default = 1000)
+    parser.add_argument("--size", default = "4K", help = "size of the plaintext")
+    parser.add_argument("--budget", default = "64M", help = "memory budget of the chunks")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    text = CipherEngine.NormalizeText(SyntheticText("umlaut", ParseSize(args.size)))
+    words = ["".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+                     for i in range(rng.randint(3, 12))) for j in range(args.keys)]
+    alphabets = []
+    for i in range(args.keys):
+        alphabet = list("abcdefghijklmnopqrstuvwxyz")
+        rng.shuffle(alphabet)
+        alphabets.append("".join(alphabet))
+
+    for name, single, many in (
+            ("vigenere", lambda: [CipherEngine.VigenereKey(word).Shift(text, 1) for word in words],
+             lambda: CipherEngine.ManyToTexts(CipherEngine.VigenereMany(text, words))),
+            ("substitution", lambda: [CipherEngine.Substitute(text, alphabet)
+                                      for alphabet in alphabets],
+             lambda: CipherEngine.ManyToTexts(CipherEngine.SubstituteMany(text, alphabets)))):
+        expected, one_by_one = Timed(single)
+        result, at_once = Timed(many)
+        assert result == expected
+        blocks, chunked = Timed(lambda: sum(1 for block in CipherEngine.ManyKeysChunks(
+            text, words if name == "vigenere" else alphabets, name,
+            budget = ParseSize(args.budget))))
+        print("%-12s one by one: %.3f s, at once: %.3f s (%.1fx), chunked: %.3f s in %d blocks"
+              % (name, one_by_one, at_once, one_by_one / at_once, chunked, blocks))
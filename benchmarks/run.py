@@ -0,0 +1,406 @@
+# This script times the hot paths of the project headless on
+# synthetic German texts of different sizes, once with ASCII
+# letters only and once with many umlauts and "ß". For each
+# benchmark, text mix and size it records the best time, the
+# throughput and the peak memory (traced by tracemalloc in a
+# separate run), for the solver also the swaps tried per second,
+# and writes them to a JSON file. If a stored
+# baseline exists, every result is compared with it and the
+# script fails if a benchmark got slower by more than the
+# threshold or has no entry in the baseline. --save-baseline
+# stores the results in the baseline, replacing the entries of
+# the benchmarks which were run and keeping the others.
+#
+# Usage: python benchmarks/run.py [--sizes 1K,1M,1G] [--mixes ascii,umlaut]
+#            [--only normalize,...] [--output FILE] [--baseline FILE]
+#            [--threshold 0.25] [--min-seconds 0.001] [--save-baseline]
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import CipherEngine
+import main
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+OUTPUT = os.path.join(ROOT, "benchmarks", "results.json")
+SIZES = "1K,1M,16M"
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+# Each benchmark is repeated until it ran this long (at most
+# REPEATS times) and the best time is kept.
+MIN_TIME = 0.5
+REPEATS = 20
+# Baseline times below this many seconds are too noisy to detect
+# regressions.
+MIN_COMPARED = 0.001
+
+# The words the synthetic texts are made of
+ASCII_WORDS = ("der die und in den von zu das mit sich des auf fuer ist im "
+               "dem nicht ein eine als auch es an werden aus er hat dass sie "
+               "nach wird bei einer um am sind noch wie einem ueber einen so "
+               "zum war haben nur oder aber vor zur bis mehr durch man sein "
+               "wurde sei Jahre Zeit Menschen Land Stadt Kinder Haus").split()
+UMLAUT_WORDS = ("für über größer Mädchen Ärger Öl Übung Straße weiß schön "
+                "müssen hätte Bär Füße gehört später Größe Türen Häuser "
+                "Brücke Schlüssel fröhlich Gemüse spät Fußball").split()
+MIXES = {"ascii": (ASCII_WORDS, 0.0), "umlaut": (ASCII_WORDS, 0.5)}
+BLOCK = 1 << 20
+
+KEY = "GEHEIMNIS"
+ALPHABET = "qwertzuiopasdfghjklyxcvbnm"
+# The alphabet after swapping two letters in the key, as when
+# the user changes one combobox: two rare letters (Y and Z) and
+# two common ones (E and N)
+EDITED = "qwertzuiopasdfghjklyxcvbmn"
+SWAPPED = "qwerfzuiopasdtghjklyxcvbnm"
+# The chunk size of VigenereFileParallel, small enough to give
+# every worker several chunks of the larger inputs
+PARALLEL_CHUNK = 1 << 20
+# The restarts of the solver benchmark, which all run to the end
+SOLVER_RESTARTS = 2
+# The number of runs up to which the GUIs rewrite the changed
+# characters instead of the whole text (MAX_RUNS)
+MAX_RUNS = 10000
+
+# This function converts a size like "16M" into bytes.
+def ParseSize(size):
+    if size[-1].upper() in UNITS:
+        return int(size[:-1]) * UNITS[size[-1].upper()]
+    return int(size)
+
+# This function returns a text of size bytes (UTF-8) made of
+# random words of the mix. A block of at most 1 MiB is generated
+# and repeated, which is enough to defeat caches and keeps the
+# generation of large inputs fast.
+def SyntheticText(mix, size):
+    words, umlauts = MIXES[mix]
+    rng = random.Random(size)
+    pieces = []
+    length = 0
+    while length < min(size, BLOCK):
+        if rng.random() < umlauts:
+            word = rng.choice(UMLAUT_WORDS)
+        else:
+            word = rng.choice(words)
+        word += rng.choice((" ", " ", " ", " ", " ", ", ", ". ", "\n"))
+        pieces.append(word)
+        length += len(word.encode("utf-8"))
+    block = "".join(pieces).encode("utf-8")
+    data = block * (size // len(block) + 1)
+    return data[:size].decode("utf-8", errors = "ignore")
+
+# The benchmarks. Each function prepares its input from text
+# and returns the function which is timed.
+
+# NormalizeText with the default options of the GUIs
+def BenchNormalize(text):
+    return lambda: CipherEngine.NormalizeText(text)
+
+# main.encrypt
+def BenchMainEncrypt(text):
+    return lambda: main.encrypt(text, KEY)
+
+# The background work of ButtonEncodeClick in
+# Vigenere_encrypt.py: normalize and encrypt piece by piece
+def BenchVigenereGui(text):
+    def Run():
+        stream = CipherEngine.VigenereStream(KEY, 1)
+        result = []
+        for piece in CipherEngine.Chunks(CipherEngine.Job(), text):
+            result.append(stream.Feed(CipherEngine.NormalizeText(piece)))
+        return "".join(result)
+    return Run
+
+# The background work of UpdatePlaintext in
+# Monoalphabetic_encrypt.py: normalize piece by piece and
+# substitute the whole text
+def BenchSubstitutionGui(text):
+    def Run():
+        normalized = "".join(CipherEngine.NormalizeText(piece)
+                             for piece in CipherEngine.Chunks(CipherEngine.Job(), text))
+        return CipherEngine.IncrementalSubstitution(normalized, ALPHABET).Result()
+    return Run
+
+# UpdatePlaintext after the user swapped two letters of the key
+# and back: the changed runs are rewritten, or the whole text is
+# substituted if there are more than MAX_RUNS of them (see
+# ApplyKey in Monoalphabetic_decrypt.py)
+def KeyEditRun(text, edited):
+    incremental = CipherEngine.IncrementalSubstitution(CipherEngine.NormalizeText(text),
+                                                       ALPHABET)
+    incremental.Result()
+    keys = [edited, ALPHABET]
+    def Run():
+        key = keys[0]
+        keys.reverse()
+        runs = incremental.Update(key, MAX_RUNS)
+        if runs is None:
+            return incremental.Result()
+        return runs
+    return Run
+
+def BenchKeyEdit(text):
+    return KeyEditRun(text, EDITED)
+
+def BenchKeySwap(text):
+    return KeyEditRun(text, SWAPPED)
+
+# LiveUpdate in Vigenere_encrypt.py while the user types a
+# letter in the middle of the text and deletes it again: the
+# changed line and one screen of stale lines are encrypted
+def BenchLiveEdit(text):
+    middle = len(text) // 2
+    texts = [text[:middle] + "x" + text[middle:], text]
+    live = CipherEngine.IncrementalVigenere(KEY, 1, CipherEngine.GetNormalizer(), text)
+    def Run():
+        first, removed, added, stale = live.Update(texts[0])
+        texts.reverse()
+        return live.Lines(first, first + added + 50)
+    return Run
+
+# The letter counting of ButtonFreqCheckClick in
+# Monoalphabetic_decrypt.py
+def BenchFrequencies(text):
+    def Run():
+        counter = CipherEngine.NgramCounter(1)
+        for piece in CipherEngine.Chunks(CipherEngine.Job(), text):
+            counter.UpdateText(CipherEngine.NormalizeText(piece, strict = True))
+        return counter.counts
+    return Run
+
+# Segment_analysis.py: slide a window across the text piece by
+# piece, with the rolling letter counts, index of coincidence,
+# chi-squared and change scores of every window
+def BenchSlidingWindow(text):
+    def Run():
+        window = CipherEngine.SlidingWindow()
+        for piece in CipherEngine.Chunks(CipherEngine.Job(), text):
+            window.UpdateText(CipherEngine.NormalizeText(piece, strict = True))
+        return window.Segments()
+    return Run
+
+# SolveSubstitutionParallel in worker processes, as started by
+# ButtonFreqSolveGeneralClick in Monoalphabetic_decrypt.py, on
+# the first SOLVER_SAMPLE letters of the substituted text with a
+# quadgram table of the text itself. The seed fixes the swaps
+# tried, which are stored as the attribute swaps of the timed
+# function, so RunAll also reports the swaps per second.
+def BenchSolver(text):
+    normalized = CipherEngine.NormalizeText(text)
+    ciph = CipherEngine.Substitute(normalized[:4 * CipherEngine.SOLVER_SAMPLE],
+                                   ALPHABET.upper())
+    table = CipherEngine.BuildQuadgramTable(CipherEngine.LetterArray(normalized[:1 << 20]))
+    def Run():
+        for alphabet, score, done, tried, elapsed in CipherEngine.SolveSubstitutionParallel(
+                ciph, table, restarts = SOLVER_RESTARTS, workers = SOLVER_RESTARTS,
+                agree = SOLVER_RESTARTS + 1, seed = 1):
+            Run.swaps = tried
+        return alphabet
+    return Run
+
+# This function writes text to a temporary file and returns the
+# directory, which is deleted once it is no longer referenced
+# (the benchmarks keep it as an attribute of the timed
+# function), and the paths of the input and output file.
+def TextFile(text):
+    directory = tempfile.TemporaryDirectory()
+    in_path = os.path.join(directory.name, "in.txt")
+    with open(in_path, mode = "w", encoding = "utf-8") as File:
+        File.write(text)
+    return directory, in_path, os.path.join(directory.name, "out.txt")
+
+# Vigenere_encrypt.py's file encryption: VigenereFile streams the
+# file in one process
+def BenchVigenereFile(text):
+    directory, in_path, out_path = TextFile(text)
+    def Run():
+        return CipherEngine.VigenereFile(in_path, out_path, KEY)
+    Run.directory = directory
+    return Run
+
+# VigenereFileParallel with a pool of workers processes
+def VigenereFileParallelRun(text, workers):
+    directory, in_path, out_path = TextFile(text)
+    def Run():
+        return CipherEngine.VigenereFileParallel(in_path, out_path, KEY,
+                                                 chunk_size = PARALLEL_CHUNK,
+                                                 workers = workers)
+    Run.directory = directory
+    return Run
+
+def BenchVigenereFileParallel1(text):
+    return VigenereFileParallelRun(text, 1)
+
+def BenchVigenereFileParallel2(text):
+    return VigenereFileParallelRun(text, 2)
+
+def BenchVigenereFileParallel4(text):
+    return VigenereFileParallelRun(text, 4)
+
+def BenchVigenereFileParallel8(text):
+    return VigenereFileParallelRun(text, 8)
+
+BENCHMARKS = {"normalize": BenchNormalize,
+              "main_encrypt": BenchMainEncrypt,
+              "vigenere_gui": BenchVigenereGui,
+              "substitution_gui": BenchSubstitutionGui,
+              "substitution_key_edit": BenchKeyEdit,
+              "substitution_key_swap": BenchKeySwap,
+              "vigenere_live_edit": BenchLiveEdit,
+              "frequencies": BenchFrequencies,
+              "sliding_window": BenchSlidingWindow,
+              "solver": BenchSolver,
+              "vigenere_file": BenchVigenereFile,
+              "vigenere_file_parallel_1": BenchVigenereFileParallel1,
+              "vigenere_file_parallel_2": BenchVigenereFileParallel2,
+              "vigenere_file_parallel_4": BenchVigenereFileParallel4,
+              "vigenere_file_parallel_8": BenchVigenereFileParallel8}
+
+# This function returns the best time of run in seconds.
+def Time(run):
+    best = None
+    spent = 0.0
+    for i in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        if spent >= MIN_TIME:
+            break
+    return best
+
+# This function returns the peak memory in bytes allocated while
+# run is executed once.
+def PeakMemory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# This function runs the benchmarks names on all mixes and sizes
+# and returns the list of results.
+def RunAll(names, mixes, sizes):
+    results = []
+    for size in sizes:
+        for mix in mixes:
+            text = SyntheticText(mix, ParseSize(size))
+            nbytes = len(text.encode("utf-8"))
+            for name in names:
+                run = BENCHMARKS[name](text)
+                seconds = Time(run)
+                result = {"benchmark": name, "mix": mix, "size": size,
+                          "bytes": nbytes, "seconds": seconds,
+                          "mb_per_s": nbytes / seconds / 1e6 if seconds > 0 else None,
+                          "peak_mb": PeakMemory(run) / 1e6}
+                line = ("%-22s %-6s %5s %10.6f s %10.1f MB/s %10.1f MB peak"
+                        % (name, mix, size, seconds, result["mb_per_s"] or 0.0,
+                           result["peak_mb"]))
+                if hasattr(run, "swaps"):
+                    result["swaps_per_s"] = run.swaps / seconds
+                    line += " %10.0f swaps/s" % result["swaps_per_s"]
+                print(line, flush = True)
+                results.append(result)
+            del text
+    return results
+
+# This function returns the benchmark, mix and size of a result.
+def ResultKey(result):
+    return (result["benchmark"], result["mix"], result["size"])
+
+# This function returns the results which have no entry in the
+# baseline, e.g. those of a benchmark added since the baseline
+# was saved.
+def Missing(results, baseline):
+    reference = set(ResultKey(r) for r in baseline["results"])
+    return [result for result in results if ResultKey(result) not in reference]
+
+# This function returns the baseline with the results added.
+# Entries of the baseline for the same benchmark, mix and size
+# are replaced.
+def MergeBaseline(baseline, report):
+    keys = set(ResultKey(r) for r in report["results"])
+    kept = [r for r in baseline["results"] if ResultKey(r) not in keys]
+    return dict(report, results = kept + report["results"])
+
+# This function compares the results with the baseline and
+# returns the list of regressions: results which took more than
+# (1 + threshold) times the time of the baseline. Results whose
+# baseline took less than min_seconds are skipped.
+def Regressions(results, baseline, threshold, min_seconds = MIN_COMPARED):
+    reference = {ResultKey(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = reference.get(ResultKey(result))
+        if base is None or base["seconds"] < min_seconds:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append(dict(result, baseline_seconds = base["seconds"],
+                                    ratio = ratio))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the hot paths headless.")
+    parser.add_argument("--sizes", default = SIZES,
+                        help = "comma-separated input sizes, e.g. 1K,1M,1G")
+    parser.add_argument("--mixes", default = ",".join(MIXES),
+                        help = "comma-separated text mixes (%s)" % ", ".join(MIXES))
+    parser.add_argument("--only", default = ",".join(BENCHMARKS),
+                        help = "comma-separated benchmarks (%s)" % ", ".join(BENCHMARKS))
+    parser.add_argument("--output", default = OUTPUT, help = "JSON file for the results")
+    parser.add_argument("--baseline", default = BASELINE, help = "JSON file of the baseline")
+    parser.add_argument("--threshold", type = float, default = 0.25,
+                        help = "allowed slowdown against the baseline (0.25 = 25 %%)")
+    parser.add_argument("--min-seconds", type = float, default = MIN_COMPARED,
+                        help = "skip results whose baseline is faster than this")
+    parser.add_argument("--save-baseline", action = "store_true",
+                        help = "store the results as the new baseline")
+    args = parser.parse_args()
+    names = args.only.split(",")
+    mixes = args.mixes.split(",")
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark %r" % name)
+    for mix in mixes:
+        if mix not in MIXES:
+            parser.error("unknown mix %r" % mix)
+
+    report = {"python": platform.python_version(), "machine": platform.machine(),
+              "processor": platform.processor(),
+              "results": RunAll(names, mixes, args.sizes.split(","))}
+    with open(args.output, "w", encoding = "utf-8") as File:
+        json.dump(report, File, indent = 1)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding = "utf-8") as File:
+            baseline = json.load(File)
+    if args.save_baseline:
+        if baseline is not None:
+            report = MergeBaseline(baseline, report)
+        with open(args.baseline, "w", encoding = "utf-8") as File:
+            json.dump(report, File, indent = 1)
+        sys.exit(0)
+    if baseline is None:
+        print("No baseline found at %s" % args.baseline)
+        sys.exit(0)
+    missing = Missing(report["results"], baseline)
+    regressions = Regressions(report["results"], baseline, args.threshold,
+                              args.min_seconds)
+    for r in missing:
+        print("MISSING %s %s %s: no baseline entry, run with --save-baseline"
+              % ResultKey(r))
+    for r in regressions:
+        print("REGRESSION %s %s %s: %.6f s, baseline %.6f s (%.2fx)"
+              % (r["benchmark"], r["mix"], r["size"], r["seconds"],
+                 r["baseline_seconds"], r["ratio"]))
+    sys.exit(1 if (regressions or missing) else 0)
@@ -0,0 +1,57 @@
+# This script measures how long Monoalphabetic_decrypt.py takes
+# from launch until its window is drawn for the first time. The
+# GUI is started several times with the option --startup-time,
+# once as it is and once with matplotlib.pyplot imported before
+# the GUI, as it was on startup before the chart was loaded
+# lazily (the baseline). For both, the medians of the time to
+# the first paint reported by the GUI and of the wall-clock time
+# until the process exited are printed. Both are measured from
+# the launch of the process, before the interpreter imports
+# anything, so the preloaded modules are included.
+#
+# Usage: python benchmarks/startup.py [runs]
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI = "Monoalphabetic_decrypt.py"
+# The environment variable in which the launch time is passed to
+# the GUI
+STARTUP_VARIABLE = "CIPHER_STARTUP"
+
+# This function starts the GUI once and returns the time from
+# the launch to the first paint which the GUI printed and the
+# wall-clock time until it closed itself. If preload is set, the
+# modules are imported before the GUI.
+def Launch(preload = ()):
+    code = "".join("import %s\n" % module for module in preload)
+    code += "import runpy\nrunpy.run_path(%r, run_name = '__main__')\n" % GUI
+    env = dict(os.environ)
+    start = time.perf_counter()
+    env[STARTUP_VARIABLE] = repr(time.time())
+    process = subprocess.run([sys.executable, "-c", code, "--startup-time"], cwd = ROOT,
+                             env = env, check = True, stdout = subprocess.PIPE, text = True)
+    wall = time.perf_counter() - start
+    for line in process.stdout.splitlines():
+        if line.startswith("Startup time:"):
+            return float(line.split()[2]), wall
+    raise RuntimeError("The GUI did not report its startup time")
+
+# This function returns the median times (see Launch) of runs
+# launches.
+def Median(runs, preload = ()):
+    times = [Launch(preload) for i in range(runs)]
+    return (statistics.median(paint for paint, wall in times),
+            statistics.median(wall for paint, wall in times))
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    lazy = Median(runs)
+    eager = Median(runs, ["matplotlib.pyplot"])
+    print("                  first paint   process")
+    print("lazy matplotlib:  %9.3f s %9.3f s" % lazy)
+    print("eager matplotlib: %9.3f s %9.3f s (baseline)" % eager)
+    print("speedup:          %9.2fx %9.2fx" % (eager[0] / lazy[0], eager[1] / lazy[1]))
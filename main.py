@@ -3,6 +3,9 @@
 # Press Umschalt+F10 to execute it or replace it with your code.
 # Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
 
+# CipherEngine provides the headless cipher logic
+from CipherEngine import VigenereEncrypt
+
 
 def print_hi(name):
     # Use a breakpoint in the code line below to debug your script.
@@ -19,6 +22,11 @@ alphabetlist = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M',
 def encrypt(plaintext, cipher):
     plaintext = plaintext.upper()
     cipher = cipher.upper()
+    if (cipher != "") and all(c in alphabetlist for c in cipher):
+        return VigenereEncrypt(plaintext, cipher, advance_on_all = True)
+    # Other keys are only used where they meet a letter, as they
+    # always were: an empty key passes texts without letters and
+    # other characters of the key raise an error once used.
     ciphertext = ""
     for i in range(len(plaintext)):
         if plaintext[i] in alphabetlist:
@@ -0,0 +1,80 @@
+# Tests of the file transforms (CipherEngine.VigenereFile,
+# VigenereFileParallel and SubstituteFile) against the in-memory
+# transforms of the whole text
+import pytest
+
+import CipherEngine
+
+KEY = "GEHEIMNIS"
+ALPHABET = "qwertzuiopasdfghjklyxcvbnm"
+OPTIONS = [(False, False), (True, False), (False, True), (True, True)]
+
+# Umlauts, sharp s, other multi-byte characters, punctuation and
+# all kinds of line ends, repeated with a period that does not
+# divide the chunk sizes, so that the chunks split them at
+# varying places
+TEXT = ("Größere Mädchen äßen Äpfel, Öl und Übung – für 5 € sind's "
+        "Füße.\r\nZweite Zeile\rdritte Zeile\nÜBER ÄRGER ÖFTER ß\t“fin”\n") * 23
+
+# This function writes TEXT (or text) to a file in tmp_path and
+# returns its path.
+def WriteText(tmp_path, text = TEXT):
+    path = tmp_path / "in.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+# This function returns the text of path as the GUIs read it:
+# in text mode, with all line ends translated to line feeds.
+def ReadText(path):
+    with open(path, mode = "rt", encoding = "utf-8") as File:
+        return File.read()
+
+# This function returns the in-memory Vigenere encryption of the
+# file path as UTF-8 bytes.
+def VigenereBytes(path, keep_blanks, keep_nonalpha):
+    text = CipherEngine.NormalizeText(ReadText(path), keep_blanks, keep_nonalpha)
+    return CipherEngine.VigenereEncrypt(text, KEY).encode("utf-8")
+
+@pytest.mark.parametrize("keep_blanks, keep_nonalpha", OPTIONS)
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1 << 20])
+def test_vigenere_file(tmp_path, keep_blanks, keep_nonalpha, chunk_size):
+    path = WriteText(tmp_path)
+    out = tmp_path / "out.txt"
+    CipherEngine.VigenereFile(path, out, KEY, keep_blanks, keep_nonalpha,
+                              chunk_size = chunk_size)
+    assert out.read_bytes() == VigenereBytes(path, keep_blanks, keep_nonalpha)
+
+@pytest.mark.parametrize("keep_blanks, keep_nonalpha", OPTIONS)
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1 << 20])
+def test_vigenere_file_parallel(tmp_path, keep_blanks, keep_nonalpha, chunk_size):
+    path = WriteText(tmp_path)
+    out = tmp_path / "out.txt"
+    written = CipherEngine.VigenereFileParallel(path, out, KEY, keep_blanks, keep_nonalpha,
+                                                chunk_size = chunk_size, workers = 2)
+    expected = VigenereBytes(path, keep_blanks, keep_nonalpha)
+    assert out.read_bytes() == expected
+    assert written == len(expected)
+
+# A chunk boundary falls between the two bytes of an umlaut, and
+# between a carriage return and its line feed.
+@pytest.mark.parametrize("keep_blanks, keep_nonalpha", OPTIONS)
+@pytest.mark.parametrize("split", ["ä", "ß", "\r\n"])
+def test_vigenere_file_parallel_split(tmp_path, keep_blanks, keep_nonalpha, split):
+    text = ("abcdefg" + split) * 50
+    path = WriteText(tmp_path, text)
+    out = tmp_path / "out.txt"
+    CipherEngine.VigenereFileParallel(path, out, KEY, keep_blanks, keep_nonalpha,
+                                      chunk_size = 8, workers = 2)
+    assert out.read_bytes() == VigenereBytes(path, keep_blanks, keep_nonalpha)
+
+@pytest.mark.parametrize("keep_blanks, keep_nonalpha", OPTIONS)
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1 << 20])
+@pytest.mark.parametrize("text", [TEXT, "Nur ASCII, ohne Umlaute.\nZweite Zeile\n" * 40])
+def test_substitute_file(tmp_path, keep_blanks, keep_nonalpha, chunk_size, text):
+    path = WriteText(tmp_path, text)
+    out = tmp_path / "out.txt"
+    key = CipherEngine.SubstitutionKey(ALPHABET)
+    CipherEngine.SubstituteFile(path, out, key, keep_blanks, keep_nonalpha,
+                                chunk_size = chunk_size)
+    normalized = CipherEngine.NormalizeText(ReadText(path), keep_blanks, keep_nonalpha)
+    assert out.read_bytes() == key.Apply(normalized).encode("utf-8")
@@ -0,0 +1,57 @@
+# Tests of the sliding-window statistics (CipherEngine.SlidingWindow)
+import numpy as np
+import pytest
+
+import CipherEngine
+
+# The letters of the first segment follow the German letter
+# frequencies, those of the second segment a Caesar shift of them,
+# as if two messages under different keys were concatenated.
+BOUNDARY = 20000
+LENGTH = 50000
+
+# This function returns the test text as a string of capital letters.
+def SegmentedText():
+    rng = np.random.default_rng(1)
+    profile = CipherEngine.GERMAN_FREQUENCIES / CipherEngine.GERMAN_FREQUENCIES.sum()
+    first = rng.choice(26, size = BOUNDARY, p = profile)
+    second = (rng.choice(26, size = LENGTH - BOUNDARY, p = profile) + 7) % 26
+    codes = np.concatenate([first, second]).astype(np.uint8) + ord("A")
+    return codes.tobytes().decode("ascii")
+
+def test_change_point_at_boundary():
+    window = CipherEngine.SlidingWindow()
+    window.UpdateText(SegmentedText())
+    segments = window.Segments()
+    assert [position for position, score in window.changes] == [BOUNDARY]
+    assert [(start, end) for start, end, counts in segments] == [(0, BOUNDARY),
+                                                                (BOUNDARY, LENGTH)]
+    assert [int(counts.sum()) for start, end, counts in segments] == [BOUNDARY,
+                                                                     LENGTH - BOUNDARY]
+
+def test_no_change_point_in_one_segment():
+    window = CipherEngine.SlidingWindow()
+    window.UpdateText(SegmentedText()[:BOUNDARY])
+    assert window.Segments()[0][:2] == (0, BOUNDARY)
+    assert window.changes == []
+
+# Lines of 61 characters, so that the chunks split lines and steps
+# at varying places.
+@pytest.mark.parametrize("chunk_size", [97, 1000, 4096, 1 << 20])
+def test_chunk_size_invariance(tmp_path, chunk_size):
+    text = SegmentedText()
+    path = tmp_path / "text.txt"
+    path.write_text("\n".join(text[i:i + 61] for i in range(0, len(text), 61)),
+                    encoding = "utf-8")
+    whole = CipherEngine.SlidingWindow()
+    expected = whole.UpdateText(text)
+    pieces = []
+    window = CipherEngine.WindowFile(path, chunk_size = chunk_size,
+                                     windows = lambda *result: pieces.append(result))
+    for i, array in enumerate(expected):
+        result = np.concatenate([piece[i] for piece in pieces])
+        np.testing.assert_allclose(result, array, rtol = 1e-12, equal_nan = True)
+    assert window.changes == whole.changes
+    for (start, end, counts), (s, e, c) in zip(window.Segments(), whole.Segments()):
+        assert (start, end) == (s, e)
+        assert (counts == c).all()